@@ -0,0 +1,60 @@
+"""enhance_array(합친 변환표)가 ImageEnhance.Brightness → Contrast와 같은 결과를 내는지 확인"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image, ImageEnhance
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 배경제거_엔진 import DEFAULT_SETTINGS, apply_lut_inplace, blend_lut, enhance_array
+
+
+def enhance_loop(img, brightness, contrast):
+    """변환표로 합치기 전 remove_white_background의 밝기/대비 조절"""
+    img = ImageEnhance.Brightness(img).enhance(brightness)
+    img = ImageEnhance.Contrast(img).enhance(contrast)
+    return np.array(img)
+
+
+def random_image(width, height, seed):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+
+
+# 픽셀 값 수가 짝수(두 바이트씩 묶는 표)인 크기와 홀수(한 바이트 표)인 크기
+SIZES = [(40, 30), (37, 23)]
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('brightness', [1.0, 0.5, 0.85, 1.1, 1.5, 2.0])
+@pytest.mark.parametrize('contrast', [1.0, 1.5, 2.5, 4.0])
+def test_matches_image_enhance(size, brightness, contrast):
+    img = random_image(*size, seed=int(brightness * 100 + contrast * 10))
+    settings = DEFAULT_SETTINGS.replace(brightness=brightness, contrast=contrast)
+    np.testing.assert_array_equal(enhance_array(img, settings),
+                                  enhance_loop(img, brightness, contrast))
+
+
+def test_identity_settings_leave_image_unchanged():
+    img = random_image(37, 23, seed=0)
+    settings = DEFAULT_SETTINGS.replace(brightness=1.0, contrast=1.0)
+    np.testing.assert_array_equal(enhance_array(img, settings), np.asarray(img))
+
+
+@pytest.mark.parametrize('base', [0, 97, 255])
+@pytest.mark.parametrize('factor', [0.0, 0.5, 1.0, 1.7, 4.0])
+def test_blend_lut_matches_image_blend(base, factor):
+    ramp = Image.frombytes('L', (256, 1), bytes(range(256)))
+    expected = np.asarray(Image.blend(Image.new('L', (256, 1), base), ramp, factor))[0]
+    np.testing.assert_array_equal(blend_lut(base, factor), expected)
+
+
+@pytest.mark.parametrize('count', [0, 1, 2, 255, 256, 1001])
+def test_apply_lut_inplace_matches_indexing(count):
+    values = np.random.default_rng(count).integers(0, 256, count, dtype=np.uint8)
+    lut = np.random.default_rng(1).integers(0, 256, 256, dtype=np.uint8)
+    expected = lut[values]
+    apply_lut_inplace(values, lut)
+    np.testing.assert_array_equal(values, expected)
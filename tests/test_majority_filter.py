@@ -0,0 +1,48 @@
+"""majority_filter(벡터 연산)가 기존 이중 반복문과 같은 결과를 내는지 확인"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 배경제거_엔진 import majority_filter
+
+
+def majority_filter_loop(mask, min_count=5):
+    """벡터화 전 extract_lines_only의 scipy 없는 잡티 제거 (픽셀마다 3x3 합 계산)"""
+    height, width = mask.shape
+    result = np.zeros_like(mask)
+    for i in range(1, height - 1):
+        for j in range(1, width - 1):
+            if np.sum(mask[i-1:i+2, j-1:j+2]) >= min_count:
+                result[i, j] = True
+    return result
+
+
+SIZES = [(0, 0), (1, 1), (1, 7), (2, 2), (2, 9), (7, 2), (3, 3), (3, 8), (4, 4),
+         (17, 5), (31, 29)]
+
+
+@pytest.mark.parametrize('shape', SIZES)
+@pytest.mark.parametrize('density', [0.0, 0.3, 0.5, 0.7, 1.0])
+def test_matches_loop(shape, density):
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        mask = rng.random(shape) < density
+        np.testing.assert_array_equal(majority_filter(mask), majority_filter_loop(mask))
+
+
+@pytest.mark.parametrize('min_count', range(0, 11))
+def test_matches_loop_for_every_min_count(min_count):
+    mask = np.random.default_rng(min_count).random((12, 15)) < 0.5
+    np.testing.assert_array_equal(majority_filter(mask, min_count),
+                                  majority_filter_loop(mask, min_count))
+
+
+def test_result_is_bool_and_same_shape():
+    mask = np.random.default_rng(0).random((6, 9)) < 0.5
+    result = majority_filter(mask)
+    assert result.dtype == bool
+    assert result.shape == mask.shape
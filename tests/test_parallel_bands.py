@@ -0,0 +1,56 @@
+"""remove_white_background_parallel(띠 병렬 처리)가 한 번에 처리한 결과와 같은지 확인
+
+띠 경계에서 필터가 다르게 동작하면 (filter_halo 여유분이 모자라면) 이음매 행이 달라집니다.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import 배경제거_엔진 as engine
+from 배경제거_벤치마크 import make_signed_paper
+from 배경제거_엔진 import (PRESETS, parallel_band_rows, remove_white_background,
+                       remove_white_background_parallel)
+
+SETTINGS = {
+    **PRESETS,
+    'local_mean': PRESETS['lines'].replace(shadow_method='local_mean'),
+    'no_shadow': PRESETS['default'].replace(shadow_removal=False),
+    'soft': PRESETS['default'].replace(alpha_mode='soft'),
+    'standard_soft': PRESETS['standard'].replace(alpha_mode='soft'),
+    'speckle': PRESETS['default'].replace(speckle_min_area=30),
+    'local_mean_speckle': PRESETS['lines'].replace(shadow_method='local_mean',
+                                                   speckle_min_area=30),
+    'red_ink': PRESETS['default'].replace(ink_filter='red'),
+    'standard_blue_ink': PRESETS['standard'].replace(ink_filter='blue'),
+}
+
+
+@pytest.fixture(scope='module')
+def page():
+    # 높이가 띠 높이의 배수가 아니도록 홀수 크기
+    return make_signed_paper(241, 403, seed=3, shadow=0.5, texture=6,
+                             inks=('blue', 'black', 'red'))
+
+
+@pytest.fixture(params=['scipy', 'no_scipy'])
+def scipy_path(request, monkeypatch):
+    if request.param == 'scipy' and engine.scipy_ndimage() is None:
+        pytest.skip("scipy가 설치되어 있지 않음")
+    monkeypatch.setattr(engine, 'USE_SCIPY', request.param == 'scipy')
+    return request.param
+
+
+@pytest.mark.parametrize('name', list(SETTINGS))
+@pytest.mark.parametrize('threads', [2, 3])
+def test_matches_single_pass(page, scipy_path, name, threads):
+    settings = SETTINGS[name]
+    # 띠가 여러 개로 나뉘는지 (한 띠면 이음매를 확인하지 못함)
+    assert parallel_band_rows(page.height, settings, threads) < page.height
+
+    expected = np.asarray(remove_white_background(page, settings))
+    result = np.asarray(remove_white_background_parallel(page, settings, threads))
+    np.testing.assert_array_equal(result, expected)
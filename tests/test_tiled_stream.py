@@ -0,0 +1,60 @@
+"""process_tiled(띠 단위 처리 + PngStreamWriter)로 저장한 PNG가 한 번에 처리한 결과와 같은지 확인"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import 배경제거_엔진 as engine
+from 배경제거_벤치마크 import make_signed_paper
+from 배경제거_엔진 import (PRESETS, TILE_BYTES_PER_PIXEL, band_rows_for_budget, process_tiled,
+                       remove_white_background)
+
+WIDTH, HEIGHT = 233, 397
+# 띠 하나가 약 40행이 되는 메모리 예산
+MEMORY_BUDGET = WIDTH * TILE_BYTES_PER_PIXEL * 40
+
+SETTINGS = {
+    **PRESETS,
+    'local_mean': PRESETS['lines'].replace(shadow_method='local_mean'),
+    'soft': PRESETS['default'].replace(alpha_mode='soft'),
+    'speckle': PRESETS['default'].replace(speckle_min_area=30),
+    'red_ink': PRESETS['standard'].replace(ink_filter='red'),
+}
+
+
+@pytest.fixture(scope='module')
+def page():
+    return make_signed_paper(WIDTH, HEIGHT, seed=5, shadow=0.5, texture=6,
+                             inks=('blue', 'black', 'red'))
+
+
+@pytest.fixture(params=['scipy', 'no_scipy'])
+def scipy_path(request, monkeypatch):
+    if request.param == 'scipy' and engine.scipy_ndimage() is None:
+        pytest.skip("scipy가 설치되어 있지 않음")
+    monkeypatch.setattr(engine, 'USE_SCIPY', request.param == 'scipy')
+    return request.param
+
+
+@pytest.mark.parametrize('name', list(SETTINGS))
+@pytest.mark.parametrize('threads', [1, 2])
+def test_streamed_png_matches_single_pass(page, scipy_path, name, threads, tmp_path):
+    settings = SETTINGS[name]
+    # process_tiled와 같은 띠 높이 (동시에 메모리에 있는 띠 수만큼 예산을 나눔)
+    in_flight = 2 * threads if threads > 1 else 1
+    band_rows = band_rows_for_budget(WIDTH, settings, MEMORY_BUDGET // in_flight)
+    # 여러 띠로 나뉘고 마지막 띠는 짧음
+    assert band_rows < HEIGHT and HEIGHT % band_rows != 0
+
+    path = tmp_path / 'tiled.png'
+    process_tiled(page, path, settings, memory_budget=MEMORY_BUDGET, compress_level=1,
+                  threads=threads)
+    with Image.open(path) as saved:
+        assert saved.mode == 'RGBA' and saved.size == page.size
+        streamed = saved.tobytes()
+
+    assert streamed == remove_white_background(page, settings).tobytes()
@@ -0,0 +1,475 @@
+"""누끼따기 배경 제거 벤치마크
+
+종이에 서명/도장을 한 것처럼 보이는 이미지를 절차적으로 만들어서(그림자, 종이 질감,
+잉크 색 조절 가능) 여러 해상도에서 단계별 처리 시간과 최대 메모리를 잽니다.
+scipy를 쓰는 경로와 쓰지 않는 경로를 모두 재고, 결과를 JSON으로 저장해서
+다른 수정본의 결과와 비교할 수 있습니다.
+
+사용 예:
+    python 배경제거_벤치마크.py -o bench_before.json
+    python 배경제거_벤치마크.py --sizes 1 12 --repeat 5 -o bench_after.json --compare bench_before.json
+    python 배경제거_벤치마크.py --sizes 12 --preset standard --set alpha_mode=soft
+    python 배경제거_벤치마크.py --sizes 1 --shadow 0.6 --texture 8 --ink red,blue --save-samples samples/
+    python 배경제거_벤치마크.py --sizes 12 48 --threads 1 2 4 8
+    python 배경제거_벤치마크.py --sizes 12 --tune 1 2 4
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import 배경제거_엔진 as engine
+from 배경제거_엔진 import (DEFAULT_COMPRESS_LEVEL, EXPORT_EXTENSIONS, EXPORT_FORMATS, PRESETS,
+                       compute_local_mean, enhance_array, estimate_illumination, export_image,
+                       finish_result, flatten_illumination, grayscale, illumination_params,
+                       ink_filter_mask, line_alpha_source, remove_line_noise,
+                       remove_white_background, remove_white_background_parallel, scipy_ndimage,
+                       speckle_filter, standard_alpha_source, threshold_line_mask,
+                       tune_settings, uses_illumination, uses_local_mean,
+                       white_background_mask)
+from 배경제거_일괄처리 import load_settings
+
+# 기본으로 재는 해상도 (메가픽셀)
+DEFAULT_SIZES = (1, 12, 48)
+# 종이 비율 (A 계열 용지, 세로:가로 = √2:1)
+PAPER_ASPECT = 2 ** 0.5
+# 잉크 색 이름 → RGB
+INK_COLORS = {
+    'black': (30, 30, 35),
+    'blue': (25, 45, 150),
+    'red': (190, 30, 40),
+}
+# 결과에 기록하는 단계 순서
+STAGES = ('enhance', 'grayscale', 'shadow', 'mask', 'morphology', 'ink_filter', 'post_process',
+          'encode')
+# 종이 질감을 만들 때 한 번에 다루는 행 수 (큰 이미지의 작업 메모리 제한)
+TEXTURE_BAND_ROWS = 1024
+
+
+def paper_size(megapixels):
+    """메가픽셀 수에 맞는 세로 방향 용지 크기 (너비, 높이)"""
+    width = int(round((megapixels * 1_000_000 / PAPER_ASPECT) ** 0.5))
+    return width, int(round(width * PAPER_ASPECT))
+
+
+def make_signed_paper(width, height, seed=0, shadow=0.35, texture=4.0, inks=('blue', 'black')):
+    """종이 위에 서명과 도장이 있는 것처럼 보이는 RGB 이미지 만들기
+
+    shadow는 한쪽 모서리로 갈수록 어두워지는 그림자의 세기(0-1), texture는 종이 질감
+    잡음의 표준편차(밝기 단위), inks는 서명 획에 번갈아 쓸 잉크 색 이름입니다.
+    빨간 잉크가 있으면 원형 도장도 하나 찍습니다.
+    """
+    rng = np.random.default_rng(seed)
+
+    # 그림자: 작은 격자에서 부드러운 밝기 변화를 만든 뒤 확대 (큰 이미지도 메모리 절약)
+    grid = 32
+    gy, gx = np.mgrid[0:grid, 0:grid] / (grid - 1)
+    corner = rng.uniform(0, 1, 2)
+    distance = np.hypot(gx - corner[0], gy - corner[1]) / 2 ** 0.5
+    shade = 1 - shadow * np.clip(1.2 - distance * 1.5, 0, 1) ** 2
+    shade_map = Image.fromarray((shade * 255).astype(np.uint8)).resize((width, height),
+                                                                        Image.BILINEAR)
+
+    # 종이 밝기 = 기본 밝기 × 그림자 + 질감 잡음 (띠 단위로 계산)
+    paper = np.asarray(shade_map).copy()
+    for top in range(0, height, TEXTURE_BAND_ROWS):
+        band = paper[top:top + TEXTURE_BAND_ROWS]
+        noise = rng.normal(0, texture, band.shape).astype(np.float32) if texture > 0 else 0
+        band[:] = np.clip(band * np.float32(242 / 255) + noise, 0, 255)
+
+    # 약간 누런 종이색
+    l_image = Image.fromarray(paper)
+    img = Image.merge('RGB', (l_image, l_image, l_image.point(lambda v: v * 0.96)))
+
+    draw = ImageDraw.Draw(img)
+    scale = min(width, height)
+    stroke = max(2, scale // 250)
+
+    # 서명: 가로로 흘러가는 부드러운 곡선 몇 개
+    for k in range(6):
+        color = INK_COLORS[inks[k % len(inks)]]
+        x0 = rng.uniform(0.1, 0.5) * width
+        y0 = rng.uniform(0.35, 0.65) * height
+        t = np.linspace(0, 1, 200)
+        xs = x0 + t * rng.uniform(0.2, 0.4) * width
+        ys = (y0 + np.sin(t * rng.uniform(6, 14) + rng.uniform(0, np.pi)) *
+              rng.uniform(0.02, 0.06) * height)
+        draw.line(list(zip(xs, ys)), fill=color, width=stroke, joint='curve')
+
+    # 도장: 빨간 잉크가 있을 때 이중 원과 가운데 십자
+    if 'red' in inks:
+        radius = scale * 0.08
+        cx, cy = width * 0.75, height * 0.7
+        color = INK_COLORS['red']
+        for r in (radius, radius * 0.85):
+            draw.ellipse((cx - r, cy - r, cx + r, cy + r), outline=color, width=stroke)
+        draw.line((cx - radius * 0.5, cy, cx + radius * 0.5, cy), fill=color, width=stroke)
+        draw.line((cx, cy - radius * 0.5, cx, cy + radius * 0.5), fill=color, width=stroke)
+
+    return img
+
+
+class StageTimer:
+    """단계별 소요 시간과 (trace_memory일 때) tracemalloc 최대 메모리 기록
+
+    tracemalloc은 numpy 배열과 파이썬 객체 메모리만 추적하며 Pillow 내부의 이미지
+    메모리는 포함하지 않습니다.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.seconds = {}
+        self.peak_bytes = {}
+        self.total_peak_bytes = 0
+
+    def __call__(self, name, func, *args):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        value = func(*args)
+        self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), peak - base)
+            self.total_peak_bytes = max(self.total_peak_bytes, peak)
+        return value
+
+
+def shadow_stage(gray, settings):
+    """그림자 제거 준비 (조명 평탄화 결과 또는 지역 평균)"""
+    if uses_illumination(settings):
+        factor = illumination_params()[0]
+        return None, flatten_illumination(gray, estimate_illumination(gray), factor)
+    if uses_local_mean(settings):
+        return compute_local_mean(gray), None
+    return None, None
+
+
+def run_stages(img, settings, timer, path, fmt, compress_level):
+    """remove_white_background와 같은 처리를 단계별로 나눠 실행하고 결과를 저장"""
+    img_array = timer('enhance', enhance_array, img, settings)
+
+    if settings.line_only:
+        gray = timer('grayscale', grayscale, img_array)
+        local_mean, flattened = timer('shadow', shadow_stage, gray, settings)
+        mask = timer('mask', threshold_line_mask, gray, settings, local_mean, flattened)
+        # line_mask_from_gray와 같이 그림자 제거를 쓸 때만 scipy 형태학 필터 사용
+        use_scipy = flattened is not None or local_mean is not None
+        mask = timer('morphology', remove_line_noise, mask, settings, 1.0, use_scipy)
+        mask = timer('ink_filter', ink_filter_mask, img_array, mask, settings)
+        # 잡티 제거는 잉크 색 필터 뒤 (line_opaque_mask와 같은 순서), 시간은 morphology에 합산
+        mask = timer('morphology', speckle_filter, mask, settings)
+        alpha_source = lambda: line_alpha_source(gray, settings, local_mean, flattened)
+    else:
+        mask = timer('mask', lambda: ~white_background_mask(img_array, settings))
+        mask = timer('ink_filter', ink_filter_mask, img_array, mask, settings)
+        mask = timer('morphology', speckle_filter, mask, settings)
+        alpha_source = lambda: standard_alpha_source(img_array, settings)
+
+    result = timer('post_process', finish_result, img_array, mask, settings, 1.0, alpha_source)
+    size, _ = timer('encode', export_image, result, path, fmt, compress_level)
+    return result, size
+
+
+def benchmark_image(img, settings, repeat, fmt, compress_level, workdir):
+    """이미지 한 장을 repeat번 재고 단계별 최소/중앙값 시간과 최대 메모리 반환"""
+    path = os.path.join(workdir, 'result' + EXPORT_EXTENSIONS[fmt])
+    runs = []
+    for _ in range(repeat):
+        timer = StageTimer()
+        start = time.perf_counter()
+        run_stages(img, settings, timer, path, fmt, compress_level)
+        runs.append((time.perf_counter() - start, timer.seconds))
+
+    # 시간 측정과 따로 한 번 더 실행해서 메모리만 잼 (tracemalloc은 처리를 느리게 함)
+    timer = StageTimer(trace_memory=True)
+    tracemalloc.start()
+    try:
+        _, size = run_stages(img, settings, timer, path, fmt, compress_level)
+    finally:
+        tracemalloc.stop()
+
+    stages = {}
+    for name in STAGES:
+        times = [seconds[name] for _, seconds in runs if name in seconds]
+        if times:
+            stages[name] = {
+                'min_seconds': min(times),
+                'median_seconds': statistics.median(times),
+                'peak_bytes': timer.peak_bytes.get(name, 0),
+            }
+    totals = [total for total, _ in runs]
+    return {
+        'stages': stages,
+        'min_seconds': min(totals),
+        'median_seconds': statistics.median(totals),
+        'peak_bytes': timer.total_peak_bytes,
+        'output_bytes': size,
+    }
+
+
+def check_parity(img, settings, fmt, compress_level, workdir):
+    """단계별 실행 결과가 remove_white_background와 같은지 확인 (벤치마크가 실제 처리와 같은 일을 하는지)"""
+    path = os.path.join(workdir, 'parity' + EXPORT_EXTENSIONS[fmt])
+    staged, _ = run_stages(img, settings, StageTimer(), path, fmt, compress_level)
+    return np.array_equal(np.asarray(staged), np.asarray(remove_white_background(img, settings)))
+
+
+def benchmark_threads(img, settings, thread_counts, repeat):
+    """띠 병렬 처리(remove_white_background_parallel)를 스레드 수별로 재서 1스레드 대비 속도 향상 반환
+
+    1스레드는 목록에 없어도 기준으로 잽니다. 결과가 한 번에 처리한 것과 같은지도 확인합니다.
+    """
+    reference = np.asarray(remove_white_background(img, settings))
+    rows = []
+    for threads in sorted(set(thread_counts) | {1}):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = remove_white_background_parallel(img, settings, threads)
+            times.append(time.perf_counter() - start)
+        rows.append({
+            'threads': threads,
+            'min_seconds': min(times),
+            'median_seconds': statistics.median(times),
+            'matches_pipeline': np.array_equal(np.asarray(result), reference),
+        })
+
+    single = rows[0]['min_seconds']
+    for row in rows:
+        row['speedup'] = single / row['min_seconds']
+        # 스레드 수만큼 빨라지면 1.0
+        row['efficiency'] = row['speedup'] / row['threads']
+    return rows
+
+
+def benchmark_tune(img, settings, worker_counts, repeat):
+    """자동 튜닝(tune_settings)을 작업자 프로세스 수별로 재서 고른 설정과 함께 반환
+
+    작업자 프로세스를 띄우는 시간도 포함합니다 (화면 프로그램에서 누른 뒤 기다리는 시간).
+    """
+    rows = []
+    for workers in sorted(set(worker_counts)):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            tuned, score = tune_settings(img, settings.line_only, settings, workers=workers)
+            times.append(time.perf_counter() - start)
+        rows.append({
+            'workers': workers,
+            'min_seconds': min(times),
+            'median_seconds': statistics.median(times),
+            'score': score,
+            'settings': tuned.to_dict(),
+        })
+    return rows
+
+
+def scipy_paths():
+    """잴 수 있는 경로 목록 (scipy가 없으면 no_scipy만)"""
+    return ('scipy', 'no_scipy') if scipy_ndimage() is not None else ('no_scipy',)
+
+
+def max_rss_bytes():
+    """프로세스 최대 상주 메모리 (지원하지 않는 운영체제면 None)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS는 바이트, 리눅스는 KB 단위
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def environment_info():
+    """결과를 비교할 때 참고할 실행 환경 정보"""
+    import PIL
+    ndimage = scipy_ndimage()
+    if ndimage is not None:
+        import scipy
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pillow': PIL.__version__,
+        'scipy': scipy.__version__ if ndimage is not None else None,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare_results(current, baseline):
+    """같은 해상도/경로의 단계별 최소 시간을 이전 결과와 비교한 줄 목록"""
+    previous = {(r['megapixels'], r['path']): r for r in baseline['results']}
+    lines = []
+    for result in current['results']:
+        before = previous.get((result['megapixels'], result['path']))
+        if before is None:
+            continue
+        lines.append(f"{result['megapixels']} MP / {result['path']}")
+        rows = [(name, stage['min_seconds'], before['stages'].get(name, {}).get('min_seconds'))
+                for name, stage in result['stages'].items()]
+        rows.append(('전체', result['min_seconds'], before['min_seconds']))
+        for name, after_seconds, before_seconds in rows:
+            if before_seconds:
+                lines.append(f"  {name:<13}{before_seconds * 1000:10.1f} ms -> "
+                             f"{after_seconds * 1000:10.1f} ms  "
+                             f"(x{before_seconds / after_seconds:.2f})")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="합성한 서명 이미지로 배경 제거 단계별 시간과 메모리를 잽니다.")
+    parser.add_argument('--sizes', type=float, nargs='+', default=list(DEFAULT_SIZES),
+                        metavar='MP', help="잴 해상도 (메가픽셀, 기본: 1 12 48)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="해상도/경로마다 반복 횟수, 최소값과 중앙값을 기록 (기본: 3)")
+    parser.add_argument('-p', '--preset', default='default',
+                        help=f"설정 프리셋 이름({', '.join(PRESETS)}) 또는 JSON 파일 경로")
+    parser.add_argument('--set', dest='overrides', action='append', default=[],
+                        metavar='항목=값', help="개별 설정값 지정 (여러 번 사용 가능)")
+    parser.add_argument('--paths', nargs='+', choices=('scipy', 'no_scipy'),
+                        help="잴 경로 (기본: 설치된 scipy에 따라 가능한 경로 모두)")
+    parser.add_argument('--format', default='png', choices=list(EXPORT_FORMATS),
+                        help="encode 단계의 저장 형식 (기본: png)")
+    parser.add_argument('--compress-level', type=int, default=DEFAULT_COMPRESS_LEVEL,
+                        choices=range(10), metavar='0-9',
+                        help=f"encode 단계의 압축 수준 (기본: {DEFAULT_COMPRESS_LEVEL})")
+    parser.add_argument('--seed', type=int, default=0, help="합성 이미지 난수 시드")
+    parser.add_argument('--shadow', type=float, default=0.35,
+                        help="합성 이미지의 그림자 세기 0-1 (기본: 0.35)")
+    parser.add_argument('--texture', type=float, default=4.0,
+                        help="합성 이미지의 종이 질감 잡음 세기 (기본: 4)")
+    parser.add_argument('--ink', default='blue,black,red',
+                        help=f"잉크 색 목록, 쉼표로 구분 ({', '.join(INK_COLORS)}, "
+                             f"red가 있으면 도장도 찍음)")
+    parser.add_argument('--threads', type=int, nargs='+', metavar='N',
+                        help="띠 병렬 처리를 이 스레드 수들로 재서 1스레드 대비 속도 향상을 "
+                             "출력 (예: --threads 1 2 4 8)")
+    parser.add_argument('--tune', type=int, nargs='+', metavar='N',
+                        help="자동 튜닝을 이 작업자 프로세스 수들로 재서 걸린 시간과 고른 설정을 "
+                             "출력 (예: --tune 1 2 4)")
+    parser.add_argument('--save-samples', metavar='폴더',
+                        help="합성한 입력 이미지를 이 폴더에 PNG로 저장")
+    parser.add_argument('-o', '--output', help="결과 JSON 파일 경로 (없으면 화면에만 출력)")
+    parser.add_argument('--compare', metavar='JSON', help="이전 결과 JSON과 단계별 시간 비교")
+    args = parser.parse_args(argv)
+
+    inks = tuple(name.strip() for name in args.ink.split(',') if name.strip())
+    unknown = [name for name in inks if name not in INK_COLORS]
+    if not inks or unknown:
+        parser.error(f"알 수 없는 잉크 색: {args.ink} (사용 가능: {', '.join(INK_COLORS)})")
+    if args.repeat < 1:
+        parser.error("--repeat은 1 이상이어야 합니다.")
+    if not 0 <= args.shadow <= 1:
+        parser.error("--shadow는 0에서 1 사이여야 합니다.")
+    if args.threads and min(args.threads) < 1:
+        parser.error("--threads는 1 이상이어야 합니다.")
+    if args.tune and min(args.tune) < 1:
+        parser.error("--tune은 1 이상이어야 합니다.")
+
+    try:
+        settings = load_settings(args.preset, args.overrides)
+    except ValueError as e:
+        parser.error(str(e))
+
+    paths = args.paths or scipy_paths()
+    if 'scipy' in paths and scipy_ndimage() is None:
+        parser.error("scipy가 설치되어 있지 않아 scipy 경로를 잴 수 없습니다.")
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment_info(),
+        'settings': settings.to_dict(),
+        'generator': {'seed': args.seed, 'shadow': args.shadow, 'texture': args.texture,
+                      'inks': list(inks)},
+        'format': args.format,
+        'compress_level': args.compress_level,
+        'results': [],
+        'thread_scaling': [],
+        'auto_tune': [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for megapixels in args.sizes:
+            width, height = paper_size(megapixels)
+            start = time.perf_counter()
+            img = make_signed_paper(width, height, args.seed, args.shadow, args.texture, inks)
+            print(f"{megapixels:g} MP ({width}x{height}) 이미지 생성 "
+                  f"{time.perf_counter() - start:.2f}초")
+            if args.save_samples:
+                os.makedirs(args.save_samples, exist_ok=True)
+                img.save(os.path.join(args.save_samples, f"signed_paper_{megapixels:g}mp.png"))
+
+            for path in paths:
+                engine.USE_SCIPY = path == 'scipy'
+                try:
+                    result = benchmark_image(img, settings, args.repeat, args.format,
+                                             args.compress_level, workdir)
+                    same = check_parity(img, settings, args.format, args.compress_level,
+                                        workdir)
+                finally:
+                    engine.USE_SCIPY = True
+
+                result = dict(megapixels=megapixels, width=width, height=height, path=path,
+                              matches_pipeline=same, **result)
+                report['results'].append(result)
+
+                print(f"  [{path}] 전체 {result['min_seconds'] * 1000:.1f} ms, "
+                      f"최대 메모리 {result['peak_bytes'] / 1024 / 1024:.1f} MB"
+                      + ("" if same else "  (경고: 전체 처리 결과와 다름)"))
+                for name, stage in result['stages'].items():
+                    print(f"    {name:<13}{stage['min_seconds'] * 1000:10.1f} ms "
+                          f"{stage['peak_bytes'] / 1024 / 1024:9.1f} MB")
+
+            if args.threads:
+                rows = benchmark_threads(img, settings, args.threads, args.repeat)
+                report['thread_scaling'].append({'megapixels': megapixels, 'width': width,
+                                                 'height': height, 'runs': rows})
+                print(f"  [스레드] 띠 병렬 처리 (CPU {os.cpu_count()}개)")
+                for row in rows:
+                    print(f"    {row['threads']:>3}개 {row['min_seconds'] * 1000:10.1f} ms  "
+                          f"x{row['speedup']:.2f} (효율 {row['efficiency'] * 100:.0f}%)"
+                          + ("" if row['matches_pipeline'] else "  (경고: 전체 처리 결과와 다름)"))
+
+            if args.tune:
+                rows = benchmark_tune(img, settings, args.tune, args.repeat)
+                report['auto_tune'].append({'megapixels': megapixels, 'width': width,
+                                            'height': height, 'runs': rows})
+                print(f"  [자동 튜닝] (CPU {os.cpu_count()}개)")
+                for row in rows:
+                    tuned = row['settings']
+                    print(f"    작업자 {row['workers']:>2}개 {row['min_seconds'] * 1000:10.1f} ms  "
+                          f"점수 {row['score']:.3f} (흐림 {tuned['blur']}, "
+                          f"매끄럽게 {tuned['edge_smooth']})")
+            del img
+
+    report['max_rss_bytes'] = max_rss_bytes()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"비교 ({args.compare} -> 현재, 최소 시간 기준)")
+        for line in compare_results(report, baseline):
+            print(line)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,80 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, colorchooser
-from PIL import Image, ImageTk, ImageDraw, ImageFilter, ImageEnhance
-import numpy as np
+from PIL import Image, ImageTk, ImageDraw
 import os
-try:
-    from scipy import ndimage
-except ImportError:
-    # scipy가 없으면 기본 기능만 사용
-    ndimage = None
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from 배경제거_엔진 import (ALPHA_MODES, DEFAULT_COMPRESS_LEVEL, DEFAULT_CROP_PADDING,
+                       EXPORT_EXTENSIONS, EXPORT_FORMATS, INK_FILTERS, PREVIEW_SIZE,
+                       SHADOW_METHODS, DiskCache, PipelineCache, RemovalSettings, StageTracer,
+                       clamp_region, crop_to_content, estimate_settings, export_image,
+                       extract_lines_only, format_size, get_tracer, open_image, open_proxy,
+                       post_process_image, region_proxy, remove_white_background,
+                       run_pipeline, run_pipeline_loaded, scipy_ndimage, set_tracer,
+                       standard_background_removal, trace_stage, traced, tune_settings)
+
+# 영역 선택으로 인정하는 최소 끌기 크기 (미리보기 px, 이보다 작으면 클릭으로 봄)
+ROI_MIN_DRAG = 5
+
+
+class ProcessingWorker:
+    """최신 요청만 처리하는 백그라운드 작업 스레드
+    
+    아직 시작하지 않은 요청은 새 요청이 들어오면 버려지므로 항상 마지막 설정값만
+    처리됩니다. 실행 중인 작업은 중간에 멈출 수 없으므로, 끝난 뒤 결과의 작업 번호가
+    latest_id와 다르면 받는 쪽에서 버리면 됩니다. 결과는 poll()로 UI 스레드에서
+    꺼내 갑니다 (tkinter는 다른 스레드에서 호출하면 안 됨).
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._pending = None
+        self._results = queue.Queue()
+        self.latest_id = 0
+        
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+    
+    def submit(self, func, *args, **kwargs):
+        """작업 요청 (대기 중인 이전 요청은 버림), 작업 번호 반환"""
+        with self._condition:
+            self.latest_id += 1
+            self._pending = (self.latest_id, func, args, kwargs)
+            self._condition.notify()
+            return self.latest_id
+    
+    def cancel(self):
+        """대기 중인 요청을 버리고 실행 중인 작업의 결과도 무효로 만듦"""
+        with self._condition:
+            self.latest_id += 1
+            self._pending = None
+    
+    def poll(self):
+        """끝난 작업 중 가장 최신 요청의 (작업 번호, 결과, 오류) 반환, 없으면 None"""
+        latest = None
+        while True:
+            try:
+                job_id, result, error = self._results.get_nowait()
+            except queue.Empty:
+                return latest
+            if job_id == self.latest_id:
+                latest = (job_id, result, error)
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                job_id, func, args, kwargs = self._pending
+                self._pending = None
+            
+            try:
+                self._results.put((job_id, func(*args, **kwargs), None))
+            except Exception as e:
+                self._results.put((job_id, None, e))
+
 
 class BackgroundRemover:
     def __init__(self, root):
@@ -17,9 +84,43 @@ class BackgroundRemover:
         self.root.minsize(800, 700)
         
         # 변수들
-        self.original_image = None
+        self.original_future = None  # 원본 해상도 이미지 (백그라운드에서 디코딩)
         self.processed_image = None
+        self.processed_settings = None  # processed_image를 만든 설정값
         self.current_display_image = None
+        self.proxy_image = None  # 슬라이더 조절 중 미리보기용 축소본
+        self.proxy_scale = 1.0
+        self.full_size = None  # 원본 해상도 (가로, 세로)
+        
+        # 처리할 영역 (원본 좌표 (left, top, right, bottom), None이면 전체)
+        self.roi = None
+        self.roi_proxy = None  # 선택 영역의 미리보기용 축소본 (축소본, 배율)
+        self.display_box = None  # 미리보기 창에서 이미지가 놓인 위치 (x, y, 가로, 세로)
+        self.drag_start = None  # 영역 선택을 시작한 미리보기 창 좌표
+        
+        # 단계별 처리 결과 캐시 (이미지를 새로 열 때마다 image_token 증가)
+        self.pipeline_cache = PipelineCache()
+        self.image_token = 0
+        
+        # 켜면 같은 이미지를 같은 설정으로 다시 처리할 때 디스크에 저장해 둔 결과를 사용
+        # (기본은 꺼짐: 같은 이미지를 다시 여는 일이 드물면 저장 비용만 듦)
+        try:
+            self.disk_cache = DiskCache()
+        except OSError:
+            # 캐시 폴더를 만들 수 없으면 캐시 없이 동작
+            self.disk_cache = None
+        self.disk_cache_var = tk.BooleanVar(value=False)
+        
+        # 백그라운드 처리
+        self.loader = ThreadPoolExecutor(max_workers=1)  # 원본 디코딩 전용
+        self.worker = ProcessingWorker()
+        self.requested_settings = None  # 작업 스레드에 마지막으로 요청한 설정값
+        self.setting_change_after = None  # 대기 중인 지연 처리 (root.after id)
+        self.poll_after = None  # 결과 확인 예약 (root.after id), 처리 중일 때만 있음
+        self.tuner = ThreadPoolExecutor(max_workers=1)  # 자동 최적화/튜닝 전용
+        self.tune_future = None  # 진행 중인 자동 최적화/튜닝 ((설정값, 완료 메시지)), 없으면 None
+        self.tune_token = None  # 자동 최적화/튜닝을 시작한 이미지와 선택 영역 (source_key)
+        self.busy_jobs = set()  # 진행 중인 작업 ('process', 'tune'), 하나라도 있으면 처리 중 표시
         
         # 설정값들
         self.threshold_var = tk.IntVar(value=200)
@@ -30,6 +131,19 @@ class BackgroundRemover:
         self.line_only_var = tk.BooleanVar(value=True)
         self.brightness_var = tk.DoubleVar(value=1.0)
         self.shadow_threshold_var = tk.IntVar(value=150)
+        self.shadow_method_var = tk.StringVar(value=SHADOW_METHODS['illumination'])
+        self.alpha_mode_var = tk.StringVar(value=ALPHA_MODES['binary'])
+        self.speckle_min_area_var = tk.IntVar(value=0)
+        self.ink_filter_var = tk.StringVar(value=INK_FILTERS['all'])
+        
+        # 저장 설정
+        self.crop_var = tk.BooleanVar(value=True)
+        self.crop_padding_var = tk.IntVar(value=DEFAULT_CROP_PADDING)
+        self.export_format_var = tk.StringVar(value=EXPORT_FORMATS['png'])
+        self.compress_level_var = tk.IntVar(value=DEFAULT_COMPRESS_LEVEL)
+        
+        # 단계별 시간 측정 (기본은 꺼짐)
+        self.trace_var = tk.BooleanVar(value=False)
         
         self.setup_ui()
         
@@ -71,8 +185,35 @@ class BackgroundRemover:
         self.image_frame.pack()
         self.image_frame.pack_propagate(False)  # 크기 고정
         
-        self.image_label = ttk.Label(self.image_frame, text="이미지를 업로드해주세요")
-        self.image_label.pack(expand=True)
+        # 미리보기 위에서 끌어서 처리할 영역(서명 부분)을 고름
+        self.preview_canvas = tk.Canvas(self.image_frame, width=400, height=280,
+                                        highlightthickness=0, cursor='crosshair')
+        self.preview_canvas.pack()
+        self.preview_canvas.create_text(200, 140, text="이미지를 업로드해주세요", tags='placeholder')
+        self.preview_canvas.bind('<ButtonPress-1>', self.on_roi_press)
+        self.preview_canvas.bind('<B1-Motion>', self.on_roi_drag)
+        self.preview_canvas.bind('<ButtonRelease-1>', self.on_roi_release)
+        
+        # 선택 영역 표시
+        roi_frame = ttk.Frame(preview_frame)
+        roi_frame.pack(fill=tk.X)
+        
+        self.roi_label = ttk.Label(roi_frame, text="처리 영역: 전체 (미리보기에서 끌어서 서명 부분만 선택)")
+        self.roi_label.pack(side=tk.LEFT)
+        ttk.Button(roi_frame, text="선택 영역 해제",
+                  command=self.clear_roi).pack(side=tk.RIGHT)
+        
+        # 처리 중 표시
+        self.status_frame = ttk.Frame(preview_frame, height=22)
+        self.status_frame.pack(fill=tk.X)
+        self.status_frame.pack_propagate(False)
+        
+        self.busy_label = ttk.Label(self.status_frame, text="")
+        self.busy_label.pack(side=tk.LEFT)
+        self.busy_bar = ttk.Progressbar(self.status_frame, mode='indeterminate', length=150)
+        # 단계별 시간 측정을 켰을 때 마지막 처리의 단계별 시간
+        self.trace_label = ttk.Label(self.status_frame, text="")
+        self.trace_label.pack(side=tk.RIGHT)
         
         # 설정 조절 섹션
         settings_frame = ttk.LabelFrame(main_frame, text="3. 배경 제거 설정", padding="10")
@@ -87,6 +228,12 @@ class BackgroundRemover:
                        variable=self.line_only_var, command=self.on_setting_change).pack(side=tk.LEFT, padx=10)
         ttk.Checkbutton(mode_frame, text="그림자 제거 강화", 
                        variable=self.shadow_removal_var, command=self.on_setting_change).pack(side=tk.LEFT, padx=10)
+        ttk.Label(mode_frame, text="그림자 제거 방식:").pack(side=tk.LEFT, padx=(10, 0))
+        shadow_method_combo = ttk.Combobox(mode_frame, textvariable=self.shadow_method_var,
+                                           values=list(SHADOW_METHODS.values()),
+                                           state='readonly', width=10)
+        shadow_method_combo.pack(side=tk.LEFT, padx=5)
+        shadow_method_combo.bind('<<ComboboxSelected>>', self.on_setting_change)
         
         # 첫 번째 줄
         row1 = ttk.Frame(settings_frame)
@@ -96,13 +243,15 @@ class BackgroundRemover:
         threshold_scale = ttk.Scale(row1, from_=150, to=250, variable=self.threshold_var,
                                    orient=tk.HORIZONTAL, length=120)
         threshold_scale.pack(side=tk.LEFT, padx=5)
-        threshold_scale.bind('<Motion>', self.on_setting_change)
+        threshold_scale.bind('<B1-Motion>', self.on_setting_drag)
+        threshold_scale.bind('<ButtonRelease-1>', self.on_setting_change)
         
         ttk.Label(row1, text="그림자 제거 강도:").pack(side=tk.LEFT, padx=(20, 0))
         shadow_scale = ttk.Scale(row1, from_=100, to=200, variable=self.shadow_threshold_var,
                                 orient=tk.HORIZONTAL, length=120)
         shadow_scale.pack(side=tk.LEFT, padx=5)
-        shadow_scale.bind('<Motion>', self.on_setting_change)
+        shadow_scale.bind('<B1-Motion>', self.on_setting_drag)
+        shadow_scale.bind('<ButtonRelease-1>', self.on_setting_change)
         
         # 두 번째 줄
         row2 = ttk.Frame(settings_frame)
@@ -112,13 +261,15 @@ class BackgroundRemover:
         contrast_scale = ttk.Scale(row2, from_=1.0, to=4.0, variable=self.contrast_var,
                                   orient=tk.HORIZONTAL, length=120)
         contrast_scale.pack(side=tk.LEFT, padx=5)
-        contrast_scale.bind('<Motion>', self.on_setting_change)
+        contrast_scale.bind('<B1-Motion>', self.on_setting_drag)
+        contrast_scale.bind('<ButtonRelease-1>', self.on_setting_change)
         
         ttk.Label(row2, text="밝기 조절:").pack(side=tk.LEFT, padx=(20, 0))
         brightness_scale = ttk.Scale(row2, from_=0.5, to=2.0, variable=self.brightness_var,
                                     orient=tk.HORIZONTAL, length=120)
         brightness_scale.pack(side=tk.LEFT, padx=5)
-        brightness_scale.bind('<Motion>', self.on_setting_change)
+        brightness_scale.bind('<B1-Motion>', self.on_setting_drag)
+        brightness_scale.bind('<ButtonRelease-1>', self.on_setting_change)
         
         # 세 번째 줄
         row3 = ttk.Frame(settings_frame)
@@ -128,13 +279,45 @@ class BackgroundRemover:
         blur_scale = ttk.Scale(row3, from_=0, to=5, variable=self.blur_var,
                               orient=tk.HORIZONTAL, length=120)
         blur_scale.pack(side=tk.LEFT, padx=5)
-        blur_scale.bind('<Motion>', self.on_setting_change)
+        blur_scale.bind('<B1-Motion>', self.on_setting_drag)
+        blur_scale.bind('<ButtonRelease-1>', self.on_setting_change)
         
         ttk.Label(row3, text="가장자리 매끄럽게:").pack(side=tk.LEFT, padx=(20, 0))
         smooth_scale = ttk.Scale(row3, from_=0, to=5, variable=self.edge_smooth_var,
                                 orient=tk.HORIZONTAL, length=120)
         smooth_scale.pack(side=tk.LEFT, padx=5)
-        smooth_scale.bind('<Motion>', self.on_setting_change)
+        smooth_scale.bind('<B1-Motion>', self.on_setting_drag)
+        smooth_scale.bind('<ButtonRelease-1>', self.on_setting_change)
+        
+        ttk.Label(row3, text="투명도:").pack(side=tk.LEFT, padx=(20, 0))
+        alpha_mode_combo = ttk.Combobox(row3, textvariable=self.alpha_mode_var,
+                                        values=list(ALPHA_MODES.values()),
+                                        state='readonly', width=10)
+        alpha_mode_combo.pack(side=tk.LEFT, padx=5)
+        alpha_mode_combo.bind('<<ComboboxSelected>>', self.on_setting_change)
+        
+        # 네 번째 줄
+        row4 = ttk.Frame(settings_frame)
+        row4.pack(fill=tk.X, pady=2)
+        
+        ttk.Label(row4, text="잡티 제거 크기:").pack(side=tk.LEFT)
+        speckle_scale = ttk.Scale(row4, from_=0, to=200, variable=self.speckle_min_area_var,
+                                 orient=tk.HORIZONTAL, length=120)
+        speckle_scale.pack(side=tk.LEFT, padx=5)
+        speckle_scale.bind('<B1-Motion>', self.on_setting_drag)
+        speckle_scale.bind('<ButtonRelease-1>', self.on_setting_change)
+        if scipy_ndimage() is None:
+            # 연결 요소 계산에 scipy가 필요함
+            speckle_scale.state(['disabled'])
+            ttk.Label(row4, text="(scipy 필요)").pack(side=tk.LEFT)
+        
+        # 도장(빨강)과 인쇄된 글자(검정)가 겹쳐 있을 때 한 가지 색만 남김
+        ttk.Label(row4, text="남길 잉크 색:").pack(side=tk.LEFT, padx=(20, 0))
+        ink_filter_combo = ttk.Combobox(row4, textvariable=self.ink_filter_var,
+                                        values=list(INK_FILTERS.values()),
+                                        state='readonly', width=14)
+        ink_filter_combo.pack(side=tk.LEFT, padx=5)
+        ink_filter_combo.bind('<<ComboboxSelected>>', self.on_setting_change)
         
         # 처리 버튼들
         process_frame = ttk.Frame(settings_frame)
@@ -148,16 +331,61 @@ class BackgroundRemover:
                   command=self.auto_optimize_lines).pack(side=tk.LEFT, padx=5)
         ttk.Button(process_frame, text="일반 자동 최적화", 
                   command=self.auto_optimize).pack(side=tk.LEFT, padx=5)
+        ttk.Button(process_frame, text="자동 튜닝", 
+                  command=self.auto_tune).pack(side=tk.LEFT, padx=5)
+        
+        # 단계별 시간 측정 (느린 원인을 찾을 때만 켬)
+        trace_frame = ttk.Frame(settings_frame)
+        trace_frame.pack(fill=tk.X)
+        
+        ttk.Checkbutton(trace_frame, text="단계별 시간 측정", variable=self.trace_var,
+                       command=self.toggle_trace).pack(side=tk.LEFT, padx=5)
+        ttk.Button(trace_frame, text="측정 기록 저장(JSON)",
+                  command=self.save_trace).pack(side=tk.LEFT, padx=5)
+        
+        disk_cache_check = ttk.Checkbutton(trace_frame, text="처리 결과 디스크 캐시",
+                                           variable=self.disk_cache_var)
+        disk_cache_check.pack(side=tk.LEFT, padx=(20, 5))
+        clear_cache_btn = ttk.Button(trace_frame, text="캐시 비우기",
+                                     command=self.clear_disk_cache)
+        clear_cache_btn.pack(side=tk.LEFT, padx=5)
+        if self.disk_cache is None:
+            disk_cache_check.state(['disabled'])
+            clear_cache_btn.state(['disabled'])
         
         # 저장 섹션
         save_frame = ttk.LabelFrame(main_frame, text="4. 저장", padding="10")
         save_frame.pack(fill=tk.X, pady=5)
         
-        ttk.Button(save_frame, text="투명 배경 PNG로 저장", 
+        save_buttons = ttk.Frame(save_frame)
+        save_buttons.pack(fill=tk.X)
+        
+        ttk.Button(save_buttons, text="투명 배경으로 저장", 
                   command=self.save_image).pack(side=tk.LEFT, padx=5)
-        ttk.Button(save_frame, text="흰색 배경 JPG로 저장", 
+        ttk.Button(save_buttons, text="흰색 배경 JPG로 저장", 
                   command=self.save_image_white_bg).pack(side=tk.LEFT, padx=5)
         
+        ttk.Checkbutton(save_buttons, text="빈 여백 자르기",
+                       variable=self.crop_var).pack(side=tk.LEFT, padx=(20, 5))
+        ttk.Label(save_buttons, text="여백:").pack(side=tk.LEFT)
+        ttk.Spinbox(save_buttons, from_=0, to=500, increment=4, width=5,
+                    textvariable=self.crop_padding_var).pack(side=tk.LEFT, padx=5)
+        ttk.Label(save_buttons, text="px").pack(side=tk.LEFT)
+        
+        # 투명 배경 저장 형식
+        save_options = ttk.Frame(save_frame)
+        save_options.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Label(save_options, text="저장 형식:").pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Combobox(save_options, textvariable=self.export_format_var,
+                     values=list(EXPORT_FORMATS.values()),
+                     state='readonly', width=16).pack(side=tk.LEFT, padx=5)
+        ttk.Label(save_options, text="압축 수준:").pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Spinbox(save_options, from_=0, to=9, width=3,
+                    textvariable=self.compress_level_var).pack(side=tk.LEFT, padx=5)
+        self.save_report_label = ttk.Label(save_options, text="")
+        self.save_report_label.pack(side=tk.LEFT, padx=10)
+        
     def load_image(self):
         """이미지 파일 로드"""
         file_path = filedialog.askopenfilename(
@@ -170,21 +398,34 @@ class BackgroundRemover:
         
         if file_path:
             try:
-                # 이미지 로드
-                self.original_image = Image.open(file_path)
+                # 미리보기용 축소본 먼저 (JPEG는 줄여서 디코딩하므로 수십 ms)
+                self.proxy_image, self.proxy_scale, full_size, full = open_proxy(file_path)
+                self.full_size = full_size
+                self.roi = None
+                self.roi_proxy = None
+                self.update_roi_label()
+                
+                # 원본 해상도 디코딩은 설정을 만지는 동안 백그라운드에서
+                self.cancel_processing()
+                if full is None:
+                    self.original_future = self.loader.submit(open_image, file_path)
+                else:
+                    self.original_future = Future()
+                    self.original_future.set_result(full)
+                self.processed_image = None
+                self.processed_settings = None
                 
-                # RGB로 변환 (RGBA나 다른 모드일 수 있음)
-                if self.original_image.mode != 'RGB':
-                    self.original_image = self.original_image.convert('RGB')
+                # 이전 이미지의 중간 결과는 더 이상 쓰지 않음
+                self.pipeline_cache.clear()
+                self.image_token += 1
                 
                 # 파일명 표시
                 filename = os.path.basename(file_path)
-                self.file_label.config(text=f"선택된 파일: {filename}")
+                self.file_label.config(text=f"선택된 파일: {filename} "
+                                            f"({full_size[0]}x{full_size[1]})")
                 
-                # 이미지 표시
-                self.display_image(self.original_image)
-                
-                # 자동으로 첫 처리 실행
+                # 축소본으로 바로 미리보기를 보여주고 원본 해상도 처리 요청
+                self.preview_proxy()
                 self.process_image()
                 
                 messagebox.showinfo("완료", "이미지가 성공적으로 로드되었습니다!")
@@ -192,6 +433,7 @@ class BackgroundRemover:
             except Exception as e:
                 messagebox.showerror("오류", f"이미지 로드 중 오류가 발생했습니다:\n{str(e)}")
     
+    @traced('display')
     def display_image(self, img):
         """이미지를 화면에 표시"""
         if img is None:
@@ -199,269 +441,468 @@ class BackgroundRemover:
             
         # 표시용 크기 조정 (더 작게)
         display_img = img.copy()
-        display_img.thumbnail((350, 250), Image.Resampling.LANCZOS)  # 크기 줄임
+        display_img.thumbnail(PREVIEW_SIZE, Image.Resampling.LANCZOS)  # 크기 줄임
         
         # tkinter용 변환
         photo = ImageTk.PhotoImage(display_img)
         
-        self.image_label.configure(image=photo, text="")
-        self.image_label.image = photo
+        # 미리보기 창 가운데에 표시 (영역 선택 좌표 변환을 위해 위치 기록)
+        canvas = self.preview_canvas
+        x = (int(canvas['width']) - display_img.width) // 2
+        y = (int(canvas['height']) - display_img.height) // 2
+        canvas.delete('all')
+        canvas.create_image(x, y, image=photo, anchor=tk.NW)
+        canvas.image = photo
+        self.display_box = (x, y, display_img.width, display_img.height)
         
         self.current_display_image = display_img
     
+    def get_settings(self):
+        """현재 화면의 설정값을 처리용 RemovalSettings로 반환"""
+        shadow_method = next(key for key, label in SHADOW_METHODS.items()
+                             if label == self.shadow_method_var.get())
+        alpha_mode = next(key for key, label in ALPHA_MODES.items()
+                          if label == self.alpha_mode_var.get())
+        ink_filter = next(key for key, label in INK_FILTERS.items()
+                          if label == self.ink_filter_var.get())
+        return RemovalSettings(
+            threshold=self.threshold_var.get(),
+            blur=self.blur_var.get(),
+            contrast=self.contrast_var.get(),
+            edge_smooth=self.edge_smooth_var.get(),
+            shadow_removal=self.shadow_removal_var.get(),
+            line_only=self.line_only_var.get(),
+            brightness=self.brightness_var.get(),
+            shadow_threshold=self.shadow_threshold_var.get(),
+            shadow_method=shadow_method,
+            alpha_mode=alpha_mode,
+            speckle_min_area=self.speckle_min_area_var.get(),
+            ink_filter=ink_filter,
+        )
+    
+    def apply_settings(self, settings):
+        """RemovalSettings 값을 화면의 설정값에 반영 (처리는 하지 않음)"""
+        self.threshold_var.set(settings.threshold)
+        self.blur_var.set(settings.blur)
+        self.contrast_var.set(settings.contrast)
+        self.edge_smooth_var.set(settings.edge_smooth)
+        self.shadow_removal_var.set(settings.shadow_removal)
+        self.line_only_var.set(settings.line_only)
+        self.brightness_var.set(settings.brightness)
+        self.shadow_threshold_var.set(settings.shadow_threshold)
+        self.shadow_method_var.set(SHADOW_METHODS[settings.shadow_method])
+        self.alpha_mode_var.set(ALPHA_MODES[settings.alpha_mode])
+        self.speckle_min_area_var.set(settings.speckle_min_area)
+        self.ink_filter_var.set(INK_FILTERS[settings.ink_filter])
+    
     def remove_white_background(self, img):
-        """하얀 배경 제거 (그림자 제거 기능 포함)"""
-        # 밝기 조절
-        if self.brightness_var.get() != 1.0:
-            enhancer = ImageEnhance.Brightness(img)
-            img = enhancer.enhance(self.brightness_var.get())
-        
-        # 대비 강화
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(self.contrast_var.get())
-        
-        # PIL 이미지를 numpy 배열로 변환
-        img_array = np.array(img)
-        
-        if self.line_only_var.get():
-            # 선만 추출 모드
-            return self.extract_lines_only(img_array)
-        else:
-            # 일반 배경 제거 모드
-            return self.standard_background_removal(img_array)
+        """하얀 배경 제거 (현재 설정값 사용)"""
+        return remove_white_background(img, self.get_settings())
     
     def extract_lines_only(self, img_array):
-        """선만 추출하는 고급 처리"""
-        height, width, channels = img_array.shape
-        rgba_array = np.zeros((height, width, 4), dtype=np.uint8)
-        
-        # 그레이스케일 변환
-        gray = np.dot(img_array[...,:3], [0.2989, 0.5870, 0.1140])
-        
-        # 그림자 제거를 위한 적응적 임계값 처리
-        if self.shadow_removal_var.get() and ndimage is not None:
-            # 지역별 평균 밝기 계산 (그림자 영역 감지)
-            local_mean = ndimage.uniform_filter(gray.astype(np.float32), size=20)
-            
-            # 적응적 임계값 계산
-            adaptive_threshold = local_mean - 30  # 지역 평균보다 30 낮으면 선으로 판단
-            line_mask = gray < adaptive_threshold
-            
-            # 너무 밝은 부분은 제외 (그림자가 아닌 진짜 배경)
-            bright_mask = gray > self.shadow_threshold_var.get()
-            line_mask = line_mask & ~bright_mask
-            
-            # 노이즈 제거
-            line_mask = ndimage.binary_opening(line_mask, structure=np.ones((2,2)))
-            line_mask = ndimage.binary_closing(line_mask, structure=np.ones((3,3)))
-        else:
-            # scipy가 없거나 그림자 제거가 비활성화된 경우 단순 처리
-            threshold = 255 - self.threshold_var.get()
-            line_mask = gray < threshold
-            
-            # 기본 노이즈 제거 (scipy 없이)
-            # 간단한 erosion/dilation 효과
-            kernel = np.ones((3, 3), np.uint8)
-            line_mask_expanded = np.zeros_like(line_mask)
-            for i in range(1, height-1):
-                for j in range(1, width-1):
-                    if np.sum(line_mask[i-1:i+2, j-1:j+2]) >= 5:
-                        line_mask_expanded[i, j] = True
-            line_mask = line_mask_expanded
-        
-        # 결과 이미지 생성
-        rgba_array[:, :, :3] = img_array  # 원본 색상 유지
-        rgba_array[:, :, 3] = line_mask.astype(np.uint8) * 255  # 선 부분만 불투명
-        
-        # 배경을 완전히 투명하게
-        rgba_array[~line_mask, 3] = 0
-        
-        # PIL 이미지로 변환
-        result_img = Image.fromarray(rgba_array, 'RGBA')
-
-        
-        # 후처리
-        return self.post_process_image(result_img)
+        """선만 추출하는 고급 처리 (현재 설정값 사용)"""
+        return extract_lines_only(img_array, self.get_settings())
     
     def standard_background_removal(self, img_array):
-        """기존 방식의 배경 제거"""
-        height, width, channels = img_array.shape
-        rgba_array = np.zeros((height, width, 4), dtype=np.uint8)
-        rgba_array[:, :, :3] = img_array
-        rgba_array[:, :, 3] = 255
-        
-        # 하얀색 픽셀 찾기
-        threshold = self.threshold_var.get()
-        white_mask = (img_array[:, :, 0] >= threshold) & \
-                     (img_array[:, :, 1] >= threshold) & \
-                     (img_array[:, :, 2] >= threshold)
-        
-        # 그림자 제거 추가 처리
-        if self.shadow_removal_var.get():
-            # 회색 계열 (그림자) 제거
-            shadow_threshold = self.shadow_threshold_var.get()
-            gray_diff = np.abs(img_array[:, :, 0].astype(int) - img_array[:, :, 1]) + \
-                       np.abs(img_array[:, :, 1].astype(int) - img_array[:, :, 2]) + \
-                       np.abs(img_array[:, :, 0].astype(int) - img_array[:, :, 2])
-            
-            shadow_mask = (gray_diff < 30) & \
-                         (img_array[:, :, 0] > shadow_threshold) & \
-                         (img_array[:, :, 1] > shadow_threshold) & \
-                         (img_array[:, :, 2] > shadow_threshold)
-            
-            white_mask = white_mask | shadow_mask
+        """기존 방식의 배경 제거 (현재 설정값 사용)"""
+        return standard_background_removal(img_array, self.get_settings())
+    
+    def post_process_image(self, result_img):
+        """이미지 후처리 (현재 설정값 사용)"""
+        return post_process_image(result_img, self.get_settings())
+    
+    @property
+    def original_image(self):
+        """원본 해상도 이미지 (백그라운드 디코딩이 안 끝났으면 기다림)"""
+        if self.original_future is None:
+            return None
+        return self.original_future.result()
+    
+    def source_image(self):
+        """처리할 원본 해상도 이미지 (영역을 골랐으면 그 부분만)"""
+        if self.roi is None:
+            return self.original_image
+        return self.original_image.crop(self.roi)
+    
+    def source_key(self, kind='full'):
+        """단계별 캐시에서 처리할 원본을 구분하는 값 (이미지와 선택 영역 기준)"""
+        return (kind, self.image_token, self.roi)
+    
+    def preview_source(self):
+        """슬라이더 조절 중 미리보기에 쓸 (축소본, 원본 대비 배율)"""
+        if self.roi_proxy is not None:
+            return self.roi_proxy
+        return self.proxy_image, self.proxy_scale
+    
+    def on_roi_press(self, event):
+        """영역 선택 시작"""
+        if self.display_box is None or self.proxy_image is None:
+            return
+        self.drag_start = self.clamp_to_display(event.x, event.y)
+        self.preview_canvas.delete('roi')
+        self.preview_canvas.create_rectangle(*self.drag_start, *self.drag_start,
+                                             outline='red', dash=(4, 2), tags='roi')
+    
+    def on_roi_drag(self, event):
+        """끄는 동안 선택 사각형 표시"""
+        if self.drag_start is None:
+            return
+        self.preview_canvas.coords('roi', *self.drag_start,
+                                   *self.clamp_to_display(event.x, event.y))
+    
+    def on_roi_release(self, event):
+        """선택한 사각형을 원본 좌표로 바꿔서 그 영역만 처리"""
+        if self.drag_start is None:
+            return
+        (x0, y0), (x1, y1) = self.drag_start, self.clamp_to_display(event.x, event.y)
+        self.drag_start = None
+        self.preview_canvas.delete('roi')
+        if abs(x1 - x0) < ROI_MIN_DRAG or abs(y1 - y0) < ROI_MIN_DRAG:
+            # 클릭만 했거나 너무 작으면 무시
+            return
         
-        rgba_array[white_mask, 3] = 0
+        # 지금 보이는 이미지는 현재 영역(없으면 전체)을 미리보기 크기로 줄인 것
+        left, top, right, bottom = self.roi or (0, 0) + tuple(self.full_size)
+        box_x, box_y, box_width, box_height = self.display_box
+        ratio_x = (right - left) / box_width
+        ratio_y = (bottom - top) / box_height
+        region = (left + (min(x0, x1) - box_x) * ratio_x,
+                  top + (min(y0, y1) - box_y) * ratio_y,
+                  left + (max(x0, x1) - box_x) * ratio_x,
+                  top + (max(y0, y1) - box_y) * ratio_y)
+        self.set_roi(clamp_region(region, self.full_size))
+    
+    def clamp_to_display(self, x, y):
+        """미리보기 창 좌표를 표시된 이미지 안으로 제한"""
+        box_x, box_y, box_width, box_height = self.display_box
+        return (min(max(x, box_x), box_x + box_width),
+                min(max(y, box_y), box_y + box_height))
+    
+    def set_roi(self, roi):
+        """처리 영역을 바꾸고 (None이면 전체) 미리보기와 원본 해상도 처리를 다시 함"""
+        self.cancel_processing()
+        self.roi = roi
+        self.roi_proxy = None
+        if roi is not None:
+            if self.original_future.done():
+                # 원본이 이미 있으면 선명한 미리보기를 원본에서 만듦
+                self.roi_proxy = region_proxy(self.original_image, roi)
+            else:
+                self.roi_proxy = region_proxy(self.proxy_image, roi, self.proxy_scale)
+        self.processed_image = None
+        self.processed_settings = None
+        self.update_roi_label()
         
-        result_img = Image.fromarray(rgba_array, 'RGBA')
-        return self.post_process_image(result_img)
+        self.preview_proxy()
+        self.process_image()
     
-    def post_process_image(self, result_img):
-        """이미지 후처리"""
-        # 가장자리 부드럽게 하기
-        if self.blur_var.get() > 0:
-            alpha = result_img.split()[3]
-            alpha_blurred = alpha.filter(ImageFilter.GaussianBlur(self.blur_var.get()))
-            result_img.putalpha(alpha_blurred)
-        
-        # 가장자리 매끄럽게 하기
-        if self.edge_smooth_var.get() > 0:
-            alpha = result_img.split()[3]
-            for _ in range(self.edge_smooth_var.get()):
-                alpha = alpha.filter(ImageFilter.SMOOTH)
-            result_img.putalpha(alpha)
-        
-        return result_img
+    def clear_roi(self):
+        """선택 영역 해제 (전체 이미지 처리)"""
+        if self.roi is not None:
+            self.set_roi(None)
+    
+    def update_roi_label(self):
+        """선택 영역 표시 갱신"""
+        if self.roi is None:
+            self.roi_label.config(text="처리 영역: 전체 (미리보기에서 끌어서 서명 부분만 선택)")
+            return
+        left, top, right, bottom = self.roi
+        percent = (right - left) * (bottom - top) / (self.full_size[0] * self.full_size[1]) * 100
+        self.roi_label.config(text=f"처리 영역: ({left}, {top}) {right - left}x{bottom - top} "
+                                   f"(전체의 {percent:.1f}%)")
     
     def process_image(self):
-        """배경 제거 처리"""
-        if self.original_image is None:
+        """배경 제거 처리 (작업 스레드에 요청, 결과는 poll_worker에서 표시)"""
+        if self.original_future is None:
             messagebox.showwarning("경고", "먼저 이미지를 업로드해주세요.")
             return
         
+        self.cancel_setting_change()
+        self.requested_settings = self.get_settings()
+        # 원본 디코딩이 아직이면 작업 스레드에서 기다림 (UI는 멈추지 않음)
+        self.worker.submit(run_pipeline_loaded, self.original_future, self.requested_settings,
+                           self.pipeline_cache, self.source_key(),
+                           disk_cache=self.active_disk_cache(), region=self.roi)
+        self.set_busy('process', True)
+        
+        if self.poll_after is None:
+            self.poll_after = self.root.after(30, self.poll_worker)
+    
+    def poll_worker(self):
+        """작업 스레드의 결과를 UI 스레드에서 받아 표시"""
+        finished = self.worker.poll()
+        if finished is None:
+            self.poll_after = self.root.after(30, self.poll_worker)
+            return
+        
+        self.poll_after = None
+        self.set_busy('process', False)
+        _, result, error = finished
+        
+        if error is not None:
+            messagebox.showerror("오류", f"이미지 처리 중 오류가 발생했습니다:\n{str(error)}")
+            return
+        
+        self.processed_image = result
+        self.processed_settings = self.requested_settings
+        
+        # 결과 표시
+        self.display_image(self.processed_image)
+        self.show_trace('pipeline', 'display')
+    
+    def set_busy(self, job, busy):
+        """job('process'/'tune')의 처리 중 표시 켜기/끄기 (다른 작업이 남아 있으면 계속 표시)"""
+        if busy:
+            self.busy_jobs.add(job)
+        else:
+            self.busy_jobs.discard(job)
+        
+        if self.busy_jobs:
+            self.busy_label.config(text="처리 중...")
+            self.busy_bar.pack(side=tk.LEFT, padx=10)
+            self.busy_bar.start(10)
+        else:
+            self.busy_label.config(text="")
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+    
+    def active_disk_cache(self):
+        """원본 해상도 처리에 쓸 디스크 캐시 (꺼져 있으면 None)"""
+        return self.disk_cache if self.disk_cache_var.get() else None
+    
+    def clear_disk_cache(self):
+        """디스크 캐시에 저장된 처리 결과 모두 삭제"""
+        if not messagebox.askyesno("캐시 비우기", f"저장된 처리 결과를 모두 지울까요?\n"
+                                               f"({self.disk_cache.directory})"):
+            return
         try:
-            # 배경 제거
-            self.processed_image = self.remove_white_background(self.original_image)
-            
-            # 결과 표시
-            self.display_image(self.processed_image)
-            
-        except Exception as e:
-            messagebox.showerror("오류", f"이미지 처리 중 오류가 발생했습니다:\n{str(e)}")
+            self.disk_cache.clear()
+        except OSError as e:
+            messagebox.showerror("오류", f"캐시를 지우는 중 오류가 발생했습니다:\n{str(e)}")
+    
+    def toggle_trace(self):
+        """단계별 시간 측정 켜기/끄기 (끄면 기록도 버림)"""
+        set_tracer(StageTracer() if self.trace_var.get() else None)
+        self.trace_label.config(text="")
+    
+    def show_trace(self, *names):
+        """측정 중이면 마지막 단계별 시간을 상태 표시줄에 표시"""
+        tracer = get_tracer()
+        if tracer is None:
+            return
+        parts = [tracer.describe(name) for name in names]
+        self.trace_label.config(text=" · ".join(part for part in parts if part))
+    
+    def save_trace(self):
+        """단계별 시간 측정 기록을 JSON 파일로 저장 (chrome://tracing 등에서 열 수 있음)"""
+        tracer = get_tracer()
+        if tracer is None:
+            messagebox.showwarning("경고", "먼저 단계별 시간 측정을 켜고 이미지를 처리해주세요.")
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            title="측정 기록 저장",
+            defaultextension=".json",
+            filetypes=[("JSON 파일", "*.json")]
+        )
+        
+        if file_path:
+            try:
+                tracer.dump(file_path)
+                messagebox.showinfo("저장 완료", f"측정 기록이 저장되었습니다:\n{file_path}")
+            except Exception as e:
+                messagebox.showerror("저장 실패", f"파일 저장 중 오류가 발생했습니다:\n{str(e)}")
+    
+    def cancel_processing(self):
+        """대기 중이거나 실행 중인 처리 결과를 무시"""
+        self.cancel_setting_change()
+        self.worker.cancel()
+        if self.poll_after is not None:
+            self.root.after_cancel(self.poll_after)
+            self.poll_after = None
+            self.set_busy('process', False)
+    
+    def cancel_setting_change(self):
+        """예약된 지연 처리 취소"""
+        if self.setting_change_after is not None:
+            self.root.after_cancel(self.setting_change_after)
+            self.setting_change_after = None
     
     def reset_image(self):
         """원본 이미지로 되돌리기"""
-        if self.original_image is None:
+        if self.original_future is None:
             messagebox.showwarning("경고", "원본 이미지가 없습니다.")
             return
         
-        self.display_image(self.original_image)
+        self.cancel_processing()
+        # 화면에는 어차피 축소해서 보여주므로 축소본으로 충분
+        self.display_image(self.preview_source()[0])
         self.processed_image = None
+        self.processed_settings = None
     
     def auto_optimize_lines(self):
-        """선만 추출을 위한 자동 최적화"""
-        if self.original_image is None:
+        """선만 추출을 위한 자동 최적화 (표본 행의 잉크/종이 밝기로 설정값 추정)"""
+        # 부드럽게 처리 (가장자리 설정은 고정, 나머지는 이미지 분석으로 추정)
+        base = self.get_settings().replace(blur=1, edge_smooth=1)
+        self.start_auto(lambda img: (estimate_settings(img, True, base),
+                                     "선 추출 최적화가 완료되었습니다!"))
+    
+    def auto_optimize(self):
+        """일반 자동 최적화 (표본 행의 잉크/종이 밝기로 설정값 추정)"""
+        base = self.get_settings().replace(blur=1, edge_smooth=2)
+        self.start_auto(lambda img: (estimate_settings(img, False, base),
+                                     "일반 자동 최적화가 완료되었습니다!"))
+    
+    def auto_tune(self):
+        """자동 튜닝 (추정값 주변 설정들을 축소본에서 병렬로 비교해 가장 좋은 설정 적용)
+        
+        현재 모드(선만 추출/일반)와 그림자 제거 방식 등은 그대로 두고 밝기, 대비, 두 강도,
+        가장자리 설정을 고릅니다.
+        """
+        settings = self.get_settings()
+        
+        def tune(img):
+            tuned, score = tune_settings(img, settings.line_only, settings)
+            return tuned, f"자동 튜닝이 완료되었습니다! (점수 {score:.2f} / 1.00)"
+        
+        self.start_auto(tune)
+    
+    def start_auto(self, compute):
+        """원본 해상도 이미지로 설정값을 구하는 작업을 별도 스레드에서 실행
+        
+        compute(이미지)는 (설정값, 완료 메시지)를 돌려줍니다. 원본 디코딩을 기다리는 것도
+        별도 스레드에서 하므로 UI가 멈추지 않으며, 결과는 poll_tune에서 받습니다.
+        """
+        if self.original_future is None:
             messagebox.showwarning("경고", "먼저 이미지를 업로드해주세요.")
             return
+        if self.tune_future is not None:
+            return
         
-        # 선 추출 모드 활성화
-        self.line_only_var.set(True)
-        self.shadow_removal_var.set(True)
-        
-        # 이미지 분석
-        img_array = np.array(self.original_image)
-        gray = np.dot(img_array[...,:3], [0.2989, 0.5870, 0.1140])
-        avg_brightness = np.mean(gray)
-        contrast_level = np.std(gray)
-        
-        # 선 추출에 최적화된 설정
-        if contrast_level < 30:  # 대비가 낮은 경우
-            self.contrast_var.set(3.0)
-            self.brightness_var.set(1.2)
-            self.shadow_threshold_var.set(180)
-        elif contrast_level < 60:  # 보통 대비
-            self.contrast_var.set(2.5)
-            self.brightness_var.set(1.1)
-            self.shadow_threshold_var.set(160)
-        else:  # 대비가 높은 경우
-            self.contrast_var.set(2.0)
-            self.brightness_var.set(1.0)
-            self.shadow_threshold_var.set(140)
-        
-        # 밝기에 따른 임계값 조정
-        if avg_brightness > 200:
-            self.threshold_var.set(240)
-        elif avg_brightness > 150:
-            self.threshold_var.set(220)
-        else:
-            self.threshold_var.set(200)
+        def run(future, region):
+            img = future.result()
+            if region is not None:
+                img = img.crop(region)
+            return compute(img)
         
-        # 부드럽게 처리
-        self.blur_var.set(1)
-        self.edge_smooth_var.set(1)
+        self.tune_token = self.source_key()
+        self.tune_future = self.tuner.submit(run, self.original_future, self.roi)
+        self.set_busy('tune', True)
+        self.root.after(50, self.poll_tune)
+    
+    def poll_tune(self):
+        """자동 최적화/튜닝 결과를 UI 스레드에서 받아 설정값에 반영하고 처리"""
+        if not self.tune_future.done():
+            self.root.after(50, self.poll_tune)
+            return
         
-        # 처리 실행
+        future, self.tune_future = self.tune_future, None
+        self.set_busy('tune', False)
+        try:
+            settings, message = future.result()
+        except Exception as e:
+            messagebox.showerror("오류", f"자동 최적화 중 오류가 발생했습니다:\n{str(e)}")
+            return
+        # 도중에 다른 이미지를 열었거나 처리 영역을 바꿨으면 버림
+        if self.tune_token != self.source_key():
+            return
+        
+        self.apply_settings(settings)
         self.process_image()
-        messagebox.showinfo("완료", "선 추출 최적화가 완료되었습니다!")
+        self.show_trace('auto_settings', 'auto_tune')
+        messagebox.showinfo("완료", message)
     
-    def auto_optimize(self):
-        """일반 자동 최적화"""
-        if self.original_image is None:
-            messagebox.showwarning("경고", "먼저 이미지를 업로드해주세요.")
+    def on_setting_change(self, event=None):
+        """설정값 변경 시 원본 해상도로 처리 (슬라이더를 놓았을 때, 체크박스 변경 시)"""
+        if self.original_future is not None:
+            # 약간의 지연을 두고 처리 (연속 변경은 마지막 한 번만 처리)
+            self.cancel_setting_change()
+            self.setting_change_after = self.root.after(100, self.process_image)
+    
+    def on_setting_drag(self, event=None):
+        """슬라이더를 끄는 동안 축소본으로 빠르게 미리보기"""
+        if self.proxy_image is None:
             return
         
-        # 일반 모드
-        self.line_only_var.set(False)
-        self.shadow_removal_var.set(True)
-        
-        # 이미지 분석해서 최적값 설정
-        img_array = np.array(self.original_image)
-        avg_brightness = np.mean(img_array)
-        
-        if avg_brightness > 200:  # 매우 밝은 이미지
-            self.threshold_var.set(220)
-            self.contrast_var.set(2.0)
-            self.shadow_threshold_var.set(170)
-        elif avg_brightness > 150:  # 보통 밝기
-            self.threshold_var.set(200)
-            self.contrast_var.set(1.5)
-            self.shadow_threshold_var.set(150)
-        else:  # 어두운 이미지
-            self.threshold_var.set(180)
-            self.contrast_var.set(2.5)
-            self.shadow_threshold_var.set(130)
-        
-        # 기본값
-        self.brightness_var.set(1.0)
-        self.blur_var.set(1)
-        self.edge_smooth_var.set(2)
-        
-        # 처리 실행
-        self.process_image()
-        messagebox.showinfo("완료", "일반 자동 최적화가 완료되었습니다!")
+        # 이전 설정으로 요청한 원본 처리 결과는 더 이상 필요 없음
+        self.cancel_processing()
+        self.preview_proxy()
     
-    def on_setting_change(self, event):
-        """설정값 변경 시 실시간 처리"""
-        if self.original_image is not None:
-            # 약간의 지연을 두고 처리 (너무 빠른 처리 방지)
-            self.root.after(100, self.process_image)
+    def preview_proxy(self):
+        """현재 설정으로 축소본을 처리해서 바로 표시"""
+        try:
+            proxy, scale = self.preview_source()
+            result = run_pipeline(proxy, self.get_settings(), self.pipeline_cache,
+                                  self.source_key('proxy'), scale=scale)
+            self.display_image(result)
+            self.show_trace('pipeline', 'display')
+        except Exception as e:
+            messagebox.showerror("오류", f"이미지 처리 중 오류가 발생했습니다:\n{str(e)}")
     
-    def save_image(self):
-        """투명 배경 PNG로 저장"""
-        if self.processed_image is None:
+    def ensure_processed(self):
+        """저장 전에 현재 설정으로 만든 원본 해상도 결과가 있는지 확인"""
+        if self.processed_image is None and self.poll_after is None:
             messagebox.showwarning("경고", "먼저 배경 제거 처리를 해주세요.")
+            return False
+        
+        # 처리 중이거나 미리보기만 갱신된 상태라면 원본 해상도로 다시 처리 (저장은 기다려야 하므로 바로 실행)
+        settings = self.get_settings()
+        if self.processed_image is None or self.processed_settings != settings:
+            self.cancel_processing()
+            try:
+                self.processed_image = run_pipeline_loaded(self.original_future, settings,
+                                                           self.pipeline_cache, self.source_key(),
+                                                           disk_cache=self.active_disk_cache(),
+                                                           region=self.roi)
+                self.processed_settings = settings
+            except Exception as e:
+                messagebox.showerror("오류", f"이미지 처리 중 오류가 발생했습니다:\n{str(e)}")
+                return False
+            self.display_image(self.processed_image)
+        
+        return True
+    
+    def output_image(self):
+        """저장할 결과 이미지 (빈 여백 자르기를 켰으면 내용 부분만)"""
+        if not self.crop_var.get():
+            return self.processed_image
+        try:
+            padding = max(0, self.crop_padding_var.get())
+        except tk.TclError:
+            # 여백 칸이 비었거나 숫자가 아니면 기본값
+            padding = DEFAULT_CROP_PADDING
+        return crop_to_content(self.processed_image, padding)
+    
+    def save_image(self):
+        """투명 배경 이미지로 저장 (선택한 저장 형식 사용)"""
+        if not self.ensure_processed():
             return
         
+        fmt = next(key for key, label in EXPORT_FORMATS.items()
+                   if label == self.export_format_var.get())
+        extension = EXPORT_EXTENSIONS[fmt]
+        try:
+            compress_level = min(9, max(0, self.compress_level_var.get()))
+        except tk.TclError:
+            # 압축 수준 칸이 비었거나 숫자가 아니면 기본값
+            compress_level = DEFAULT_COMPRESS_LEVEL
+        
         file_path = filedialog.asksaveasfilename(
             title="투명 배경 이미지 저장",
-            defaultextension=".png",
-            filetypes=[("PNG 파일", "*.png")]
+            defaultextension=extension,
+            filetypes=[(f"{extension[1:].upper()} 파일", f"*{extension}")]
         )
         
         if file_path:
             try:
-                self.processed_image.save(file_path, "PNG")
-                messagebox.showinfo("저장 완료", f"투명 배경 이미지가 저장되었습니다:\n{file_path}")
+                with trace_stage('save', format=fmt):
+                    size, elapsed = export_image(self.output_image(), file_path, fmt,
+                                                 compress_level)
+                self.show_trace('save')
+                report = f"{format_size(size)}, 인코딩 {elapsed * 1000:.0f} ms"
+                self.save_report_label.config(text=f"마지막 저장: {report}")
+                messagebox.showinfo("저장 완료", f"투명 배경 이미지가 저장되었습니다:\n{file_path}\n"
+                                               f"({EXPORT_FORMATS[fmt]}, {report})")
             except Exception as e:
                 messagebox.showerror("저장 실패", f"파일 저장 중 오류가 발생했습니다:\n{str(e)}")
     
@@ -511,9 +952,16 @@ class BackgroundRemover:
 2. 자동으로 첫 처리가 실행됩니다
 3. 결과가 만족스러우면 바로 저장하세요
 
+✂️ 서명 부분만 처리하기
+• 미리보기에서 마우스로 끌어 서명/도장 부분을 고르면 그 영역만 처리하고 저장합니다
+  (문서 전체 사진에서 훨씬 빠름, 설정을 바꿔도 영역은 유지)
+• 영역을 고른 상태에서 다시 끌면 그 안에서 더 좁게 고를 수 있습니다
+• "선택 영역 해제"를 누르면 전체 이미지로 돌아갑니다
+
 ⚙️ 그림자가 있는 경우
 1. "선만 추출 (그림자 제거)" ✅ 체크
 2. "그림자 제거 강화" ✅ 체크
+   (그림자 제거 방식: "조명 평탄화"가 기본, 예전 방식은 "지역 평균")
 3. "선만 추출 최적화" 버튼 클릭
 4. 결과 확인 후 세부 조정
 
@@ -524,20 +972,32 @@ class BackgroundRemover:
 • 밝기 조절: 0.5~2.0 (1.0이 원본)
 • 가장자리 부드럽게: 0~5 (높을수록 부드럽게)
 • 가장자리 매끄럽게: 0~5 (높을수록 매끄럽게)
+• 잡티 제거 크기: 0~200 (이 픽셀 수보다 작은 점 먼지 제거, 0이면 끔)
+• 남길 잉크 색: 빨간 도장이 인쇄된 글자 위에 찍혀 있으면 "빨간 잉크 (도장)"를 고르세요
+  (파란 펜 서명만 남기려면 "파란 잉크", 검은 글씨만 남기려면 "검은 잉크")
+• 투명도: "연속 알파"를 고르면 선 가장자리의 밝기로 반투명 값을 계산해서
+  더 부드럽고 빠르게 처리합니다 (가장자리 두 설정은 흐림 한 번으로 합쳐짐)
 
 💡 최적화 버튼 활용
 • "선만 추출 최적화": 서명/도장 선만 깔끔하게
 • "일반 자동 최적화": 기존 방식 배경 제거
+• "자동 튜닝": 여러 설정을 비교해 가장 깔끔한 결과를 골라줌 (1~2초, 현재 모드 유지)
 
 💾 저장 옵션
-• "투명 배경 PNG로 저장": 진짜 전자 서명/도장용
+• "투명 배경으로 저장": 진짜 전자 서명/도장용
+  - 저장 형식: 투명 PNG / 팔레트 PNG(더 작음) / 1비트 마스크 PNG(가장 작음, 단색) / 무손실 WebP
+  - 압축 수준: 0~9 (높을수록 작지만 느림), 저장 후 크기와 인코딩 시간 표시
 • "흰색 배경 JPG로 저장": 일반 문서용
+• "빈 여백 자르기": 서명/도장 주변만 남기고 저장 (여백 px만큼 띄움)
 
 ⚠️ 문제 해결
+• 종이 먼지/점이 남으면: 잡티 제거 크기를 높이세요 (가는 선은 깎이지 않음)
 • 선이 잘려나가면: 배경 제거 강도를 낮추세요
 • 배경이 남아있으면: 그림자 제거 강도를 낮추세요
 • 선이 흐리면: 대비 강화를 높이세요
 • 가장자리가 거칠면: 부드럽게/매끄럽게 값을 높이세요
+• 처리가 느리면: "단계별 시간 측정"을 켜면 미리보기 아래에 단계별 시간이 표시되고,
+  "측정 기록 저장(JSON)"으로 저장한 파일은 chrome://tracing 등에서 열 수 있습니다
 
 📋 권장 설정 (그림자 있는 경우)
 • 선만 추출: ✅
@@ -565,8 +1025,7 @@ class BackgroundRemover:
     
     def save_image_white_bg(self):
         """흰색 배경 JPG로 저장"""
-        if self.processed_image is None:
-            messagebox.showwarning("경고", "먼저 배경 제거 처리를 해주세요.")
+        if not self.ensure_processed():
             return
         
         file_path = filedialog.asksaveasfilename(
@@ -577,14 +1036,17 @@ class BackgroundRemover:
         
         if file_path:
             try:
-                # 흰색 배경 추가
-                white_bg = Image.new('RGB', self.processed_image.size, (255, 255, 255))
-                white_bg.paste(self.processed_image, mask=self.processed_image.split()[3])
-                
-                if file_path.lower().endswith('.jpg') or file_path.lower().endswith('.jpeg'):
-                    white_bg.save(file_path, "JPEG", quality=95)
-                else:
-                    white_bg.save(file_path, "PNG")
+                with trace_stage('save_white_bg'):
+                    # 흰색 배경 추가 (여백을 먼저 잘라서 합성할 영역을 줄임)
+                    output = self.output_image()
+                    white_bg = Image.new('RGB', output.size, (255, 255, 255))
+                    white_bg.paste(output, mask=output.getchannel('A'))
+                    
+                    if file_path.lower().endswith('.jpg') or file_path.lower().endswith('.jpeg'):
+                        white_bg.save(file_path, "JPEG", quality=95)
+                    else:
+                        white_bg.save(file_path, "PNG")
+                self.show_trace('save_white_bg')
                 
                 messagebox.showinfo("저장 완료", f"흰색 배경 이미지가 저장되었습니다:\n{file_path}")
             except Exception as e:
@@ -0,0 +1,401 @@
+"""누끼따기 배경 제거 HTTP 서버 (로컬 전용)
+
+다른 도구에서 tkinter 없이 스캔 이미지를 보내고 투명 PNG(또는 WebP)를 받을 수 있습니다.
+요청은 정해진 수의 작업자 프로세스에서 처리하며, 처리 중인 요청과 대기 중인 요청이
+한도를 넘으면 바로 503(Retry-After)으로 거절합니다. 지연 시간과 대기열 길이는
+/metrics에서 JSON으로 볼 수 있습니다.
+
+사용 예:
+    python 배경제거_서버.py --port 8765 -j 4
+    python 배경제거_서버.py --port 8765 --cache
+    curl --data-binary @scan.jpg "http://127.0.0.1:8765/remove?preset=lines&crop=16" -o scan.png
+    curl --data-binary @scan.jpg "http://127.0.0.1:8765/remove?alpha_mode=soft&format=webp" -o scan.webp
+    curl http://127.0.0.1:8765/metrics
+
+/remove 요청 인자 (모두 선택):
+    preset          설정 프리셋 이름 (default, lines, standard)
+    항목=값          개별 설정값 (threshold, alpha_mode 등 일괄 처리의 --set과 같음)
+    format          저장 형식 (png, png_palette, png_mask, webp)
+    compress_level  압축 수준 0-9
+    crop            지정하면 투명한 여백을 잘라내고 이만큼(px) 여백을 남김
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from 배경제거_엔진 import (DEFAULT_COMPRESS_LEVEL, DEFAULT_DISK_CACHE_BYTES, EXPORT_FORMATS,
+                       PRESETS, RemovalSettings, crop_to_content, default_cache_dir,
+                       export_image, open_image, remove_white_background,
+                       remove_white_background_cached)
+from 배경제거_일괄처리 import load_settings, worker_disk_cache
+
+DEFAULT_PORT = 8765
+# 작업자가 모두 바쁠 때 기다릴 수 있는 요청 수 (넘으면 503)
+DEFAULT_QUEUE_SIZE = 8
+# 받을 수 있는 업로드 최대 크기 (MB)
+DEFAULT_MAX_UPLOAD_MB = 64
+# 요청 하나를 기다리는 최대 시간 (초, 넘으면 504)
+DEFAULT_TIMEOUT = 120
+# 503 응답의 Retry-After (초)
+RETRY_AFTER_SECONDS = 1
+# 결과를 보낼 때 한 번에 쓰는 크기
+STREAM_CHUNK_BYTES = 64 * 1024
+# 지연 시간 백분위를 계산할 최근 요청 수
+LATENCY_WINDOW = 1000
+# 저장 형식별 Content-Type
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'png_palette': 'image/png',
+    'png_mask': 'image/png',
+    'webp': 'image/webp',
+}
+
+
+class UnreadableImageError(Exception):
+    """업로드된 내용을 이미지로 읽을 수 없음 (형식을 모르거나 잘리거나 깨진 파일, 400)"""
+
+
+def remove_background_bytes(data, settings, fmt, compress_level, crop_padding,
+                            cache_config=None):
+    """작업자 프로세스에서 업로드된 이미지 한 장 처리
+
+    (결과 파일 내용, 처리 초, 디스크 캐시 사용 여부)를 반환합니다.
+    cache_config는 (폴더, 최대 크기, 마스크 저장)이며 None이면 캐시를 쓰지 않습니다.
+    이미지를 읽지 못하면 UnreadableImageError를 냅니다.
+    """
+    start = time.perf_counter()
+    try:
+        img = open_image(io.BytesIO(data))
+        # 잘린 파일은 픽셀을 읽을 때 오류가 나므로 처리 전에 모두 읽어 둠
+        img.load()
+    except OSError as e:
+        raise UnreadableImageError(str(e)) from None
+    cached = False
+    if cache_config is not None:
+        cache = worker_disk_cache(cache_config)
+        hits = cache.hits
+        result = remove_white_background_cached(img, settings, cache)
+        cached = cache.hits > hits
+    else:
+        result = remove_white_background(img, settings)
+    if crop_padding is not None:
+        result = crop_to_content(result, crop_padding)
+    output = io.BytesIO()
+    export_image(result, output, fmt, compress_level)
+    return output.getvalue(), time.perf_counter() - start, cached
+
+
+def parse_int(name, text):
+    """요청 인자의 정수 값, 정수가 아니면 ValueError"""
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f"{name}: 정수가 아닙니다 ({text})") from None
+
+
+def parse_options(query):
+    """요청 인자에서 (설정, 저장 형식, 압축 수준, 자르기 여백) 만들기, 잘못되면 ValueError"""
+    params = dict(parse_qsl(query, keep_blank_values=True))
+    preset = params.pop('preset', 'default')
+    if preset not in PRESETS:
+        # 서버에서는 JSON 파일 경로 프리셋을 받지 않음
+        raise ValueError(f"프리셋을 찾을 수 없습니다: {preset} "
+                         f"(사용 가능: {', '.join(PRESETS)})")
+
+    fmt = params.pop('format', 'png')
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"알 수 없는 저장 형식입니다: {fmt} "
+                         f"(사용 가능: {', '.join(EXPORT_FORMATS)})")
+
+    compress_level = parse_int('compress_level',
+                               params.pop('compress_level', DEFAULT_COMPRESS_LEVEL))
+    if not 0 <= compress_level <= 9:
+        raise ValueError("compress_level은 0에서 9 사이여야 합니다.")
+
+    crop_padding = params.pop('crop', None)
+    if crop_padding is not None:
+        crop_padding = parse_int('crop', crop_padding)
+        if crop_padding < 0:
+            raise ValueError("crop은 0 이상이어야 합니다.")
+
+    unknown = set(params) - set(RemovalSettings.field_names())
+    if unknown:
+        raise ValueError(f"알 수 없는 요청 인자: {', '.join(sorted(unknown))}")
+    settings = load_settings(preset, [f"{key}={value}" for key, value in params.items()])
+    return settings, fmt, compress_level, crop_padding
+
+
+def percentiles(values):
+    """지연 시간 목록(초)의 p50/p90/p99/최대값 (밀리초)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        'p50_ms': pick(0.5) * 1000,
+        'p90_ms': pick(0.9) * 1000,
+        'p99_ms': pick(0.99) * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+class ServiceMetrics:
+    """요청 수, 처리 중/대기 중 요청 수, 최근 지연 시간 기록 (여러 스레드에서 사용)"""
+
+    def __init__(self, workers, capacity):
+        self.workers = workers
+        self.capacity = capacity
+        self.started = time.time()
+        self.counts = {'requests': 0, 'completed': 0, 'rejected': 0, 'client_errors': 0,
+                       'server_errors': 0, 'cache_hits': 0}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.latency = deque(maxlen=LATENCY_WINDOW)
+        self.processing = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def end(self, latency=None, processing=None):
+        with self._lock:
+            self.in_flight -= 1
+            if latency is not None:
+                self.latency.append(latency)
+                self.processing.append(processing)
+
+    def snapshot(self):
+        """/metrics 응답 내용"""
+        with self._lock:
+            latency = list(self.latency)
+            processing = list(self.processing)
+            return {
+                'uptime_seconds': time.time() - self.started,
+                'workers': self.workers,
+                'capacity': self.capacity,
+                'in_flight': self.in_flight,
+                # 작업자 수를 넘는 요청은 작업자 풀 대기열에서 기다리는 중
+                'queue_depth': max(0, self.in_flight - self.workers),
+                'max_in_flight': self.max_in_flight,
+                **self.counts,
+                'latency': percentiles(latency),
+                'processing': percentiles(processing),
+                'queue_wait': percentiles([total - work
+                                           for total, work in zip(latency, processing)]),
+            }
+
+
+class RemovalServer(ThreadingHTTPServer):
+    """배경 제거 요청을 작업자 프로세스 풀에 넘기는 HTTP 서버
+
+    처리 중 + 대기 중인 요청 수는 workers + queue_size를 넘지 않으며, 넘는 요청은
+    작업자 풀에 넣지 않고 바로 거절합니다.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, workers, queue_size=DEFAULT_QUEUE_SIZE,
+                 max_upload=DEFAULT_MAX_UPLOAD_MB * 1024 * 1024, timeout=DEFAULT_TIMEOUT,
+                 verbose=False, cache_config=None):
+        super().__init__(address, RemovalRequestHandler)
+        # 요청 처리 스레드에서 fork하지 않도록 spawn으로 작업자 생성
+        self.pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.metrics = ServiceMetrics(workers, workers + queue_size)
+        self.max_upload = max_upload
+        self.request_timeout = timeout
+        self.verbose = verbose
+        self.cache_config = cache_config
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+class RemovalRequestHandler(BaseHTTPRequestHandler):
+    """/remove(POST), /metrics(GET), /health(GET) 처리"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'BackgroundRemover/1.0'
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/metrics':
+            self.send_json(200, self.server.metrics.snapshot())
+        elif path == '/health':
+            self.send_json(200, {'status': 'ok'})
+        else:
+            self.send_json(404, {'error': f"없는 경로입니다: {path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/remove':
+            self.close_connection = True
+            self.send_json(404, {'error': f"없는 경로입니다: {url.path}"})
+            return
+
+        start = time.perf_counter()
+        metrics = self.server.metrics
+        metrics.count('requests')
+
+        length = self.headers.get('Content-Length')
+        if length is None:
+            metrics.count('client_errors')
+            self.close_connection = True
+            self.send_json(411, {'error': "Content-Length가 필요합니다."})
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            metrics.count('client_errors')
+            self.close_connection = True
+            self.send_json(400, {'error': f"Content-Length가 숫자가 아닙니다: {length}"})
+            return
+        if length <= 0 or length > self.server.max_upload:
+            metrics.count('client_errors')
+            self.close_connection = True
+            self.send_json(413, {'error': f"업로드 크기는 1바이트 이상 "
+                                          f"{self.server.max_upload} 바이트 이하여야 합니다."})
+            return
+        data = self.rfile.read(length)
+
+        try:
+            options = parse_options(url.query)
+        except ValueError as e:
+            metrics.count('client_errors')
+            self.send_json(400, {'error': str(e)})
+            return
+
+        # 처리 중 + 대기 중 요청이 한도를 넘으면 작업자 풀에 넣지 않고 거절
+        if not self.server.slots.acquire(blocking=False):
+            metrics.count('rejected')
+            self.send_json(503, {'error': "서버가 바쁩니다. 잠시 후 다시 시도해주세요."},
+                           {'Retry-After': str(RETRY_AFTER_SECONDS)})
+            return
+
+        metrics.begin()
+        latency = processing = None
+        try:
+            try:
+                future = self.server.pool.submit(remove_background_bytes, data, *options,
+                                                 self.server.cache_config)
+            except BaseException:
+                self.server.slots.release()
+                raise
+            # 시간 초과로 응답한 뒤에도 실행 중인 작업은 멈출 수 없으므로, 자리는 작업이
+            # 실제로 끝났을 때(또는 대기 중에 취소됐을 때) 돌려줌
+            future.add_done_callback(lambda _: self.server.slots.release())
+            try:
+                body, processing, cached = future.result(timeout=self.server.request_timeout)
+            except TimeoutError:
+                future.cancel()
+                metrics.count('server_errors')
+                self.send_json(504, {'error': "처리 시간이 너무 오래 걸립니다."})
+                return
+            except UnreadableImageError:
+                metrics.count('client_errors')
+                self.send_json(400, {'error': "이미지 파일을 읽을 수 없습니다."})
+                return
+            except Exception as e:
+                metrics.count('server_errors')
+                self.send_json(500, {'error': f"이미지 처리 중 오류가 발생했습니다: {e}"})
+                return
+
+            if cached:
+                metrics.count('cache_hits')
+            fmt = options[1]
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPES[fmt])
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('X-Processing-Ms', f"{processing * 1000:.1f}")
+            if self.server.cache_config is not None:
+                self.send_header('X-Cache', 'hit' if cached else 'miss')
+            self.end_headers()
+            # 결과를 조각으로 나눠 보냄 (큰 결과도 소켓 버퍼 단위로 바로 흘려보냄)
+            view = memoryview(body)
+            for offset in range(0, len(view), STREAM_CHUNK_BYTES):
+                self.wfile.write(view[offset:offset + STREAM_CHUNK_BYTES])
+            latency = time.perf_counter() - start
+            metrics.count('completed')
+        finally:
+            metrics.end(latency, processing)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 부하 시험 때 화면이 넘치지 않도록 --verbose일 때만 요청마다 출력
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="서명/도장 이미지의 하얀 배경을 제거해 주는 로컬 HTTP 서버를 실행합니다.")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="접속을 받을 주소 (기본: 127.0.0.1, 이 컴퓨터에서만 접속 가능)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f"포트 번호 (기본: {DEFAULT_PORT}, 0이면 빈 포트를 골라 출력)")
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help="작업자 프로세스 수 (기본: CPU 코어 수)")
+    parser.add_argument('--queue', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f"작업자가 모두 바쁠 때 기다릴 수 있는 요청 수, 넘으면 503 "
+                             f"(기본: {DEFAULT_QUEUE_SIZE})")
+    parser.add_argument('--max-upload', type=int, default=DEFAULT_MAX_UPLOAD_MB, metavar='MB',
+                        help=f"업로드 최대 크기 (기본: {DEFAULT_MAX_UPLOAD_MB}MB)")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, metavar='초',
+                        help=f"요청 하나의 최대 처리 시간, 넘으면 504 (기본: {DEFAULT_TIMEOUT}초)")
+    parser.add_argument('--cache', metavar='폴더', nargs='?', const=default_cache_dir(),
+                        help="처리 결과 디스크 캐시 사용 (같은 이미지 + 같은 설정이면 처리 생략, "
+                             f"폴더를 생략하면 {default_cache_dir()})")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_DISK_CACHE_BYTES // 1024 // 1024,
+                        metavar='MB', help="디스크 캐시 최대 크기 (기본: %(default)sMB)")
+    parser.add_argument('--verbose', action='store_true', help="요청마다 접속 기록 출력")
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1:
+        parser.error("-j는 1 이상이어야 합니다.")
+    if args.queue < 0:
+        parser.error("--queue는 0 이상이어야 합니다.")
+
+    cache_config = None
+    if args.cache:
+        cache_config = (args.cache, args.cache_size * 1024 * 1024, False)
+    server = RemovalServer((args.host, args.port), args.jobs, args.queue,
+                           args.max_upload * 1024 * 1024, args.timeout, args.verbose,
+                           cache_config)
+    host, port = server.server_address[:2]
+    print(f"http://{host}:{port}/remove 에서 요청을 기다립니다 "
+          f"(작업자 {args.jobs}개, 대기열 {args.queue}개, 종료: Ctrl+C)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
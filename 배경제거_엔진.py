@@ -0,0 +1,2399 @@
+"""누끼따기 배경 제거 엔진 (화면 없이 사용하는 처리 함수 모음)
+
+tkinter에 의존하지 않으므로 일괄 처리의 작업자 프로세스나 다른 프로그램에서 바로
+가져다 쓸 수 있습니다. 설정값은 RemovalSettings로 전달합니다.
+
+사용 예:
+    from 배경제거_엔진 import PRESETS, open_image, remove_white_background
+    result = remove_white_background(open_image('scan.jpg'), PRESETS['lines'])
+"""
+import contextlib
+import dataclasses
+import functools
+import hashlib
+import json
+import multiprocessing
+import numbers
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, fields
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+
+# False로 바꾸면 scipy가 있어도 없는 것처럼 기본 기능만 사용 (벤치마크의 비교용)
+USE_SCIPY = True
+
+
+def scipy_ndimage():
+    """scipy.ndimage 모듈 (처음 필요할 때 가져오며, scipy가 없거나 끈 경우 None)
+    
+    scipy는 가져오는 데 시간이 꽤 걸리므로 엔진을 가져오는 시점에는 불러오지 않습니다.
+    """
+    if not USE_SCIPY:
+        return None
+    return _import_ndimage()
+
+
+@functools.lru_cache(maxsize=None)
+def _import_ndimage():
+    try:
+        from scipy import ndimage
+    except ImportError:
+        # scipy가 없으면 기본 기능만 사용
+        return None
+    return ndimage
+
+
+# 단계 기록을 켰을 때 보관하는 최대 기록 수 (오래된 것부터 버림)
+TRACE_MAX_EVENTS = 100_000
+
+# 현재 단계 기록기 (None이면 기록하지 않음, set_tracer로 바꿈)
+_tracer = None
+
+
+class StageTracer:
+    """처리 단계별 소요 시간, 결과 크기, 이미지 크기 기록기
+    
+    기록은 Chrome 추적 형식(trace event)의 사전으로 쌓이므로 dump()로 저장한 파일을
+    chrome://tracing이나 Perfetto에서 바로 열 수 있습니다. 여러 스레드에서 동시에
+    기록해도 됩니다. 결과 크기는 단계가 돌려준 배열/이미지의 메모리 크기입니다.
+    """
+    
+    def __init__(self, max_events=TRACE_MAX_EVENTS):
+        self.events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+    
+    @contextlib.contextmanager
+    def stage(self, name, **info):
+        """with 블록 하나를 단계로 기록 (info는 함께 남길 값, 블록 안에서 더 채울 수 있음)"""
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            end = time.perf_counter()
+            event = {
+                'name': name,
+                'ph': 'X',
+                'ts': start * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': info,
+            }
+            with self._lock:
+                self.events.append(event)
+    
+    def snapshot(self):
+        """지금까지의 기록 목록 (복사본)"""
+        with self._lock:
+            return list(self.events)
+    
+    def describe(self, name, top=4):
+        """가장 최근에 끝난 name 단계와 그 안에서 오래 걸린 단계들을 한 줄로 요약
+        
+        name 단계가 아직 없으면 None을 반환합니다.
+        """
+        events = self.snapshot()
+        root = next((e for e in reversed(events) if e['name'] == name), None)
+        if root is None:
+            return None
+        
+        # 같은 스레드에서 root 안에 들어가는 단계를 이름별로 합산
+        end = root['ts'] + root['dur']
+        totals = {}
+        for event in events:
+            if (event is not root and event['pid'] == root['pid'] and
+                    event['tid'] == root['tid'] and event['ts'] >= root['ts'] and
+                    event['ts'] + event['dur'] <= end):
+                totals[event['name']] = totals.get(event['name'], 0.0) + event['dur']
+        
+        text = f"{name} {root['dur'] / 1000:.0f} ms"
+        longest = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+        if longest:
+            text += " (" + ", ".join(f"{stage} {dur / 1000:.0f}" for stage, dur in longest) + ")"
+        return text
+    
+    def dump(self, path):
+        """기록을 Chrome 추적 형식 JSON 파일로 저장"""
+        write_trace(path, self.snapshot())
+
+
+def write_trace(path, events):
+    """기록 목록을 Chrome 추적 형식 JSON 파일로 저장 (여러 프로세스 기록을 합쳐도 됨)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': list(events), 'displayTimeUnit': 'ms'}, f,
+                  ensure_ascii=False)
+
+
+def summarize_trace(events):
+    """단계 이름별 (횟수, 합계 초) 사전 (처음 나온 순서)"""
+    totals = {}
+    for event in events:
+        count, seconds = totals.get(event['name'], (0, 0.0))
+        totals[event['name']] = (count + 1, seconds + event['dur'] / 1e6)
+    return totals
+
+
+def set_tracer(tracer):
+    """단계 기록기 지정 (None이면 기록 끔), 이전 기록기 반환"""
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    return previous
+
+
+def get_tracer():
+    """현재 단계 기록기 (기록하지 않는 중이면 None)"""
+    return _tracer
+
+
+def trace_stage(name, **info):
+    """현재 기록기로 with 블록을 단계로 기록 (기록하지 않는 중이면 아무 일도 하지 않음)"""
+    tracer = _tracer
+    if tracer is None:
+        return contextlib.nullcontext(info)
+    return tracer.stage(name, **info)
+
+
+def image_shape(values):
+    """인자 중 처음 나오는 이미지/배열의 (높이, 너비)"""
+    for value in values:
+        if isinstance(value, np.ndarray) and value.ndim >= 2:
+            return list(value.shape[:2])
+        if isinstance(value, Image.Image):
+            return [value.height, value.width]
+    return None
+
+
+def traced(name):
+    """함수 호출을 name 단계로 기록하는 데코레이터
+    
+    기록기가 없으면 전역 변수 하나만 확인하고 바로 원래 함수를 호출합니다.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return func(*args, **kwargs)
+            with tracer.stage(name, shape=image_shape(args)) as info:
+                value = func(*args, **kwargs)
+                info['bytes'] = _result_nbytes(value)
+            return value
+        return wrapper
+    return decorate
+
+def count_neighbors_3x3(mask):
+    """각 내부 픽셀의 3x3 이웃(자기 자신 포함) 중 참인 픽셀 수 계산
+    
+    행/열 방향으로 밀린 배열을 더하는 방식이라 파이썬 루프 없이 동작합니다.
+    결과 크기는 (높이-2, 너비-2)이며 mask[1:-1, 1:-1]에 대응합니다.
+    """
+    m = mask.astype(np.uint8, copy=False)
+    # 가로 방향 3칸 합 (최대 3)
+    row_sum = m[:, :-2] + m[:, 1:-1] + m[:, 2:]
+    # 세로 방향 3칸 합 (최대 9, uint8로 충분)
+    return row_sum[:-2] + row_sum[1:-1] + row_sum[2:]
+
+
+def majority_filter(mask, min_count=5):
+    """3x3 이웃 중 min_count개 이상이 참인 픽셀만 남기는 노이즈 제거
+    
+    가장자리 1픽셀은 항상 거짓으로 처리합니다 (기존 반복문 방식과 동일).
+    """
+    height, width = mask.shape
+    result = np.zeros((height, width), dtype=bool)
+    if height < 3 or width < 3:
+        return result
+    result[1:-1, 1:-1] = count_neighbors_3x3(mask) >= min_count
+    return result
+
+
+# 미리보기 표시 크기 (최대 너비, 높이)
+PREVIEW_SIZE = (350, 250)
+# 이 배율보다 작은 축소본에서는 픽셀 단위 잡티 제거를 건너뜀
+NOISE_FILTER_MIN_SCALE = 0.5
+# 조명 지도를 만들 때 축소 배율과 (축소 해상도에서의) 닫힘 연산 크기
+# 원본 기준 약 56픽셀보다 가는 선은 지우고 그보다 큰 조명 변화만 남김
+ILLUMINATION_FACTOR = 8
+ILLUMINATION_KERNEL = 7
+
+# 그림자 제거 방식 (설정값 → 화면 표시 이름)
+SHADOW_METHODS = {
+    'illumination': '조명 평탄화',
+    'local_mean': '지역 평균',
+}
+
+# 투명도 계산 방식 (설정값 → 화면 표시 이름)
+ALPHA_MODES = {
+    'binary': '이진 마스크',
+    'soft': '연속 알파',
+}
+
+# 남길 잉크 색 (설정값 → 화면 표시 이름)
+INK_FILTERS = {
+    'all': '모든 잉크',
+    'red': '빨간 잉크 (도장)',
+    'blue': '파란 잉크',
+    'dark': '검은 잉크',
+}
+# 색 분류 변환표의 채널별 양자화 비트 수 (32단계, 표 크기 32768칸)
+COLOR_LUT_BITS = 5
+# 이보다 채도(최대-최소 채널 / 최대 채널)가 낮거나 어두우면 색을 따지지 않고 검은 잉크로 봄
+INK_MIN_SATURATION = 0.25
+INK_MIN_VALUE = 64
+# 색상각 범위 (도, 빨강은 0도 양쪽)
+RED_HUES = (330, 25)
+BLUE_HUES = (180, 290)
+# 연속 알파에서 완전 불투명 → 완전 투명으로 바뀌는 밝기 폭 (경계값 기준 양쪽 절반씩)
+SOFT_ALPHA_RAMP = 64
+# ImageFilter.SMOOTH(3x3, 가운데 5 나머지 1, 합 13) 한 번의 축별 분산 (6/13)
+SMOOTH_VARIANCE = 6 / 13
+# 잡티 제거에서 면적이 작아도 남기는 가늘고 긴 요소의 가로세로 비율
+SPECKLE_KEEP_ASPECT = 3
+
+# 숫자 설정 항목의 허용 범위 (화면 슬라이더 범위와 같음, None은 제한 없음)
+SETTING_RANGES = {
+    'threshold': (150, 250),
+    'blur': (0, 5),
+    'contrast': (1.0, 4.0),
+    'edge_smooth': (0, 5),
+    'brightness': (0.5, 2.0),
+    'shadow_threshold': (100, 200),
+    'speckle_min_area': (0, None),
+}
+
+
+# 파이썬 3.10부터는 dataclass가 __slots__를 직접 만들어 줌
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
+class RemovalSettings:
+    """배경 제거 설정값 (기본값은 화면의 초기값과 동일)
+    
+    바꿀 수 없고 해시할 수 있으므로 그대로 캐시 키에 넣거나 작업자 프로세스에 넘길 수
+    있습니다. 일부 값만 바꾼 설정은 replace()로 만듭니다.
+    """
+    threshold: int = 200            # 배경 제거 강도 (150-250)
+    blur: int = 1                   # 가장자리 부드럽게 (0-5)
+    contrast: float = 1.5           # 대비 강화 (1.0-4.0)
+    edge_smooth: int = 2            # 가장자리 매끄럽게 (0-5)
+    shadow_removal: bool = True     # 그림자 제거 강화
+    line_only: bool = True          # 선만 추출 모드
+    brightness: float = 1.0         # 밝기 조절 (0.5-2.0)
+    shadow_threshold: int = 150     # 그림자 제거 강도 (100-200)
+    shadow_method: str = 'illumination'  # 선만 추출 모드의 그림자 제거 방식 (SHADOW_METHODS)
+    alpha_mode: str = 'binary'      # 투명도 계산 방식 (ALPHA_MODES)
+    speckle_min_area: int = 0       # 이보다 작은 점 잡티 제거 (원본 픽셀 수, 0이면 사용 안 함)
+    ink_filter: str = 'all'         # 남길 잉크 색 (INK_FILTERS)
+    
+    def __post_init__(self):
+        # JSON 프리셋 등에서 잘못된 자료형이 들어오면 처리 도중이 아니라 여기서 오류
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if field.type is bool:
+                if not isinstance(value, (bool, np.bool_)):
+                    raise ValueError(f"{field.name}: 참/거짓 값이 아닙니다 ({value!r})")
+                value = bool(value)
+            elif field.type is int:
+                if isinstance(value, (bool, np.bool_)) or not isinstance(value, numbers.Integral):
+                    raise ValueError(f"{field.name}: 정수가 아닙니다 ({value!r})")
+                value = int(value)
+            elif field.type is float:
+                if isinstance(value, (bool, np.bool_)) or not isinstance(value, numbers.Real):
+                    raise ValueError(f"{field.name}: 숫자가 아닙니다 ({value!r})")
+                value = float(value)
+            else:
+                continue
+            # numpy 정수 등은 파이썬 기본 자료형으로 바꿔 둠 (해시, JSON 저장용)
+            object.__setattr__(self, field.name, value)
+            
+            low, high = SETTING_RANGES.get(field.name, (None, None))
+            if low is not None and high is not None and not low <= value <= high:
+                raise ValueError(f"{field.name}: {low}에서 {high} 사이여야 합니다 ({value})")
+            if low is not None and value < low:
+                raise ValueError(f"{field.name}: {low} 이상이어야 합니다 ({value})")
+        
+        if self.shadow_method not in SHADOW_METHODS:
+            raise ValueError(f"shadow_method: 알 수 없는 방식입니다 ({self.shadow_method}, "
+                             f"사용 가능: {', '.join(SHADOW_METHODS)})")
+        if self.alpha_mode not in ALPHA_MODES:
+            raise ValueError(f"alpha_mode: 알 수 없는 방식입니다 ({self.alpha_mode}, "
+                             f"사용 가능: {', '.join(ALPHA_MODES)})")
+        if self.ink_filter not in INK_FILTERS:
+            raise ValueError(f"ink_filter: 알 수 없는 방식입니다 ({self.ink_filter}, "
+                             f"사용 가능: {', '.join(INK_FILTERS)})")
+    
+    @classmethod
+    def field_names(cls):
+        """설정 항목 이름 목록 (선언 순서)"""
+        return tuple(f.name for f in fields(cls))
+    
+    @classmethod
+    def from_dict(cls, values):
+        """딕셔너리(예: JSON 프리셋)에서 설정 만들기, 빠진 항목은 기본값 사용"""
+        if not isinstance(values, dict):
+            raise ValueError(f"설정은 항목 이름과 값의 묶음(JSON 객체)이어야 합니다 "
+                             f"({type(values).__name__})")
+        unknown = set(values) - set(cls.field_names())
+        if unknown:
+            raise ValueError(f"알 수 없는 설정 항목: {', '.join(sorted(unknown))}")
+        return cls(**values)
+    
+    def to_dict(self):
+        """JSON 등으로 저장할 수 있는 딕셔너리로 변환"""
+        return {name: getattr(self, name) for name in self.field_names()}
+    
+    def replace(self, **changes):
+        """일부 값만 바꾼 새 설정 반환"""
+        return dataclasses.replace(self, **changes)
+
+
+# 기본 설정값
+DEFAULT_SETTINGS = RemovalSettings()
+
+# 일괄 처리 등에서 이름으로 고를 수 있는 설정 묶음
+PRESETS = {
+    # 기본값
+    'default': DEFAULT_SETTINGS,
+    # 사용법 안내의 "권장 설정 (그림자 있는 경우)"
+    'lines': DEFAULT_SETTINGS.replace(threshold=220, contrast=2.5, brightness=1.1,
+                                      blur=1, edge_smooth=1),
+    # "일반 자동 최적화"의 보통 밝기 설정
+    'standard': DEFAULT_SETTINGS.replace(line_only=False, threshold=200, contrast=1.5,
+                                         shadow_threshold=150, brightness=1.0, blur=1,
+                                         edge_smooth=2),
+}
+
+
+# 변환표를 적용할 때 한 번에 다루는 값 개수 (CPU 캐시에 들어가는 크기)
+LUT_CHUNK_VALUES = 1 << 20
+
+
+def blend_lut(base, factor):
+    """Image.blend(단색 base, 이미지, factor)와 같은 결과를 내는 256칸 변환표
+    
+    ImageEnhance의 Brightness(base=0)와 Contrast(base=평균 밝기)가 모두 이 계산이므로,
+    0~255 값 하나씩을 PIL로 직접 섞어서 반올림/잘림까지 똑같이 맞춥니다.
+    """
+    ramp = Image.frombytes('L', (256, 1), bytes(range(256)))
+    flat = Image.new('L', (256, 1), base)
+    return np.frombuffer(Image.blend(flat, ramp, factor).tobytes(), dtype=np.uint8)
+
+
+def luminance_histogram(img, settings):
+    """밝기 조절 후 L 변환한 이미지의 히스토그램 (ImageEnhance.Contrast 기준 계산용)"""
+    if settings.brightness != 1.0:
+        lut = blend_lut(0, settings.brightness)
+        img = img.point(list(lut) * len(img.getbands()))
+    return img.convert('L').histogram()
+
+
+def histogram_mean(histogram):
+    """히스토그램의 평균값을 ImageEnhance.Contrast와 같은 방식으로 반올림"""
+    total = sum(i * count for i, count in enumerate(histogram))
+    return int(total / sum(histogram) + 0.5)
+
+
+def apply_lut_inplace(img_array, lut):
+    """연속된 uint8 배열의 모든 값을 256칸 변환표로 바꿈 (새 배열을 만들지 않음)
+    
+    두 바이트씩 묶어서 65536칸 표로 바꾸므로 조회 횟수가 절반으로 줄어듭니다.
+    """
+    values = img_array.reshape(-1)
+    table = lut
+    if values.size % 2 == 0:
+        # 바이트 순서와 무관하게 두 바이트 값 → 변환된 두 바이트 값 표 만들기
+        pairs = np.arange(65536, dtype=np.uint16).view(np.uint8)
+        table = lut[pairs].view(np.uint16)
+        values = values.view(np.uint16)
+    
+    for start in range(0, values.size, LUT_CHUNK_VALUES):
+        chunk = values[start:start + LUT_CHUNK_VALUES]
+        np.take(table, chunk, out=chunk, mode='clip')
+
+
+@traced('enhance')
+def enhance_array(img, settings, contrast_mean=None):
+    """밝기 조절과 대비 강화를 한 번에 적용한 RGB 배열 반환
+    
+    ImageEnhance.Brightness → ImageEnhance.Contrast와 같은 결과를 내지만,
+    두 단계를 256칸 변환표 하나로 합쳐서 np.array 복사본에 바로 적용하므로
+    중간 이미지를 만들지 않습니다.
+    
+    contrast_mean을 주면 이미지 자체의 평균 밝기 대신 그 값을 대비 기준으로
+    사용합니다 (띠 단위 처리에서 전체 이미지 기준을 유지하기 위함).
+    """
+    # 대비 기준: 밝기 조절 후 L 변환한 이미지의 평균 (ImageEnhance.Contrast와 동일)
+    if contrast_mean is None:
+        contrast_mean = histogram_mean(luminance_histogram(img, settings))
+    
+    lut = blend_lut(0, settings.brightness)
+    lut = blend_lut(contrast_mean, settings.contrast)[lut]
+    
+    img_array = np.array(img)
+    apply_lut_inplace(img_array, lut)
+    return img_array
+
+
+@traced('remove_background')
+def remove_white_background(img, settings, scale=1.0):
+    """하얀 배경 제거 (그림자 제거 기능 포함)
+    
+    scale은 원본 대비 입력 이미지의 배율입니다. 미리보기용 축소본을 처리할 때
+    픽셀 단위 필터 크기를 그만큼 줄여서 원본 처리 결과와 비슷하게 보이게 합니다.
+    """
+    # 밝기/대비 조절 (numpy 배열로 변환하면서 적용)
+    img_array = enhance_array(img, settings)
+    
+    return remove_background_array(img_array, settings, scale)
+
+
+def remove_background_array(img_array, settings, scale=1.0, illumination=None, top=0):
+    """밝기/대비 조절이 끝난 RGB 배열에서 배경 제거"""
+    if settings.line_only:
+        # 선만 추출 모드
+        return extract_lines_only(img_array, settings, scale, illumination, top)
+    else:
+        # 일반 배경 제거 모드
+        return standard_background_removal(img_array, settings, scale)
+
+
+def opaque_mask_array(img_array, settings, scale=1.0):
+    """밝기/대비 조절이 끝난 RGB 배열의 후처리 전 불투명(잉크) 마스크
+    
+    remove_background_array와 같은 판단이며, 가장자리 설정(흐림/매끄럽게)과 투명도
+    계산 방식의 영향을 받지 않습니다.
+    """
+    if settings.line_only:
+        return line_opaque_mask(img_array, settings, scale)[0]
+    return standard_opaque_mask(img_array, settings, scale)
+
+
+@traced('grayscale')
+def grayscale(img_array):
+    """그레이스케일 변환 (uint8)
+    
+    PIL의 L 변환(0.299/0.587/0.114, 16비트 고정소수점 정수 계산)을 그대로 써서
+    float64 배열 대신 원본 한 채널 크기의 uint8 배열을 만듭니다.
+    """
+    return np.asarray(Image.fromarray(img_array, 'RGB').convert('L'))
+
+
+def local_mean_window(scale=1.0):
+    """그림자 감지용 지역 평균 창 크기 (원본 기준 20픽셀)"""
+    return max(3, int(round(20 * scale)))
+
+
+def uses_local_mean(settings):
+    """선만 추출 모드에서 지역 평균 기반 그림자 제거를 쓰는지 여부"""
+    return (settings.line_only and settings.shadow_removal and
+            settings.shadow_method == 'local_mean' and scipy_ndimage() is not None)
+
+
+def uses_illumination(settings):
+    """선만 추출 모드에서 조명 평탄화 기반 그림자 제거를 쓰는지 여부"""
+    return (settings.line_only and settings.shadow_removal and
+            settings.shadow_method == 'illumination')
+
+
+@traced('local_mean')
+def compute_local_mean(gray, scale=1.0):
+    """지역별 평균 밝기 계산 (그림자 영역 감지)"""
+    # uint8 입력을 그대로 받아 float32로만 출력 (중간 복사본 없음)
+    return scipy_ndimage().uniform_filter(gray, size=local_mean_window(scale),
+                                          output=np.float32)
+
+
+def illumination_params(scale=1.0):
+    """조명 지도의 축소 배율과 닫힘 연산 크기 (원본 기준 크기를 scale에 맞춤)"""
+    factor = max(1, int(round(ILLUMINATION_FACTOR * scale)))
+    kernel = ILLUMINATION_FACTOR * ILLUMINATION_KERNEL * scale / factor
+    return factor, max(3, int(round(kernel)) | 1)
+
+
+def downsample_gray(gray, factor):
+    """factor x factor 블록 평균으로 축소 (띠 경계가 factor 배수면 띠별 결과를 이어 붙여도 동일)"""
+    return np.asarray(Image.fromarray(gray).reduce(factor))
+
+
+def rank_filter_1d(values, kernel, axis, reduce):
+    """한 축 방향 kernel 크기 창의 최댓값/최솟값 (가장자리는 복제)"""
+    radius = kernel // 2
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(values, pad, mode='edge')
+    
+    length = values.shape[axis]
+    result = padded.take(range(0, length), axis=axis)
+    for offset in range(1, kernel):
+        reduce(result, padded.take(range(offset, offset + length), axis=axis), out=result)
+    return result
+
+
+def close_background(small, kernel):
+    """축소된 그레이스케일에서 어두운 선을 지우고 배경 밝기만 남긴 조명 지도 (float32)"""
+    # 닫힘 연산: 최댓값 필터로 선을 지우고 최솟값 필터로 배경 경계를 되돌림
+    # (정사각형 창은 가로/세로로 나눠 계산해도 결과가 같음)
+    closed = small
+    for reduce in (np.maximum, np.minimum):
+        for axis in (0, 1):
+            closed = rank_filter_1d(closed, kernel, axis, reduce)
+    
+    # 블록 경계가 보이지 않도록 살짝 흐리게
+    img = Image.fromarray(closed).filter(ImageFilter.GaussianBlur(1))
+    return np.maximum(np.asarray(img, dtype=np.float32), 1.0)
+
+
+@traced('illumination')
+def estimate_illumination(gray, scale=1.0):
+    """배경 조명 지도 추정 (축소 해상도, scipy 불필요)"""
+    factor, kernel = illumination_params(scale)
+    return close_background(downsample_gray(gray, factor), kernel)
+
+
+def _linear_taps(positions, factor, size):
+    """확대할 좌표마다 선형 보간에 쓸 두 원본 위치와 가중치 (픽셀 중심 기준)"""
+    source = (positions + 0.5) / factor - 0.5
+    source = np.clip(source, 0, size - 1)
+    first = np.floor(source).astype(np.intp)
+    second = np.minimum(first + 1, size - 1)
+    return first, second, (source - first).astype(np.float32)
+
+
+def upsample_illumination(illumination, factor, top, height, width):
+    """축소 해상도 지도를 원본 좌표 top행부터 height행만큼 선형 보간으로 확대 (float32)
+    
+    전체 이미지 좌표로 계산하므로 띠 단위로 나눠 확대해도 값이 같습니다.
+    """
+    rows0, rows1, wy = _linear_taps(np.arange(top, top + height), factor,
+                                    illumination.shape[0])
+    cols0, cols1, wx = _linear_taps(np.arange(width), factor, illumination.shape[1])
+    
+    vertical = illumination[rows0] * (1 - wy)[:, None] + illumination[rows1] * wy[:, None]
+    result = vertical[:, cols0]
+    result *= 1 - wx
+    result += vertical[:, cols1] * wx
+    return result
+
+
+@traced('flatten')
+def flatten_illumination(gray, illumination, factor, top=0):
+    """조명 지도로 나눠서 조명을 평탄하게 만든 그레이스케일 (uint8, 종이 배경 ≈ 255)
+    
+    top은 gray의 첫 행이 전체 이미지에서 몇 번째 행인지입니다 (띠 단위 처리용).
+    """
+    height, width = gray.shape
+    # 나눗셈은 축소 해상도에서 한 번만 하고 원본 해상도에서는 곱셈만 함
+    gain = 255 / illumination
+    
+    flattened = np.empty_like(gray)
+    rows = max(1, LUT_CHUNK_VALUES // max(1, width))
+    for start in range(0, height, rows):
+        stop = min(height, start + rows)
+        scaled = upsample_illumination(gain, factor, top + start, stop - start, width)
+        
+        # 밝기 * 255 / 배경 밝기 (반올림, 배경보다 밝은 부분은 255)
+        np.multiply(gray[start:stop], scaled, out=scaled)
+        scaled += 0.5
+        np.minimum(scaled, 255, out=scaled)
+        flattened[start:stop] = scaled
+    
+    return flattened
+
+
+@traced('morphology')
+def remove_line_noise(line_mask, settings, scale=1.0, use_scipy=True):
+    """선 마스크의 작은 잡티 제거 (축소본에서는 잡티가 1픽셀보다 작아지므로 생략)"""
+    if scale < NOISE_FILTER_MIN_SCALE:
+        return line_mask
+    if uses_speckle_filter(settings):
+        # 연결 요소 잡티 제거(remove_speckles)가 대신하므로 가는 선을 깎는 필터는 생략
+        return line_mask
+    
+    ndimage = scipy_ndimage() if use_scipy else None
+    if ndimage is not None:
+        line_mask = ndimage.binary_opening(line_mask, structure=np.ones((2,2)))
+        return ndimage.binary_closing(line_mask, structure=np.ones((3,3)))
+    
+    # 기본 노이즈 제거 (scipy 없이)
+    # 3x3 이웃 다수결 필터 (간단한 erosion/dilation 효과)
+    return majority_filter(line_mask, min_count=5)
+
+
+def line_mask_from_gray(gray, settings, local_mean=None, scale=1.0, flattened=None):
+    """선만 추출 모드의 선 영역 마스크
+    
+    flattened(조명 평탄화 결과)나 local_mean(지역 평균)이 있으면 그림자 제거를 적용합니다.
+    """
+    line_mask = threshold_line_mask(gray, settings, local_mean, flattened)
+    # scipy가 없거나 그림자 제거가 비활성화된 경우는 단순 다수결 필터만 사용
+    use_scipy = flattened is not None or local_mean is not None
+    return remove_line_noise(line_mask, settings, scale, use_scipy)
+
+
+@traced('mask')
+def threshold_line_mask(gray, settings, local_mean=None, flattened=None):
+    """잡티 제거 전의 선 영역 마스크 (밝기 경계값 비교만 수행)"""
+    if flattened is not None:
+        # 조명을 평탄화했으므로 그림자 영역도 배경 ≈ 255가 됨
+        # 그림자 제거 강도 이하로 어두운 부분만 선으로 판단
+        return flattened <= settings.shadow_threshold
+    
+    # 그림자 제거를 위한 적응적 임계값 처리
+    if local_mean is not None:
+        # 적응적 임계값 계산
+        adaptive_threshold = local_mean - 30  # 지역 평균보다 30 낮으면 선으로 판단
+        line_mask = gray < adaptive_threshold
+        
+        # 너무 밝은 부분은 제외 (그림자가 아닌 진짜 배경)
+        bright_mask = gray > settings.shadow_threshold
+        return line_mask & ~bright_mask
+    
+    # 그림자 제거 없이 단순 처리
+    threshold = 255 - settings.threshold
+    return gray < threshold
+
+
+def uses_speckle_filter(settings):
+    """연결 요소 기반 잡티 제거를 쓰는지 여부 (scipy 필요)"""
+    return settings.speckle_min_area > 0 and scipy_ndimage() is not None
+
+
+def component_spans(owner, coords, count):
+    """연결 요소별 좌표 범위 길이 (owner: 픽셀별 요소 번호, coords: 같은 픽셀의 좌표)"""
+    low = np.full(count + 1, np.iinfo(np.intp).max, dtype=np.intp)
+    high = np.zeros(count + 1, dtype=np.intp)
+    np.minimum.at(low, owner, coords)
+    np.maximum.at(high, owner, coords)
+    return (high - low + 1)[1:]
+
+
+@traced('speckle')
+def remove_speckles(mask, min_area):
+    """면적이 min_area보다 작고 길쭉하지 않은 연결 요소(종이 먼지 등) 제거
+    
+    연결 요소 번호를 한 번 매긴 뒤 전경 픽셀만 모아서 요소별 면적(bincount)과
+    경계 상자(ufunc.at 최소/최대)를 한꺼번에 구하고, 요소별 유지 여부 표를 번호로
+    한 번 읽어서 마스크를 만듭니다. 모든 단계가 픽셀 수에 비례하는 시간만 걸립니다.
+    """
+    labels, count = scipy_ndimage().label(mask, structure=np.ones((3, 3), dtype=bool))
+    if count == 0:
+        return mask
+    
+    pixels = np.flatnonzero(mask)
+    owner = labels.ravel()[pixels]
+    areas = np.bincount(owner, minlength=count + 1)[1:]
+    rows, cols = np.divmod(pixels, mask.shape[1])
+    heights = component_spans(owner, rows, count)
+    widths = component_spans(owner, cols, count)
+    aspect = np.maximum(heights, widths) / np.minimum(heights, widths)
+    
+    # 작아도 가늘고 긴 요소(끊어진 선 조각)는 남김
+    keep = np.zeros(count + 1, dtype=bool)
+    keep[1:] = (areas >= min_area) | (aspect >= SPECKLE_KEEP_ASPECT)
+    
+    result = np.zeros(mask.size, dtype=bool)
+    result[pixels] = keep[owner]
+    return result.reshape(mask.shape)
+
+
+def speckle_filter(mask, settings, scale=1.0):
+    """설정에 따라 잡티 제거 (scipy가 없거나 축소본이면 그대로 반환)"""
+    if not uses_speckle_filter(settings) or scale < NOISE_FILTER_MIN_SCALE:
+        return mask
+    # 면적 기준은 원본 픽셀 수이므로 축소 배율의 제곱만큼 줄임
+    return remove_speckles(mask, settings.speckle_min_area * scale * scale)
+
+
+@functools.lru_cache(maxsize=None)
+def color_class_lut():
+    """양자화한 RGB(채널별 COLOR_LUT_BITS 비트) → 잉크 색 분류 변환표 (uint8)
+    
+    값은 INK_FILTERS의 키 순서 번호이며 ('all' 자리인 0은 어느 색에도 속하지 않는 색),
+    칸마다 가운데 색의 색상/채도로 한 번만 계산합니다.
+    """
+    levels = 1 << COLOR_LUT_BITS
+    centers = (np.arange(levels, dtype=np.float32) + 0.5) * (256 / levels)
+    r, g, b = np.meshgrid(centers, centers, centers, indexing='ij')
+    high = np.maximum(np.maximum(r, g), b)
+    chroma = high - np.minimum(np.minimum(r, g), b)
+    
+    # 색상각 (HSV의 H, 0-360도)
+    safe = np.maximum(chroma, 1e-6)
+    hue = np.where(high == r, (g - b) / safe % 6,
+                   np.where(high == g, (b - r) / safe + 2, (r - g) / safe + 4)) * 60
+    
+    codes = {name: code for code, name in enumerate(INK_FILTERS)}
+    table = np.zeros(r.shape, dtype=np.uint8)
+    table[(hue >= RED_HUES[0]) | (hue < RED_HUES[1])] = codes['red']
+    table[(hue >= BLUE_HUES[0]) & (hue < BLUE_HUES[1])] = codes['blue']
+    table[(chroma < INK_MIN_SATURATION * high) | (high < INK_MIN_VALUE)] = codes['dark']
+    return table.ravel()
+
+
+@traced('ink_filter')
+def keep_ink_color(img_array, mask, color):
+    """mask 중 잉크 색이 color(INK_FILTERS의 키)로 분류되는 픽셀만 남긴 마스크
+    
+    마스크에 든 픽셀만 모아서 양자화한 RGB로 변환표를 한 번 읽으므로 픽셀마다 HSV로
+    변환하지 않습니다.
+    """
+    pixels = np.flatnonzero(mask)
+    rgb = img_array.reshape(-1, 3)[pixels]
+    shift = 8 - COLOR_LUT_BITS
+    index = (rgb[:, 0] >> shift).astype(np.uint16)
+    for channel in (1, 2):
+        index <<= COLOR_LUT_BITS
+        index |= rgb[:, channel] >> shift
+    keep = color_class_lut()[index] == list(INK_FILTERS).index(color)
+    
+    result = np.zeros(mask.size, dtype=bool)
+    result[pixels[keep]] = True
+    return result.reshape(mask.shape)
+
+
+def ink_filter_mask(img_array, mask, settings):
+    """설정에 따라 한 가지 색 잉크만 남기기 ('all'이면 그대로 반환)"""
+    if settings.ink_filter == 'all':
+        return mask
+    return keep_ink_color(img_array, mask, settings.ink_filter)
+
+
+@traced('mask')
+def white_background_mask(img_array, settings):
+    """일반 배경 제거 모드에서 지울 하얀 배경(+그림자) 마스크"""
+    # 하얀색 픽셀 찾기
+    threshold = settings.threshold
+    white_mask = (img_array[:, :, 0] >= threshold) & \
+                 (img_array[:, :, 1] >= threshold) & \
+                 (img_array[:, :, 2] >= threshold)
+    
+    # 그림자 제거 추가 처리
+    if settings.shadow_removal:
+        # 회색 계열 (그림자) 제거
+        shadow_threshold = settings.shadow_threshold
+        # 차이의 합은 최대 510이므로 int16으로 충분
+        gray_diff = np.abs(img_array[:, :, 0].astype(np.int16) - img_array[:, :, 1]) + \
+                   np.abs(img_array[:, :, 1].astype(np.int16) - img_array[:, :, 2]) + \
+                   np.abs(img_array[:, :, 0].astype(np.int16) - img_array[:, :, 2])
+        
+        shadow_mask = (gray_diff < 30) & \
+                     (img_array[:, :, 0] > shadow_threshold) & \
+                     (img_array[:, :, 1] > shadow_threshold) & \
+                     (img_array[:, :, 2] > shadow_threshold)
+        
+        white_mask = white_mask | shadow_mask
+    
+    return white_mask
+
+
+@traced('compose')
+def compose_rgba(img_array, opaque_mask, alpha=None):
+    """원본 색상에 마스크 부분만 불투명한 RGBA 이미지 만들기 (alpha가 있으면 그 값 사용)"""
+    height, width = opaque_mask.shape
+    rgba_array = np.empty((height, width, 4), dtype=np.uint8)
+    rgba_array[:, :, :3] = img_array  # 원본 색상 유지
+    if alpha is None:
+        rgba_array[:, :, 3] = opaque_mask.astype(np.uint8) * 255  # 배경은 완전히 투명하게
+    else:
+        rgba_array[:, :, 3] = alpha
+    
+    # PIL 이미지로 변환
+    return Image.fromarray(rgba_array, 'RGBA')
+
+
+def extract_lines_only(img_array, settings, scale=1.0, illumination=None, top=0):
+    """선만 추출하는 고급 처리
+    
+    illumination은 미리 계산한 전체 이미지의 조명 지도, top은 img_array의 첫 행이
+    전체 이미지에서 몇 번째 행인지입니다 (띠 단위 처리용, 없으면 직접 계산).
+    """
+    line_mask, alpha_source = line_opaque_mask(img_array, settings, scale, illumination, top)
+    
+    # 후처리
+    return finish_result(img_array, line_mask, settings, scale, alpha_source)
+
+
+def line_opaque_mask(img_array, settings, scale=1.0, illumination=None, top=0):
+    """선만 추출 모드의 후처리 전 선 마스크와 연속 알파용 alpha_source 함수"""
+    gray = grayscale(img_array)
+    local_mean = flattened = None
+    if uses_illumination(settings):
+        if illumination is None:
+            illumination = estimate_illumination(gray, scale)
+        factor = illumination_params(scale)[0]
+        flattened = flatten_illumination(gray, illumination, factor, top)
+    elif uses_local_mean(settings):
+        local_mean = compute_local_mean(gray, scale)
+    
+    line_mask = line_mask_from_gray(gray, settings, local_mean, scale, flattened)
+    line_mask = ink_filter_mask(img_array, line_mask, settings)
+    line_mask = speckle_filter(line_mask, settings, scale)
+    return line_mask, lambda: line_alpha_source(gray, settings, local_mean, flattened)
+
+
+def standard_background_removal(img_array, settings, scale=1.0):
+    """기존 방식의 배경 제거"""
+    opaque_mask = standard_opaque_mask(img_array, settings, scale)
+    return finish_result(img_array, opaque_mask, settings, scale,
+                         lambda: standard_alpha_source(img_array, settings))
+
+
+def standard_opaque_mask(img_array, settings, scale=1.0):
+    """일반 배경 제거 모드의 후처리 전 불투명 마스크"""
+    white_mask = white_background_mask(img_array, settings)
+    opaque_mask = ink_filter_mask(img_array, ~white_mask, settings)
+    return speckle_filter(opaque_mask, settings, scale)
+
+
+def finish_result(img_array, opaque_mask, settings, scale, alpha_source):
+    """마스크로 RGBA 결과 만들기 (투명도 계산 방식에 따라 후처리 또는 연속 알파)
+    
+    alpha_source는 연속 알파일 때만 호출하는 함수로 (밝기, 경계 밝기)를 돌려줍니다.
+    """
+    if settings.alpha_mode == 'soft':
+        lum, cut = alpha_source()
+        alpha = smooth_alpha(soft_alpha(lum, cut, opaque_mask), settings, scale)
+        return compose_rgba(img_array, opaque_mask, alpha)
+    return post_process_image(compose_rgba(img_array, opaque_mask), settings, scale)
+
+
+def line_alpha_source(gray, settings, local_mean=None, flattened=None):
+    """선만 추출 모드의 연속 알파 기준: 선 마스크가 나뉘는 밝기 경계와 비교할 밝기"""
+    if flattened is not None:
+        # flattened <= 그림자 제거 강도 → 선
+        return flattened, settings.shadow_threshold + 0.5
+    if local_mean is not None:
+        # gray < 지역 평균 - 30 이면서 gray <= 그림자 제거 강도 → 선
+        return gray, np.minimum(local_mean - 30, settings.shadow_threshold + 0.5)
+    # gray < 255 - 배경 제거 강도 → 선
+    return gray, 255 - settings.threshold - 0.5
+
+
+def standard_alpha_source(img_array, settings):
+    """일반 모드의 연속 알파 기준: 가장 어두운 채널이 배경 제거 강도보다 어두우면 남김"""
+    darkest = np.minimum(np.minimum(img_array[:, :, 0], img_array[:, :, 1]),
+                         img_array[:, :, 2])
+    return darkest, settings.threshold - 0.5
+
+
+def alpha_ramp(levels, cut):
+    """경계 밝기(cut)에서 절반, 양쪽 SOFT_ALPHA_RAMP/2 만큼에서 완전 불투명/투명 (uint8)"""
+    ramp = (cut - levels) * np.float32(255 / SOFT_ALPHA_RAMP)
+    ramp += 128
+    np.clip(ramp, 0, 255, out=ramp)
+    return ramp.astype(np.uint8)
+
+
+@traced('soft_alpha')
+def soft_alpha(lum, cut, opaque_mask):
+    """배경과의 밝기 차이로 계산한 연속 알파 (0-255 uint8)
+    
+    마스크 안은 128 이상, 마스크 바로 바깥 1픽셀 테두리는 127 이하의 값을 갖고
+    그보다 먼 곳은 완전 투명이므로, 이진 마스크가 지운 잡티는 그대로 지워집니다.
+    """
+    # 가장자리까지 포함하도록 한 칸씩 덧대서 3x3 팽창
+    near = count_neighbors_3x3(np.pad(opaque_mask, 1)) > 0
+    
+    if np.isscalar(cut):
+        # 경계가 하나면 (테두리 여부, 마스크 여부, 밝기) 조합별 1024칸 변환표 한 번으로 끝남
+        ramp = alpha_ramp(np.arange(256, dtype=np.float32), cut)
+        table = np.zeros((2, 2, 256), dtype=np.uint8)
+        table[1, 0] = np.minimum(ramp, 127)
+        table[1, 1] = np.maximum(ramp, 128)
+        
+        code = near.astype(np.uint16)
+        code <<= 1
+        code |= opaque_mask
+        code <<= 8
+        code |= lum
+        return table.ravel()[code]
+    
+    ramp = alpha_ramp(lum, cut)
+    alpha = np.where(opaque_mask, np.maximum(ramp, 128), np.minimum(ramp, 127))
+    alpha[~near] = 0
+    return alpha
+
+
+def soft_alpha_sigma(settings, scale=1.0):
+    """연속 알파에서 가장자리 설정 두 개를 합친 가우시안 하나의 표준편차
+    
+    GaussianBlur(blur) 뒤에 SMOOTH를 n번 하는 것과 분산이 같도록 합칩니다.
+    """
+    variance = settings.blur ** 2 + SMOOTH_VARIANCE * settings.edge_smooth
+    return float(np.sqrt(variance)) * scale
+
+
+@traced('smooth_alpha')
+def smooth_alpha(alpha, settings, scale=1.0):
+    """연속 알파를 가우시안 한 번으로 다듬기 (alpha를 직접 고침)
+    
+    알파가 0이 아닌 영역의 경계 상자에 흐림 반경만큼 여유를 둔 부분만 흐리게 합니다.
+    그 바깥은 모두 0이라 흐려도 0이므로 전체를 흐린 것과 결과가 같습니다.
+    """
+    sigma = soft_alpha_sigma(settings, scale)
+    if sigma <= 0:
+        return alpha
+    
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if len(rows) == 0:
+        return alpha
+    cols = np.flatnonzero(alpha.any(axis=0))
+    
+    # GaussianBlur(3회 박스 블러 근사)가 닿는 거리
+    reach = 3 * int(np.ceil(sigma)) + 3
+    top, bottom = max(0, rows[0] - reach), min(alpha.shape[0], rows[-1] + 1 + reach)
+    left, right = max(0, cols[0] - reach), min(alpha.shape[1], cols[-1] + 1 + reach)
+    
+    region = Image.fromarray(np.ascontiguousarray(alpha[top:bottom, left:right]))
+    alpha[top:bottom, left:right] = np.asarray(region.filter(ImageFilter.GaussianBlur(sigma)))
+    return alpha
+
+
+@traced('post_process')
+def post_process_image(result_img, settings, scale=1.0):
+    """이미지 후처리"""
+    # 가장자리 부드럽게 하기
+    if settings.blur > 0:
+        alpha = result_img.split()[3]
+        alpha_blurred = alpha.filter(ImageFilter.GaussianBlur(settings.blur * scale))
+        result_img.putalpha(alpha_blurred)
+    
+    # 가장자리 매끄럽게 하기
+    if settings.edge_smooth > 0:
+        alpha = result_img.split()[3]
+        for _ in range(settings.edge_smooth):
+            alpha = alpha.filter(ImageFilter.SMOOTH)
+        result_img.putalpha(alpha)
+    
+    return result_img
+
+
+class PipelineCache:
+    """처리 단계별 중간 결과를 보관하는 LRU 캐시
+    
+    키는 (단계 이름, 원본 구분값, 그 단계가 의존하는 설정값...) 튜플입니다.
+    보관한 결과의 크기 합이 max_bytes를 넘으면 가장 오래 쓰지 않은 것부터 버립니다.
+    작업 스레드와 UI 스레드가 함께 쓰므로 잠금으로 보호합니다.
+    """
+    
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """캐시에 있으면 꺼내고, 없으면 default (계산하지 않음)"""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+    
+    def get_or_compute(self, key, compute):
+        """캐시에 있으면 꺼내고, 없으면 compute()로 계산해서 보관"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+        
+        value = compute()
+        nbytes = _result_nbytes(value)
+        
+        with self._lock:
+            if key not in self._entries and nbytes <= self.max_bytes:
+                self._entries[key] = (value, nbytes)
+                self._bytes += nbytes
+                while self._bytes > self.max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._bytes -= evicted
+        return value
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def _result_nbytes(value):
+    """캐시 항목의 대략적인 메모리 크기"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    return 0
+
+
+@traced('pipeline')
+def run_pipeline(img, settings, cache, source_key, scale=1.0):
+    """remove_white_background와 같은 결과를 단계별 캐시를 사용해서 계산
+    
+    각 단계는 자신이 의존하는 설정값만 키로 쓰므로, 예를 들어 가장자리 설정만
+    바꾸면 후처리만 다시 하고 그림자 제거 강도만 바꾸면 지역 평균은 재사용합니다.
+    source_key는 원본 이미지를 구분하는 값입니다 (이미지를 새로 열면 바꿔야 함).
+    """
+    tone_key = (source_key, settings.brightness, settings.contrast)
+    
+    # 밝기/대비 조절
+    img_array = cache.get_or_compute(
+        ('enhance',) + tone_key,
+        lambda: enhance_array(img, settings))
+    
+    noise_filter = scale >= NOISE_FILTER_MIN_SCALE
+    # 잡티 제거를 쓰면 선 마스크의 형태학 필터가 빠지므로 키에 함께 넣음
+    noise_key = (noise_filter, uses_speckle_filter(settings))
+    if settings.line_only:
+        gray = cache.get_or_compute(('gray',) + tone_key, lambda: grayscale(img_array))
+        
+        if uses_illumination(settings):
+            factor, kernel = illumination_params(scale)
+            flattened = cache.get_or_compute(
+                ('flattened',) + tone_key + (factor, kernel),
+                lambda: flatten_illumination(gray, estimate_illumination(gray, scale), factor))
+            mask_key = ('line_mask',) + tone_key + ('illumination', factor, kernel,
+                                                   settings.shadow_threshold) + noise_key
+            opaque_mask = cache.get_or_compute(
+                mask_key, lambda: line_mask_from_gray(gray, settings, scale=scale,
+                                                      flattened=flattened))
+            alpha_source = lambda: line_alpha_source(gray, settings, flattened=flattened)
+        elif uses_local_mean(settings):
+            window = local_mean_window(scale)
+            local_mean = cache.get_or_compute(
+                ('local_mean',) + tone_key + (window,),
+                lambda: compute_local_mean(gray, scale))
+            mask_key = ('line_mask',) + tone_key + ('local_mean', window,
+                                                   settings.shadow_threshold) + noise_key
+            opaque_mask = cache.get_or_compute(
+                mask_key, lambda: line_mask_from_gray(gray, settings, local_mean, scale))
+            alpha_source = lambda: line_alpha_source(gray, settings, local_mean)
+        else:
+            mask_key = ('line_mask',) + tone_key + (settings.threshold,) + noise_key
+            opaque_mask = cache.get_or_compute(
+                mask_key, lambda: line_mask_from_gray(gray, settings, scale=scale))
+            alpha_source = lambda: line_alpha_source(gray, settings)
+    else:
+        mask_key = ('opaque_mask',) + tone_key + (settings.threshold,
+                                                  settings.shadow_removal,
+                                                  settings.shadow_threshold)
+        opaque_mask = cache.get_or_compute(
+            mask_key, lambda: ~white_background_mask(img_array, settings))
+        alpha_source = lambda: standard_alpha_source(img_array, settings)
+    
+    # 잉크 색 골라내기 (색만 바꾸면 마스크는 재사용)
+    if settings.ink_filter != 'all':
+        all_inks = opaque_mask
+        mask_key = ('ink_filter',) + mask_key + (settings.ink_filter,)
+        opaque_mask = cache.get_or_compute(
+            mask_key, lambda: ink_filter_mask(img_array, all_inks, settings))
+    
+    # 잡티 제거 (크기 기준만 바뀌면 마스크는 재사용)
+    if uses_speckle_filter(settings) and noise_filter:
+        unfiltered = opaque_mask
+        mask_key = ('speckle',) + mask_key + (settings.speckle_min_area, scale)
+        opaque_mask = cache.get_or_compute(
+            mask_key, lambda: speckle_filter(unfiltered, settings, scale))
+    
+    # 후처리 (가장자리 설정만 바뀌면 여기만 다시 계산)
+    result_key = ('result',) + mask_key + (settings.alpha_mode, settings.blur,
+                                            settings.edge_smooth, scale)
+    return cache.get_or_compute(
+        result_key,
+        lambda: finish_result(img_array, opaque_mask, settings, scale, alpha_source))
+
+
+# 저장할 때 내용 주위에 남기는 기본 여백 (픽셀)
+DEFAULT_CROP_PADDING = 16
+
+
+def alpha_bbox(img):
+    """투명하지 않은 픽셀을 모두 포함하는 (left, top, right, bottom), 모두 투명하면 None
+    
+    알파 채널을 행/열 방향으로 한 번씩 줄여서(any) 내용이 있는 범위만 찾습니다.
+    """
+    alpha = np.asarray(img.getchannel('A'))
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if len(rows) == 0:
+        return None
+    cols = np.flatnonzero(alpha.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+@traced('crop')
+def crop_to_content(img, padding=DEFAULT_CROP_PADDING):
+    """RGBA 이미지를 내용 영역 + 여백만 남기고 자르기 (모두 투명하면 그대로)"""
+    bbox = alpha_bbox(img)
+    if bbox is None:
+        return img
+    
+    left, top, right, bottom = bbox
+    width, height = img.size
+    return img.crop((max(0, left - padding), max(0, top - padding),
+                     min(width, right + padding), min(height, bottom + padding)))
+
+
+# 저장 형식 (설정값 → 화면 표시 이름)
+EXPORT_FORMATS = {
+    'png': '투명 PNG (RGBA)',
+    'png_palette': '팔레트 PNG',
+    'png_mask': '1비트 마스크 PNG',
+    'webp': '무손실 WebP',
+}
+# 저장 형식별 파일 확장자
+EXPORT_EXTENSIONS = {
+    'png': '.png',
+    'png_palette': '.png',
+    'png_mask': '.png',
+    'webp': '.webp',
+}
+# 기본 압축 수준 (zlib 0-9, 높을수록 작지만 느림)
+DEFAULT_COMPRESS_LEVEL = 6
+# 팔레트 PNG의 최대 색상 수 (알파 포함)
+PALETTE_COLORS = 256
+
+
+def clear_transparent_rgb(img):
+    """완전히 투명한 픽셀의 색상을 0으로 지운 RGBA 배열 (보이는 결과는 같고 압축이 잘 됨)"""
+    rgba = np.array(img)
+    rgba[rgba[:, :, 3] == 0] = 0
+    return rgba
+
+
+def ink_color(rgba):
+    """반 이상 불투명한 픽셀의 평균 색 (1비트 마스크 저장에 쓰는 단색)"""
+    opaque = rgba[:, :, 3] >= 128
+    if not opaque.any():
+        return (0, 0, 0)
+    return tuple(int(round(v)) for v in rgba[opaque][:, :3].mean(axis=0))
+
+
+def encode_palette_png(rgba, path, compress_level):
+    """알파까지 함께 양자화한 팔레트 PNG (투명도는 tRNS 청크로 저장)"""
+    img = Image.fromarray(rgba, 'RGBA')
+    paletted = img.quantize(PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+    paletted.save(path, 'PNG', compress_level=compress_level)
+
+
+def encode_mask_png(rgba, path, compress_level, color=None):
+    """불투명 여부 1비트 + 단색 하나로 저장 (팔레트 0번은 투명, 1번은 잉크 색)"""
+    if color is None:
+        color = ink_color(rgba)
+    mask = Image.fromarray((rgba[:, :, 3] >= 128).astype(np.uint8))
+    # 색이 두 개뿐인 팔레트는 PNG 저장 시 1비트로 기록됨
+    mask.putpalette((0, 0, 0) + tuple(color))
+    mask.save(path, 'PNG', compress_level=compress_level, transparency=0)
+
+
+def encode_webp(rgba, path, compress_level):
+    """무손실 WebP (무손실에서 quality는 압축 노력이므로 압축 수준 0-9를 0-100으로 맞춤)
+    
+    method 6은 몇 % 더 작아지는 대신 수십 배 느려서 최고 수준(9)에서만 씁니다.
+    """
+    img = Image.fromarray(rgba, 'RGBA')
+    img.save(path, 'WEBP', lossless=True, quality=int(round(compress_level * 100 / 9)),
+             method=6 if compress_level >= 9 else 4)
+
+
+@traced('encode')
+def export_image(img, path, fmt='png', compress_level=DEFAULT_COMPRESS_LEVEL):
+    """결과 RGBA 이미지를 지정한 형식으로 저장하고 (파일 크기 바이트, 인코딩 초) 반환
+    
+    path는 파일 경로 또는 쓰기 가능한 파일 객체(예: io.BytesIO)입니다.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"알 수 없는 저장 형식입니다: {fmt} "
+                         f"(사용 가능: {', '.join(EXPORT_FORMATS)})")
+    
+    to_file = hasattr(path, 'write')
+    offset = path.tell() if to_file else 0
+    start = time.perf_counter()
+    rgba = clear_transparent_rgb(img)
+    if fmt == 'png':
+        Image.fromarray(rgba, 'RGBA').save(path, 'PNG', compress_level=compress_level)
+    elif fmt == 'png_palette':
+        encode_palette_png(rgba, path, compress_level)
+    elif fmt == 'png_mask':
+        encode_mask_png(rgba, path, compress_level)
+    else:
+        encode_webp(rgba, path, compress_level)
+    elapsed = time.perf_counter() - start
+    
+    size = path.tell() - offset if to_file else os.path.getsize(path)
+    return size, elapsed
+
+
+def format_size(size):
+    """바이트 수를 읽기 쉬운 단위로"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024 or unit == 'MB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+# 대용량 스캔용 띠(band) 단위 처리
+# 띠 하나를 처리할 때 픽셀당 필요한 작업 메모리 추정치 (바이트)
+TILE_BYTES_PER_PIXEL = 32
+# 여러 스레드로 나눌 때 스레드당 띠 수 (띠마다 걸리는 시간이 달라도 고르게 나눠지도록)
+PARALLEL_BANDS_PER_THREAD = 4
+# 띠 하나의 최소 높이 (너무 잘게 나누면 경계 여유분 계산이 낭비됨)
+TILE_MIN_ROWS = 16
+
+
+def filter_halo(settings):
+    """띠 경계에서 결과가 달라지지 않도록 위아래로 더 읽어야 하는 행 수"""
+    halo = 0
+    if settings.line_only:
+        if uses_local_mean(settings):
+            # uniform_filter(size=20) 반경 10
+            halo += 10
+        
+        if uses_speckle_filter(settings):
+            # 잡티 제거를 쓰면 아래 형태학 필터는 생략됨
+            pass
+        elif scipy_ndimage() is not None and (uses_local_mean(settings) or
+                                              uses_illumination(settings)):
+            # opening(2x2) 2 + closing(3x3) 2 (조명 지도는 전체 이미지에서 미리 계산)
+            halo += 2 + 2
+        else:
+            # 3x3 다수결 필터
+            halo += 1
+    
+    if uses_speckle_filter(settings):
+        # min_area보다 작은 요소는 높이도 min_area보다 작아서 여유 안에 다 들어오고,
+        # 여유 밖으로 이어지는 요소는 보이는 부분만으로도 min_area보다 커서 남음
+        halo += int(np.ceil(settings.speckle_min_area))
+    
+    if settings.alpha_mode == 'soft':
+        # 마스크 테두리 1픽셀 + GaussianBlur 한 번 (3회 박스 블러 근사)
+        halo += 1
+        sigma = soft_alpha_sigma(settings)
+        if sigma > 0:
+            halo += 3 * int(np.ceil(sigma)) + 3
+        return halo
+    
+    # 후처리: GaussianBlur(3회 박스 블러 근사) + SMOOTH(3x3) 반복
+    if settings.blur > 0:
+        halo += 3 * int(np.ceil(settings.blur)) + 3
+    if settings.edge_smooth > 0:
+        halo += settings.edge_smooth
+    
+    return halo
+
+
+def contrast_mean(img, settings, band_rows=1024, pool=None):
+    """밝기 조절 후 전체 이미지의 평균 밝기 (ImageEnhance.Contrast 기준값)
+    
+    띠 단위로 히스토그램을 누적하므로 전체 크기의 중간 이미지를 만들지 않습니다.
+    pool(ThreadPoolExecutor)을 주면 띠들을 여러 스레드에서 나눠 계산합니다.
+    """
+    width, height = img.size
+    
+    def band_histogram(top):
+        band = img.crop((0, top, width, min(height, top + band_rows)))
+        return np.array(luminance_histogram(band, settings), dtype=np.int64)
+    
+    mapper = pool.map if pool is not None else map
+    histogram = np.zeros(256, dtype=np.int64)
+    for band in mapper(band_histogram, range(0, height, band_rows)):
+        histogram += band
+    
+    return histogram_mean(histogram.tolist())
+
+
+def tiled_illumination(img, settings, contrast_mean_value, band_rows, pool=None):
+    """띠 단위로 축소본을 모아 전체 이미지의 조명 지도 만들기
+    
+    띠 높이를 축소 배율의 배수로 맞추므로 전체를 한 번에 축소한 것과 같습니다.
+    """
+    width, height = img.size
+    factor, kernel = illumination_params()
+    band_rows = max(factor, band_rows - band_rows % factor)
+    
+    def band_small(top):
+        band = img.crop((0, top, width, min(height, top + band_rows)))
+        band = enhance_array(band, settings, contrast_mean=contrast_mean_value)
+        return downsample_gray(grayscale(band), factor)
+    
+    mapper = pool.map if pool is not None else map
+    parts = list(mapper(band_small, range(0, height, band_rows)))
+    return close_background(np.concatenate(parts), kernel)
+
+
+class PngStreamWriter:
+    """RGBA PNG를 위에서부터 띠 단위로 이어 쓰는 저장기
+    
+    압축 상태만 유지하므로 전체 결과 이미지를 메모리에 올리지 않고 저장할 수 있습니다.
+    각 행은 Sub 필터(왼쪽 픽셀과의 차이)로 저장합니다.
+    """
+    
+    def __init__(self, path, width, height, compress_level=6):
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.compressor = zlib.compressobj(compress_level)
+        self.file = open(path, 'wb')
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        # 8비트 RGBA (color type 6), 압축/필터/인터레이스 기본값
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+    
+    def _write_chunk(self, chunk_type, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(chunk_type)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type)) & 0xffffffff))
+    
+    def write_rows(self, rows):
+        """(행 수, 너비, 4) 모양의 uint8 배열을 이어서 기록"""
+        count = rows.shape[0]
+        flat = rows.reshape(count, self.width * 4)
+        filtered = np.empty((count, self.width * 4 + 1), dtype=np.uint8)
+        filtered[:, 0] = 1  # Sub 필터
+        filtered[:, 1:5] = flat[:, :4]
+        np.subtract(flat[:, 4:], flat[:, :-4], out=filtered[:, 5:])
+        
+        data = self.compressor.compress(filtered.tobytes())
+        if data:
+            self._write_chunk(b'IDAT', data)
+        self.rows_written += count
+    
+    def close(self):
+        if self.file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"기록된 행 수({self.rows_written})가 "
+                                 f"이미지 높이({self.height})와 다릅니다")
+            self._write_chunk(b'IDAT', self.compressor.flush())
+            self._write_chunk(b'IEND', b'')
+        finally:
+            self.file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+
+def ordered_map(pool, func, items, ahead):
+    """pool에서 func(item)을 실행하고 결과를 items 순서대로 (item, 결과)로 반환
+    
+    최대 ahead개까지만 미리 실행하므로 결과를 천천히 가져가도 메모리가 늘지 않습니다.
+    """
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.submit(func, item)))
+        if len(pending) >= ahead:
+            done, future = pending.popleft()
+            yield done, future.result()
+    while pending:
+        done, future = pending.popleft()
+        yield done, future.result()
+
+
+def iter_bands(img, settings, band_rows, contrast_mean_value=None, threads=1):
+    """겹치는 여유분(halo)을 두고 띠 단위로 배경 제거한 결과를 차례로 반환
+    
+    (시작 행, RGBA 배열) 튜플을 위에서부터 내보내며, 이어 붙이면 전체 이미지를
+    한 번에 처리한 결과와 같습니다. threads가 2 이상이면 띠들을 스레드 풀에서
+    동시에 처리합니다 (numpy/PIL 연산 대부분이 GIL을 놓으므로 여러 코어를 씀).
+    내보내는 순서와 결과는 단일 스레드와 같습니다.
+    """
+    width, height = img.size
+    halo = filter_halo(settings)
+    pool = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+    
+    try:
+        if contrast_mean_value is None:
+            contrast_mean_value = contrast_mean(img, settings, band_rows, pool=pool)
+        
+        illumination = None
+        if uses_illumination(settings):
+            illumination = tiled_illumination(img, settings, contrast_mean_value, band_rows,
+                                              pool)
+        
+        def process_band(top):
+            bottom = min(height, top + band_rows)
+            read_top = max(0, top - halo)
+            read_bottom = min(height, bottom + halo)
+            
+            band = img.crop((0, read_top, width, read_bottom))
+            band = enhance_array(band, settings, contrast_mean=contrast_mean_value)
+            result = remove_background_array(band, settings, illumination=illumination,
+                                             top=read_top)
+            return np.asarray(result)[top - read_top:bottom - read_top]
+        
+        tops = range(0, height, band_rows)
+        if pool is None:
+            for top in tops:
+                yield top, process_band(top)
+        else:
+            # 스레드마다 하나씩 + 그만큼 더 미리 처리해 둠
+            yield from ordered_map(pool, process_band, tops, 2 * threads)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def parallel_band_rows(height, settings, threads):
+    """여러 스레드로 나눌 때의 띠 높이 (스레드당 몇 개씩, 여유분 비중은 작게)"""
+    rows = -(-height // (threads * PARALLEL_BANDS_PER_THREAD))
+    return max(TILE_MIN_ROWS, 4 * filter_halo(settings), rows)
+
+
+@traced('parallel')
+def remove_white_background_parallel(img, settings, threads):
+    """remove_white_background와 같은 결과를 띠로 나눠 여러 스레드에서 계산"""
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    if threads <= 1:
+        return remove_white_background(img, settings)
+    
+    width, height = img.size
+    band_rows = parallel_band_rows(height, settings, threads)
+    result = np.empty((height, width, 4), dtype=np.uint8)
+    for top, rows in iter_bands(img, settings, band_rows, threads=threads):
+        result[top:top + len(rows)] = rows
+    return Image.fromarray(result, 'RGBA')
+
+
+def band_rows_for_budget(width, settings, memory_budget):
+    """메모리 예산 안에 들어가는 띠 높이 계산"""
+    halo = filter_halo(settings)
+    rows = memory_budget // (max(1, width) * TILE_BYTES_PER_PIXEL) - 2 * halo
+    return max(TILE_MIN_ROWS, int(rows))
+
+
+@traced('tiled')
+def process_tiled(img, output_path, settings, memory_budget=256 * 1024 * 1024,
+                  compress_level=6, threads=1):
+    """큰 이미지를 띠 단위로 처리해서 PNG로 바로 저장
+    
+    원본(8비트 RGB)은 한 번만 메모리에 두고, 그 외 작업 메모리는 memory_budget
+    바이트 안에서 띠 높이를 정해 제한합니다. 결과 이미지는 메모리에 모으지 않고
+    띠마다 파일에 이어서 기록합니다. threads가 2 이상이면 동시에 처리되는 띠 수만큼
+    예산을 나눠서 띠 높이를 정합니다.
+    """
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    width, height = img.size
+    # 동시에 메모리에 있는 띠: 처리 중 threads개 + 미리 처리해 둔 threads개
+    in_flight = 2 * threads if threads > 1 else 1
+    band_rows = band_rows_for_budget(width, settings, memory_budget // in_flight)
+    
+    with PngStreamWriter(output_path, width, height, compress_level) as writer:
+        for _, rows in iter_bands(img, settings, band_rows, threads=threads):
+            writer.write_rows(rows)
+
+
+def make_proxy(img, size=PREVIEW_SIZE, full_size=None):
+    """미리보기 크기에 맞춘 축소본과 원본 대비 배율 반환
+    
+    img가 원본을 줄여서 읽은 것이면 full_size에 원본 크기를 주면 됩니다.
+    """
+    width, height = full_size or img.size
+    ratio = min(size[0] / width, size[1] / height, 1.0)
+    if ratio >= 1.0 and img.size == (width, height):
+        return img, 1.0
+    
+    proxy_size = (max(1, round(width * ratio)), max(1, round(height * ratio)))
+    # reducing_gap: 먼저 정수배로 빠르게 줄인 뒤 LANCZOS로 마무리
+    proxy = img.resize(proxy_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    return proxy, proxy_size[0] / width
+
+
+# EXIF 방향 값 중 가로/세로가 바뀌는 것 (90도/270도 회전 계열)
+EXIF_ORIENTATION_TAG = 0x0112
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def oriented_size(img):
+    """EXIF 방향을 적용한 뒤의 이미지 크기 (JPEG는 헤더만 읽음)"""
+    width, height = img.size
+    if img.getexif().get(EXIF_ORIENTATION_TAG) in TRANSPOSED_ORIENTATIONS:
+        return height, width
+    return width, height
+
+
+@traced('decode')
+def open_image(path):
+    """원본 해상도로 이미지 열기 (EXIF 방향 적용, RGB)"""
+    img = ImageOps.exif_transpose(Image.open(path))
+    # RGB로 변환 (RGBA나 다른 모드일 수 있음)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+
+def open_proxy(path, size=PREVIEW_SIZE):
+    """미리보기용 축소본을 빠르게 열기
+    
+    (축소본, 원본 대비 배율, 원본 크기, 원본) 을 반환합니다. JPEG는 DCT 단계에서
+    1/2~1/8로 줄여서 디코딩하므로(draft) 원본은 None이고 따로 open_image로 읽어야
+    합니다. 그 외 형식은 어차피 전체를 디코딩하므로 원본도 함께 돌려줍니다.
+    """
+    img = Image.open(path)
+    if img.format != 'JPEG':
+        full = open_image(path)
+        return make_proxy(full, size) + (full.size, full)
+    
+    # 축소본보다 작아지지 않는 범위에서 가장 많이 줄여서 디코딩
+    full_size = oriented_size(img)
+    ratio = min(size[0] / full_size[0], size[1] / full_size[1], 1.0)
+    img.draft('RGB', (int(np.ceil(img.width * ratio)), int(np.ceil(img.height * ratio))))
+    img = ImageOps.exif_transpose(img)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return make_proxy(img, size, full_size) + (full_size, None)
+
+
+def clamp_region(region, size):
+    """(left, top, right, bottom) 영역을 크기 size인 이미지 안의 정수 좌표로 제한 (최소 1px)"""
+    width, height = size
+    left, top, right, bottom = region
+    left = min(max(0, int(left)), width - 1)
+    top = min(max(0, int(top)), height - 1)
+    right = min(max(left + 1, int(np.ceil(right))), width)
+    bottom = min(max(top + 1, int(np.ceil(bottom))), height)
+    return left, top, right, bottom
+
+
+def region_proxy(img, region, scale=1.0, size=PREVIEW_SIZE):
+    """원본 좌표 영역의 미리보기용 축소본과 원본 대비 배율 반환
+    
+    img는 원본(scale=1.0)이나 배율 scale로 줄인 축소본입니다. 축소본에서 자르면 영역이
+    작을 때 흐리지만 원본 디코딩을 기다리지 않아도 됩니다.
+    """
+    left, top, right, bottom = region
+    if scale != 1.0:
+        scaled = (left * scale, top * scale, right * scale, bottom * scale)
+        region = clamp_region(scaled, img.size)
+    return make_proxy(img.crop(region), size, (right - left, bottom - top))
+
+
+def run_pipeline_loaded(future, settings, cache, source_key, scale=1.0, disk_cache=None,
+                        region=None):
+    """원본 디코딩(future)이 끝나기를 기다렸다가 run_pipeline 실행 (작업 스레드용)
+    
+    region(원본 좌표 (left, top, right, bottom))을 주면 그 영역만 잘라서 처리하므로
+    source_key에도 영역을 넣어야 합니다. disk_cache가 있으면 단계 캐시(메모리)에 없는
+    결과만 디스크 캐시에서 찾고, 새로 만든 결과는 백그라운드에서 디스크에 저장합니다
+    (결과를 기다리는 쪽이 PNG 인코딩/디코딩을 기다리지 않도록). 픽셀 해시는 원본마다
+    한 번만 계산하도록 단계 캐시에 함께 보관합니다.
+    """
+    img = future.result()
+    if region is not None:
+        img = img.crop(region)
+    compute = lambda: run_pipeline(img, settings, cache, source_key, scale)
+    if disk_cache is None:
+        return compute()
+    
+    # 모든 단계가 메모리에 있으면 디스크 캐시의 PNG를 읽는 것보다 훨씬 빠름
+    try:
+        return run_pipeline(img, settings, MemoryOnlyCache(cache), source_key, scale)
+    except StageMissing:
+        pass
+    digest = cache.get_or_compute(('digest',) + tuple(source_key), lambda: image_digest(img))
+    return cached_result(disk_cache, digest, settings, scale, compute, background=True)
+
+
+class StageMissing(Exception):
+    """MemoryOnlyCache에 없는 단계를 만남"""
+
+
+class MemoryOnlyCache:
+    """이미 보관된 단계만 꺼내 주는 run_pipeline용 단계 캐시 (없는 단계는 StageMissing)
+    
+    run_pipeline을 계산 없이 실행해 보고 최종 결과까지 메모리에 있는지 확인할 때 씁니다.
+    """
+    
+    def __init__(self, cache):
+        self.cache = cache
+    
+    def get_or_compute(self, key, compute):
+        missing = object()
+        value = self.cache.get(key, missing)
+        if value is missing:
+            raise StageMissing(key[0])
+        return value
+
+
+# 디스크 결과 캐시
+# 처리 결과가 달라지는 수정을 하면 올려서 이전 캐시 항목을 모두 무효화
+CACHE_FORMAT_VERSION = 1
+# 디스크 캐시 기본 최대 크기
+DEFAULT_DISK_CACHE_BYTES = 1024 * 1024 * 1024
+# 디스크 캐시에 마스크도 저장하는 단계 (run_pipeline의 단계 이름)
+DISK_MASK_STAGES = ('line_mask', 'opaque_mask', 'speckle')
+# 백그라운드 저장을 기다릴 수 있는 최대 결과 수 (넘으면 저장하지 않음, 결과 이미지를 쌓아 두지 않도록)
+DISK_WRITE_QUEUE = 2
+
+
+def default_cache_dir():
+    """운영체제별 사용자 캐시 폴더 아래의 기본 캐시 위치"""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'signature_background_remover')
+
+
+@traced('digest')
+def image_digest(img):
+    """이미지 픽셀 내용의 sha256 (모드와 크기 포함, 파일 이름/형식과 무관)"""
+    digest = hashlib.sha256(f"{img.mode} {img.width}x{img.height}\n".encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def cache_key(*parts):
+    """캐시 키 문자열 (값들의 repr과 캐시 형식 버전의 sha256)"""
+    return hashlib.sha256(repr((CACHE_FORMAT_VERSION,) + parts).encode()).hexdigest()
+
+
+def result_cache_key(digest, settings, scale=1.0):
+    """원본 픽셀 해시와 전체 설정값으로 만든 최종 결과 캐시 키"""
+    return cache_key('result', digest, tuple(sorted(settings.to_dict().items())), scale)
+
+
+class DiskCache:
+    """내용 주소(픽셀 해시 + 설정값) 기반 처리 결과 디스크 캐시
+    
+    항목은 키 앞 두 글자로 나눈 폴더에 무손실 PNG(압축 수준 1)로 저장하며, 꺼낼 때마다
+    수정 시각을 갱신해서 전체 크기가 max_bytes를 넘으면 가장 오래 쓰지 않은 것부터
+    지웁니다. 임시 파일에 쓴 뒤 이름을 바꾸므로 여러 프로세스가 같은 폴더를 함께 써도
+    됩니다. store_masks이면 run_pipeline의 마스크 단계 결과도 저장합니다.
+    """
+    
+    def __init__(self, directory=None, max_bytes=DEFAULT_DISK_CACHE_BYTES, store_masks=False):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.store_masks = store_masks
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._writer = None  # 백그라운드 저장용 스레드 (처음 쓸 때 만듦)
+        self._pending = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._bytes = sum(size for _, size, _ in self._entries())
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.png')
+    
+    def _entries(self):
+        """(수정 시각, 크기, 경로) 목록"""
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.png'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        # 다른 프로세스가 방금 지움
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+    
+    def get(self, key):
+        """저장된 이미지 (없으면 None)"""
+        path = self._path(key)
+        try:
+            with Image.open(path) as img:
+                img.load()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except OSError:
+            # 쓰다 만 파일 등 읽을 수 없는 항목은 지우고 없는 것으로 처리
+            self._remove(path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return img
+    
+    def put(self, key, img):
+        """이미지 저장 (크기 한도를 넘으면 오래된 항목부터 지움)"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        img.save(temp, 'PNG', compress_level=1)
+        size = os.path.getsize(temp)
+        if size > self.max_bytes:
+            os.remove(temp)
+            return
+        os.replace(temp, path)
+        
+        with self._lock:
+            self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._evict()
+    
+    def put_later(self, key, img):
+        """백그라운드 스레드에서 저장 (기다리는 저장이 DISK_WRITE_QUEUE개면 저장하지 않음)
+        
+        캐시는 없어도 처리에 지장이 없으므로 저장 중 오류는 무시합니다.
+        """
+        with self._lock:
+            if self._pending >= DISK_WRITE_QUEUE:
+                return
+            self._pending += 1
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1)
+            writer = self._writer
+        writer.submit(self._put_quietly, key, img)
+    
+    def _put_quietly(self, key, img):
+        try:
+            self.put(key, img)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._pending -= 1
+    
+    def flush(self):
+        """기다리는 백그라운드 저장이 모두 끝날 때까지 대기"""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.shutdown(wait=True)
+    
+    def get_mask(self, key):
+        """저장된 마스크 (bool 배열, 없으면 None)"""
+        img = self.get(key)
+        return None if img is None else np.asarray(img, dtype=bool)
+    
+    def put_mask(self, key, mask):
+        """마스크를 1비트 PNG로 저장"""
+        self.put(key, Image.fromarray(mask))
+    
+    def _evict(self):
+        """폴더를 다시 훑어서 (다른 프로세스가 쓴 항목 포함) 오래된 것부터 지움"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+        self._bytes = total
+    
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    
+    def clear(self):
+        """모든 항목 삭제"""
+        with self._lock:
+            for _, _, path in self._entries():
+                self._remove(path)
+            self._bytes = 0
+
+
+class DiskStageCache:
+    """run_pipeline용 단계 캐시: 메모리 캐시를 쓰면서 마스크 단계만 디스크에도 저장
+    
+    원본 구분값(source_key)으로 픽셀 해시를 넘겨야 다른 실행에서도 키가 같아집니다.
+    """
+    
+    def __init__(self, disk_cache, memory_cache=None):
+        self.disk = disk_cache
+        self.memory = memory_cache if memory_cache is not None else PipelineCache()
+    
+    def get_or_compute(self, key, compute):
+        if key[0] not in DISK_MASK_STAGES:
+            return self.memory.get_or_compute(key, compute)
+        
+        disk_key = cache_key('mask', key)
+        
+        def load_or_compute():
+            mask = self.disk.get_mask(disk_key)
+            if mask is None:
+                mask = compute()
+                self.disk.put_mask(disk_key, mask)
+            return mask
+        
+        return self.memory.get_or_compute(key, load_or_compute)
+
+
+def remove_white_background_cached(img, settings, disk_cache, scale=1.0, threads=1,
+                                   digest=None):
+    """디스크 캐시에 같은 픽셀 + 같은 설정의 결과가 있으면 처리 없이 꺼내고, 없으면 처리해서 저장
+    
+    digest는 미리 계산한 image_digest(img)입니다 (없으면 여기서 계산).
+    결과는 remove_white_background와 같습니다.
+    """
+    if digest is None:
+        digest = image_digest(img)
+    
+    def compute():
+        if disk_cache.store_masks:
+            return run_pipeline(img, settings, DiskStageCache(disk_cache), digest, scale)
+        if threads > 1:
+            return remove_white_background_parallel(img, settings, threads)
+        return remove_white_background(img, settings, scale)
+    
+    return cached_result(disk_cache, digest, settings, scale, compute)
+
+
+def cached_result(disk_cache, digest, settings, scale, compute, background=False):
+    """디스크 캐시에서 결과를 꺼내거나, 없으면 compute()로 만들어서 저장
+    
+    background이면 저장을 기다리지 않고 바로 반환합니다 (DiskCache.put_later).
+    """
+    key = result_cache_key(digest, settings, scale)
+    result = disk_cache.get(key)
+    if result is None:
+        result = compute()
+        if background:
+            disk_cache.put_later(key, result)
+        else:
+            disk_cache.put(key, result)
+    return result
+
+
+# 잉크 영역 찾기 (문서 전체 스캔에서 서명/도장 위치 검출)
+# 검출용 축소본의 긴 변 최대 길이
+LOCATE_MAX_SIDE = 1024
+# 잉크 밀도를 모으는 격자 칸 크기 (축소본 px)
+LOCATE_CELL = 8
+# 조명 평탄화 후 이보다 어두우면 잉크
+LOCATE_INK_LEVEL = 180
+# 채널 최댓값 - 최솟값이 이보다 크면 색 잉크 (빨간 인주, 파란 펜)
+LOCATE_CHROMA = 60
+# 잉크 비율이 이 이상인 칸만 잉크 덩어리로 봄 (흩어진 먼지 무시)
+LOCATE_CELL_DENSITY = 0.02
+# 이 칸 수만큼 떨어진 칸까지 한 덩어리로 묶음 (끊어진 획을 한 서명으로)
+LOCATE_MERGE_CELLS = 2
+# 잉크 면적이 페이지의 이 비율보다 작은 덩어리는 버림
+LOCATE_MIN_AREA = 0.0005
+# 경계 상자가 페이지의 이 비율보다 큰 덩어리는 버림 (페이지 테두리 그림자 등)
+LOCATE_MAX_BOX = 0.5
+# 찾은 영역 둘레에 더하는 여백 (축소본 px)
+LOCATE_PADDING = LOCATE_CELL
+# 잉크 색 분류 이름
+INK_COLORS = {
+    'red': '빨강',
+    'blue': '파랑',
+    'dark': '검정',
+}
+# 잉크 색별 점수 가중치 (인쇄된 검은 글자보다 도장/펜 색을 앞에)
+INK_COLOR_WEIGHTS = {'red': 2.0, 'blue': 1.5, 'dark': 1.0}
+# 가로세로 비가 이보다 크면 글자 줄이나 밑줄일 가능성이 높으므로 점수를 낮춤
+LOCATE_MAX_ASPECT = 8
+
+
+@dataclass(frozen=True)
+class InkRegion:
+    """잉크 덩어리 하나 (box는 원본 좌표 (left, top, right, bottom))"""
+    box: tuple
+    score: float
+    color: str
+    ink_pixels: int
+    density: float
+
+
+def label_grid(grid):
+    """bool 격자의 8방향 연결 요소 번호와 개수 (scipy가 없으면 파이썬으로 계산)
+    
+    격자는 축소본을 칸으로 나눈 것이라 작으므로 파이썬 탐색도 충분히 빠릅니다.
+    """
+    ndimage = scipy_ndimage()
+    if ndimage is not None:
+        return ndimage.label(grid, structure=np.ones((3, 3), dtype=bool))
+    
+    height, width = grid.shape
+    cells = grid.tolist()
+    labels = np.zeros(grid.shape, dtype=np.int32)
+    seen = [[False] * width for _ in range(height)]
+    count = 0
+    for row, col in zip(*np.nonzero(grid)):
+        if seen[row][col]:
+            continue
+        count += 1
+        seen[row][col] = True
+        stack = [(row, col)]
+        while stack:
+            r, c = stack.pop()
+            labels[r, c] = count
+            for nr in range(max(0, r - 1), min(height, r + 2)):
+                for nc in range(max(0, c - 1), min(width, c + 2)):
+                    if cells[nr][nc] and not seen[nr][nc]:
+                        seen[nr][nc] = True
+                        stack.append((nr, nc))
+    return labels, count
+
+
+def ink_color_class(mean_rgb):
+    """평균 잉크 색 (r, g, b)의 분류 (INK_COLORS의 키)"""
+    r, g, b = mean_rgb
+    if r - max(g, b) > 40:
+        return 'red'
+    if b - max(r, g) > 20:
+        return 'blue'
+    return 'dark'
+
+
+def ink_clusters(ink, rgb):
+    """잉크 마스크에서 가까운 잉크끼리 묶은 덩어리들의 (경계 상자, 잉크 픽셀 수, 평균 색) 목록
+    
+    잉크 밀도가 있는 격자 칸을 LOCATE_MERGE_CELLS 칸까지 이어 붙여 연결 요소를 구하고,
+    덩어리별 면적/경계 상자/평균 색은 잉크 픽셀을 한 번 훑어서 한꺼번에 계산합니다.
+    """
+    height, width = ink.shape
+    
+    # 격자 칸별 잉크 비율 (가장자리는 빈 칸으로 채움)
+    grid_height = -(-height // LOCATE_CELL)
+    grid_width = -(-width // LOCATE_CELL)
+    padded = np.zeros((grid_height * LOCATE_CELL, grid_width * LOCATE_CELL), dtype=np.float32)
+    padded[:height, :width] = ink
+    density = padded.reshape(grid_height, LOCATE_CELL, grid_width, LOCATE_CELL).mean(axis=(1, 3))
+    occupied = (density >= LOCATE_CELL_DENSITY).astype(np.uint8)
+    
+    # 가까운 칸끼리 묶어서 연결 요소 번호 매기기
+    merged = occupied
+    for axis in (0, 1):
+        merged = rank_filter_1d(merged, 2 * LOCATE_MERGE_CELLS + 1, axis, np.maximum)
+    labels, count = label_grid(merged.astype(bool))
+    if count == 0:
+        return []
+    
+    # 잉크 픽셀마다 속한 덩어리 번호 (밀도가 낮은 칸의 먼지는 제외)
+    rows, cols = np.nonzero(ink)
+    dense = occupied[rows // LOCATE_CELL, cols // LOCATE_CELL].astype(bool)
+    rows, cols = rows[dense], cols[dense]
+    owner = labels[rows // LOCATE_CELL, cols // LOCATE_CELL]
+    areas = np.bincount(owner, minlength=count + 1)
+    top = np.full(count + 1, height, dtype=np.intp)
+    left = np.full(count + 1, width, dtype=np.intp)
+    bottom = np.zeros(count + 1, dtype=np.intp)
+    right = np.zeros(count + 1, dtype=np.intp)
+    np.minimum.at(top, owner, rows)
+    np.minimum.at(left, owner, cols)
+    np.maximum.at(bottom, owner, rows + 1)
+    np.maximum.at(right, owner, cols + 1)
+    colors = np.stack([np.bincount(owner, rgb[rows, cols, channel], count + 1)
+                       for channel in range(3)], axis=1)
+    
+    return [((left[label], top[label], right[label], bottom[label]), areas[label],
+             colors[label] / areas[label])
+            for label in range(1, count + 1) if areas[label] > 0]
+
+
+@traced('locate')
+def locate_ink_regions(img, max_regions=None, max_side=LOCATE_MAX_SIDE):
+    """문서 이미지에서 서명/도장 후보 잉크 덩어리를 찾아 점수 순으로 반환 (InkRegion 목록)
+    
+    긴 변이 max_side 이하가 되도록 정수배로 줄인 축소본에서 찾습니다. 채도가 높은 픽셀(빨간
+    인주, 파란 펜)과 조명을 평탄화한 뒤 어두운 픽셀을 따로 묶으므로 인쇄된 글자 위에 찍힌
+    도장도 글자와 섞이지 않습니다. 점수는 잉크 면적에 색(빨강 > 파랑 > 검정)과 모양(글자
+    줄처럼 아주 길쭉하면 낮춤) 가중치를 곱한 값입니다.
+    """
+    factor = max(1, int(np.ceil(max(img.size) / max_side)))
+    small = img if img.mode == 'RGB' else img.convert('RGB')
+    if factor > 1:
+        small = small.reduce(factor)
+    rgb = np.asarray(small)
+    height, width = rgb.shape[:2]
+    
+    # 색 잉크: 채도가 높은 픽셀, 검은 잉크: 조명을 평탄화한 밝기가 어두운 나머지 픽셀
+    gray = grayscale(rgb)
+    illumination_factor, _ = illumination_params(1 / factor)
+    flattened = flatten_illumination(gray, estimate_illumination(gray, 1 / factor),
+                                     illumination_factor)
+    colored = (rgb.max(axis=2).astype(np.int16) - rgb.min(axis=2)) > LOCATE_CHROMA
+    dark = (flattened < LOCATE_INK_LEVEL) & ~colored
+    
+    regions = []
+    for ink in (colored, dark):
+        for (left, top, right, bottom), area, mean_rgb in ink_clusters(ink, rgb):
+            if area < LOCATE_MIN_AREA * height * width:
+                continue
+            box_width, box_height = right - left, bottom - top
+            if box_width * box_height > LOCATE_MAX_BOX * height * width:
+                continue
+            
+            color = ink_color_class(mean_rgb) if ink is colored else 'dark'
+            aspect = max(box_width, box_height) / min(box_width, box_height)
+            weight = INK_COLOR_WEIGHTS[color] * (0.25 if aspect > LOCATE_MAX_ASPECT else 1.0)
+            # 축소본 좌표를 원본 좌표로 (여백 포함)
+            box = clamp_region(((left - LOCATE_PADDING) * factor, (top - LOCATE_PADDING) * factor,
+                                (right + LOCATE_PADDING) * factor,
+                                (bottom + LOCATE_PADDING) * factor), img.size)
+            regions.append(InkRegion(box, float(area * weight * factor * factor), color,
+                                     int(area * factor * factor),
+                                     float(area / (box_width * box_height))))
+    
+    regions.sort(key=lambda region: region.score, reverse=True)
+    return regions[:max_regions]
+
+
+# 자동 최적화 (무작위 표본 행의 잉크/종이 밝기 분포로 설정값 추정)
+# 표본으로 읽을 행 수와 행마다 남길 최대 픽셀 수 (이미지 크기와 무관하게 일정)
+AUTO_SAMPLE_ROWS = 64
+AUTO_SAMPLE_WIDTH = 1024
+# 행별 종이 밝기(윗면)를 구하는 닫힘 연산 창 크기 (표본 행 너비 대비)
+AUTO_ENVELOPE_FRACTION = 1 / 32
+# 대비 강화 후 잉크와 종이 밝기 차이의 목표값
+AUTO_TARGET_GAP = 160
+# 종이 밝기가 이보다 어두우면 밝기를 올림
+AUTO_PAPER_LEVEL = 230
+# 잉크 비율이 이보다 작으면 밝기 분포로 잉크를 나눌 수 없다고 보고 종이 분포의 끝을 사용
+AUTO_MIN_INK_FRACTION = 0.001
+# 경계값을 잉크 쪽에서 종이 쪽으로 얼마나 옮길지 (0이면 잉크 밝기, 1이면 종이 밝기)
+AUTO_EDGE_BIAS = 0.6
+# 그림자 진 종이 밝기로 보는 종이 무리의 백분위
+AUTO_SHADOW_PERCENTILE = 1
+# 일반 모드에서 대비 강화 후 종이의 채널 차이 합 상한 (그림자 판단 기준 30보다 작게)
+AUTO_MAX_TINT = 24
+
+
+def sample_rows(img, rows=AUTO_SAMPLE_ROWS, width=AUTO_SAMPLE_WIDTH, seed=0):
+    """무작위로 고른 행들을 가로 width 픽셀 이하로 솎아 읽은 (행 수, 너비, 3) uint8 배열
+    
+    행 단위로만 잘라 읽으므로 전체 이미지를 배열로 바꾸지 않고, 걸리는 시간이 이미지
+    높이와 무관합니다. seed가 같으면 같은 행을 고릅니다.
+    """
+    rng = np.random.default_rng(seed)
+    full_width, height = img.size
+    step = -(-full_width // width)
+    offset = int(rng.integers(step))
+    samples = []
+    for y in np.sort(rng.choice(height, min(rows, height), replace=False)):
+        row = img.crop((0, int(y), full_width, int(y) + 1))
+        if row.mode != 'RGB':
+            row = row.convert('RGB')
+        samples.append(np.asarray(row)[0, offset::step])
+    return np.stack(samples)
+
+
+def otsu_threshold(histogram):
+    """밝기 히스토그램을 두 무리로 나누는 오츠 경계값 (이 값 미만이 어두운 무리)"""
+    histogram = np.asarray(histogram, dtype=np.float64)
+    levels = np.arange(len(histogram))
+    weight = np.cumsum(histogram)
+    total = weight[-1]
+    mean = np.cumsum(histogram * levels)
+    # 경계 k에서 나눈 두 무리의 무리 간 분산 (k 이하 / k 초과)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (mean[-1] * weight - mean * total) ** 2 / (weight * (total - weight))
+    if np.isnan(between[:-1]).all():
+        # 밝기가 한 가지뿐이면 나눌 수 없으므로 모두 밝은 무리 (빈 종이)
+        return int(np.argmax(histogram > 0))
+    return int(np.nanargmax(between[:-1])) + 1
+
+
+@traced('auto_settings')
+def estimate_settings(img, line_only=True, base=DEFAULT_SETTINGS):
+    """표본 행의 잉크/종이 밝기 분포로 설정값 추정 (가장자리 설정 등 나머지는 base 유지)
+    
+    표본 행마다 닫힘 연산으로 종이 밝기(윗면)를 구해 나눈 밝기 비율로 오츠 경계를 잡으므로
+    그림자 진 종이가 잉크로 잡히지 않습니다. 잉크/종이 무리의 밝기로 대비와 밝기를 정하고,
+    같은 밝기/대비 변환표를 거친 값 사이에 경계값을 둡니다. 선만 추출 모드는 조명 평탄화
+    뒤의 밝기를, 일반 모드는 가장 어두운 채널(모든 채널이 경계값 이상이면 배경)을 기준으로
+    합니다.
+    """
+    rgb = sample_rows(img)
+    gray = grayscale(rgb)
+    window = max(3, int(gray.shape[1] * AUTO_ENVELOPE_FRACTION) | 1)
+    envelope = gray
+    for reduce in (np.maximum, np.minimum):
+        envelope = rank_filter_1d(envelope, window, 1, reduce)
+    envelope = np.maximum(envelope, 1).astype(np.float32)
+    ratio = np.minimum(np.round(gray * np.float32(255) / envelope), 255).astype(np.uint8)
+    
+    # 종이 대비 밝기 비율로 잉크와 종이 나누기
+    cut = otsu_threshold(np.bincount(ratio.ravel(), minlength=256))
+    ink = ratio < cut
+    if ink.sum() < AUTO_MIN_INK_FRACTION * ink.size:
+        # 잉크가 거의 없으면 가장 어두운 쪽 끝을 잉크로 봄
+        ink = ratio <= np.percentile(ratio, AUTO_SHADOW_PERCENTILE)
+    paper = ~ink
+    if not paper.any():
+        return base.replace(line_only=line_only, shadow_removal=True)
+    
+    ink_level = float(np.median(gray[ink]))
+    paper_level = float(np.median(gray[paper]))
+    brightness = float(np.clip(AUTO_PAPER_LEVEL / max(paper_level, 1), 1.0, 1.3))
+    brightness = round(brightness * 20) / 20
+    contrast = AUTO_TARGET_GAP / max(paper_level - ink_level, 1) / brightness
+    if not line_only:
+        # 일반 모드의 그림자 판단(채널 차이 합 < 30)이 종이 색조 때문에 깨지지 않도록
+        # 밝기/대비 조절로 커지는 종이의 채널 차이를 제한
+        channels = rgb[paper].astype(np.int16)
+        tint = np.abs(channels - np.roll(channels, 1, axis=1)).sum(axis=1)
+        contrast = min(contrast, AUTO_MAX_TINT / max(float(np.percentile(tint, 90)), 1) /
+                       brightness)
+    contrast = round(float(np.clip(contrast, 1.0, 3.0)), 1)
+    
+    # enhance_array와 같은 밝기/대비 변환표 (채널마다 같은 표이므로 가장 어두운 채널에도 적용됨)
+    lut = blend_lut(0, brightness)
+    lut = blend_lut(int(lut[gray].mean() + 0.5), contrast)[lut].astype(np.float32)
+    
+    if line_only:
+        # 조명 평탄화 뒤의 밝기 (종이 ≈ 255), 잉크와 그림자 진 종이의 어두운 끝 사이에 경계
+        flattened = lut[gray] * 255 / np.maximum(lut[np.round(envelope).astype(np.uint8)], 1)
+        low = float(np.median(flattened[ink]))
+        high = float(np.percentile(flattened[paper], AUTO_SHADOW_PERCENTILE))
+        shadow_threshold = low + AUTO_EDGE_BIAS * (high - low)
+        # 그림자 제거를 끈 경우의 기준 (gray < 255 - 배경 제거 강도)
+        low, high = float(np.median(lut[gray[ink]])), float(np.median(lut[gray[paper]]))
+        threshold = 255 - (low + AUTO_EDGE_BIAS * (high - low))
+    else:
+        # 모든 채널이 배경 제거 강도 이상이면 배경, 그림자 진 종이는 그림자 제거 강도로 지움
+        darkest = lut[rgb.min(axis=2)]
+        low = float(np.median(darkest[ink]))
+        threshold = low + AUTO_EDGE_BIAS * (float(np.median(darkest[paper])) - low)
+        shadow = float(np.percentile(darkest[paper], AUTO_SHADOW_PERCENTILE))
+        shadow_threshold = low + AUTO_EDGE_BIAS * (shadow - low)
+    
+    return base.replace(
+        line_only=line_only,
+        shadow_removal=True,
+        brightness=brightness,
+        contrast=contrast,
+        threshold=int(np.clip(round(threshold), 150, 250)),
+        shadow_threshold=int(np.clip(round(shadow_threshold), 100, 200)),
+    )
+
+
+# 자동 튜닝 (축소본에서 여러 설정을 병렬로 처리해 보고 점수가 가장 높은 설정 선택)
+# 평가에 쓰는 축소본 크기 (후보 하나가 수십 ms 이내)
+TUNE_SIZE = (640, 640)
+# 평가할 후보 설정 수 (자동 최적화 추정값 포함)
+TUNE_CANDIDATES = 48
+# 추정값 주변에서 후보를 뽑는 범위
+TUNE_THRESHOLD_RANGE = 30
+TUNE_CONTRAST_RANGE = 0.35      # 대비는 배율로 (exp(±범위))
+TUNE_BRIGHTNESS_RANGE = 0.15
+TUNE_MAX_SMOOTH = 3             # 가장자리 부드럽게/매끄럽게는 0-3 중에서
+# 확실한 종이로 보는 밝기 (오츠 경계와 255 사이의 비율)
+TUNE_PAPER_MARGIN = 0.5
+# 끊김을 셀 때 무시하는 작은 조각 크기 (축소본 픽셀 수)
+TUNE_MIN_PIECE = 4
+# 가장자리 평가에 쓰는 원본 해상도 조각 크기 (가장자리 설정은 축소본에서 원본과 다르게 동작)
+TUNE_EDGE_SIZE = 256
+# 잉크 경계에서 안팎으로 이 픽셀 수 안쪽을 가장자리로 봄
+TUNE_EDGE_BAND = 2
+# 점수 = 잉크 보존율 - 남은 종이(잉크 면적 대비) - 가중치 x 끊김 - 가중치 x 가장자리 오차
+TUNE_FRAGMENT_WEIGHT = 0.25
+TUNE_EDGE_WEIGHT = 0.25
+
+
+@dataclass(frozen=True, eq=False)
+class TuneReference:
+    """자동 튜닝 점수의 기준 (조명을 평탄화한 축소본에서 확실한 잉크/종이 위치)"""
+    ink: np.ndarray         # 확실한 잉크 픽셀 (bool)
+    paper: np.ndarray       # 확실한 종이 픽셀 (bool)
+    pieces: int             # 잉크 영역의 조각 수 (TUNE_MIN_PIECE 이상)
+    edge_sample: np.ndarray # 가장자리를 평가할 원본 해상도 조각 (RGB uint8)
+    band: np.ndarray        # 조각에서 잉크 경계 주변 픽셀 (bool)
+    coverage: np.ndarray    # band 픽셀마다 잉크가 덮은 정도 (0-1, float32)
+
+
+def count_pieces(mask):
+    """8방향 연결 요소 중 TUNE_MIN_PIECE 픽셀 이상인 조각 수"""
+    labels, count = label_grid(mask)
+    if count == 0:
+        return 0
+    return int(np.count_nonzero(np.bincount(labels.ravel())[1:] >= TUNE_MIN_PIECE))
+
+
+def tune_sample(img, size=TUNE_SIZE):
+    """자동 튜닝에서 평가할 축소본과 원본 대비 배율 (최근접 픽셀로 축소)
+    
+    평균을 내며 줄이면 종이의 잡티가 사라지고 가는 선이 흐려져 원본과 다른 설정이
+    좋아 보이므로, 원본 픽셀을 그대로 골라 담아 밝기 분포를 원본과 같게 유지합니다.
+    """
+    ratio = min(size[0] / img.width, size[1] / img.height, 1.0)
+    sample_size = (max(1, round(img.width * ratio)), max(1, round(img.height * ratio)))
+    sample = img.resize(sample_size, Image.Resampling.NEAREST) if ratio < 1.0 else img
+    return (sample if sample.mode == 'RGB' else sample.convert('RGB')), sample_size[0] / img.width
+
+
+def edge_band(mask, width):
+    """mask 경계에서 안팎으로 width 픽셀 안쪽인 픽셀 (3x3 팽창 - 3x3 침식을 width번)"""
+    dilated = eroded = mask
+    for _ in range(width):
+        dilated = count_neighbors_3x3(np.pad(dilated, 1)) > 0
+        eroded = count_neighbors_3x3(np.pad(eroded, 1, constant_values=True)) == 9
+    return dilated & ~eroded
+
+
+def flattened_split(img_array, scale=1.0):
+    """조명을 평탄화한 밝기와 그 오츠 경계"""
+    gray = grayscale(img_array)
+    factor, _ = illumination_params(scale)
+    flattened = flatten_illumination(gray, estimate_illumination(gray, scale), factor)
+    return flattened, otsu_threshold(np.bincount(flattened.ravel(), minlength=256))
+
+
+def tune_edge_crop(img, sample, ink, size=TUNE_EDGE_SIZE):
+    """축소본에서 잉크 경계가 가장 많은 곳의 원본 해상도 조각 (RGB 배열)"""
+    ratio = sample.width / img.width
+    height, width = ink.shape
+    window_h = min(height, max(1, round(size * ratio)))
+    window_w = min(width, max(1, round(size * ratio)))
+    
+    # 창마다 경계 픽셀 수 (누적합 차이)
+    sums = np.pad(edge_band(ink, 1), ((1, 0), (1, 0))).cumsum(0, dtype=np.int32).cumsum(1)
+    counts = (sums[window_h:, window_w:] - sums[:-window_h, window_w:] -
+              sums[window_h:, :-window_w] + sums[:-window_h, :-window_w])
+    y, x = np.unravel_index(int(np.argmax(counts)), counts.shape)
+    
+    left = max(0, min(int(x / ratio), img.width - size))
+    top = max(0, min(int(y / ratio), img.height - size))
+    crop = img.crop((left, top, min(img.width, left + size), min(img.height, top + size)))
+    return np.asarray(crop if crop.mode == 'RGB' else crop.convert('RGB'))
+
+
+def tune_reference(sample, scale=1.0, img=None):
+    """축소본의 평탄화한 밝기를 오츠 경계로 나눠 점수 기준 만들기
+    
+    경계 근처의 애매한 픽셀은 빼고, 잉크 무리 중앙값보다 어두운 쪽 절반까지를 확실한
+    잉크로, 경계와 255 사이 TUNE_PAPER_MARGIN 이상 밝은 쪽을 확실한 종이로 봅니다.
+    가장자리 기준은 원본 img(없으면 sample)에서 잘라낸 조각의 잉크/종이 밝기 사이를
+    잉크가 덮은 정도(0-1)로 봅니다 (스캔한 선의 경계는 원래 반쯤 덮인 픽셀로 이어짐).
+    """
+    flattened, cut = flattened_split(np.asarray(sample), scale)
+    ink = flattened < cut
+    ink_level = float(np.median(flattened[ink])) if ink.any() else 0.0
+    
+    edge_sample = tune_edge_crop(sample if img is None else img, sample, ink)
+    edge_flattened, edge_cut = flattened_split(edge_sample)
+    edge_ink = edge_flattened < edge_cut
+    band = edge_band(edge_ink, TUNE_EDGE_BAND)
+    if edge_ink.any() and not edge_ink.all():
+        dark = float(np.median(edge_flattened[edge_ink]))
+        light = float(np.median(edge_flattened[~edge_ink]))
+        coverage = (light - edge_flattened[band]) / np.float32(max(1.0, light - dark))
+    else:
+        band[:] = False
+        coverage = np.zeros(0, dtype=np.float32)
+    
+    return TuneReference(
+        ink=flattened <= (ink_level + cut) / 2,
+        paper=flattened >= cut + TUNE_PAPER_MARGIN * (255 - cut),
+        pieces=count_pieces(ink),
+        edge_sample=edge_sample,
+        band=band,
+        coverage=np.clip(coverage, 0, 1).astype(np.float32),
+    )
+
+
+def score_settings(sample, settings, reference, scale=1.0):
+    """settings로 처리한 결과의 점수 (클수록 좋음, 최대 1)
+    
+    축소본의 후처리 전 불투명 마스크로 (가장자리 설정이 잉크를 가늘게 하거나 조각을 합쳐
+    흔들지 않도록)
+    - 잉크 보존율: 확실한 잉크 중 불투명하게 남은 비율
+    - 남은 종이: 확실한 종이 중 불투명하게 남은 픽셀 수 (잉크 면적 대비)
+    - 끊김: 기준보다 늘어난 조각 수 (기준 조각 수 대비, 선이 끊기거나 잡티가 남으면 늘어남)
+    원본 해상도 조각의 최종 알파로
+    - 가장자리 오차: 잉크 경계 주변에서 알파와 잉크가 덮은 정도의 평균 차이 (0-1, 계단진
+      가장자리와 지나치게 흐린 가장자리 모두 커짐)
+    """
+    kept = opaque_mask_array(enhance_array(sample, settings), settings, scale)
+    ink_area = max(1, int(np.count_nonzero(reference.ink)))
+    recall = np.count_nonzero(kept & reference.ink) / ink_area
+    residue = np.count_nonzero(kept & reference.paper) / ink_area
+    fragments = max(0, count_pieces(kept) - reference.pieces) / max(1, reference.pieces)
+    
+    edge_error = 0.0
+    if reference.coverage.size:
+        crop = remove_white_background(Image.fromarray(reference.edge_sample), settings)
+        alpha = np.asarray(crop.getchannel('A'))[reference.band]
+        edge_error = float(np.abs(alpha * np.float32(1 / 255) - reference.coverage).mean())
+    
+    return float(recall - min(residue, 1.0) - TUNE_FRAGMENT_WEIGHT * min(fragments, 1.0) -
+                 TUNE_EDGE_WEIGHT * edge_error)
+
+
+def tune_candidates(start, count=TUNE_CANDIDATES, seed=0):
+    """start 주변에서 무작위로 뽑은 후보 설정 목록 (첫 번째는 start, 중복 없음)
+    
+    조명 평탄화 방식의 선만 추출 모드는 배경 제거 강도를 쓰지 않으므로 바꾸지 않습니다.
+    """
+    rng = np.random.default_rng(seed)
+    vary_threshold = not uses_illumination(start)
+    candidates = {start: None}
+    # 중복을 걸러내므로 넉넉히 시도
+    for _ in range(count * 4):
+        if len(candidates) >= count:
+            break
+        offset = int(rng.integers(-TUNE_THRESHOLD_RANGE, TUNE_THRESHOLD_RANGE + 1))
+        threshold = start.threshold + offset if vary_threshold else start.threshold
+        shadow = start.shadow_threshold + int(rng.integers(-TUNE_THRESHOLD_RANGE,
+                                                           TUNE_THRESHOLD_RANGE + 1))
+        contrast = start.contrast * np.exp(rng.uniform(-TUNE_CONTRAST_RANGE,
+                                                       TUNE_CONTRAST_RANGE))
+        brightness = start.brightness + rng.uniform(-TUNE_BRIGHTNESS_RANGE,
+                                                    TUNE_BRIGHTNESS_RANGE)
+        candidate = start.replace(
+            threshold=int(np.clip(threshold, 150, 250)),
+            shadow_threshold=int(np.clip(shadow, 100, 200)),
+            contrast=round(float(np.clip(contrast, 1.0, 4.0)), 1),
+            brightness=round(float(np.clip(brightness, 0.5, 2.0)) * 20) / 20,
+            blur=int(rng.integers(TUNE_MAX_SMOOTH + 1)),
+            edge_smooth=int(rng.integers(TUNE_MAX_SMOOTH + 1)),
+        )
+        candidates.setdefault(candidate, None)
+    return list(candidates)
+
+
+# 튜닝 작업자 프로세스가 들고 있는 (축소본, 점수 기준, 배율), 풀을 만들 때 한 번만 전달
+_tune_state = None
+
+
+def _tune_init(sample_array, reference, scale):
+    global _tune_state
+    _tune_state = (Image.fromarray(sample_array), reference, scale)
+
+
+def _tune_score(settings):
+    sample, reference, scale = _tune_state
+    return score_settings(sample, settings, reference, scale)
+
+
+@traced('auto_tune')
+def tune_settings(img, line_only=True, base=DEFAULT_SETTINGS, count=TUNE_CANDIDATES,
+                  workers=None, seed=0):
+    """축소본에서 후보 설정을 병렬로 평가해 (가장 좋은 설정, 점수) 반환
+    
+    자동 최적화 추정값(estimate_settings)을 출발점으로 그 주변 후보를 무작위로 뽑아
+    축소본(tune_sample)에서 score_settings로 비교합니다. 후보는 작업자 프로세스 workers개(기본: CPU 수)에 나눠
+    처리하며, 1개면 현재 프로세스에서 처리합니다. 화면 프로그램에서도 안전하도록 작업자는
+    spawn 방식으로 띄웁니다.
+    """
+    start = estimate_settings(img, line_only, base)
+    candidates = tune_candidates(start, count, seed)
+    sample, scale = tune_sample(img)
+    reference = tune_reference(sample, scale, img)
+    
+    workers = min(workers or os.cpu_count() or 1, len(candidates))
+    if workers <= 1:
+        scores = [score_settings(sample, candidate, reference, scale) for candidate in candidates]
+    else:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_tune_init,
+                                 initargs=(np.asarray(sample), reference, scale)) as pool:
+            scores = list(pool.map(_tune_score, candidates,
+                                   chunksize=-(-len(candidates) // (workers * 2))))
+    
+    # 점수가 같으면 앞쪽(추정값에 가까운 쪽) 후보
+    best = int(np.argmax(scores))
+    return candidates[best], scores[best]
@@ -0,0 +1,344 @@
+"""누끼따기 일괄 처리 (화면 없이 명령줄에서 실행)
+
+폴더나 glob 패턴으로 지정한 이미지들의 배경을 제거해서 투명 PNG(또는 WebP)로 저장합니다.
+여러 프로세스로 나눠서 처리하며, 파일별 처리 시간/파일 크기/인코딩 시간과 초당 처리
+장수를 출력합니다.
+
+사용 예:
+    python 배경제거_일괄처리.py scans/ -o out/
+    python 배경제거_일괄처리.py "scans/*.jpg" -o out/ --preset lines -j 8
+    python 배경제거_일괄처리.py scans/ -o out/ --preset my_preset.json --set threshold=230
+    python 배경제거_일괄처리.py big_scans/ -o out/ --memory-budget 256
+    python 배경제거_일괄처리.py huge_scan.tif -o out/ -j 1 --threads 16
+    python 배경제거_일괄처리.py scans/ -o out/ --crop --padding 24
+    python 배경제거_일괄처리.py scans/ -o out/ --crop --format png_mask --compress-level 9
+    python 배경제거_일괄처리.py scans/ -o out/ --trace trace.json
+    python 배경제거_일괄처리.py scans/ -o out/ --cache --cache-size 4096
+    python 배경제거_일괄처리.py documents/ -o out/ --locate 3 --crop
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool, cpu_count
+
+from 배경제거_엔진 import (ALPHA_MODES, DEFAULT_COMPRESS_LEVEL, DEFAULT_CROP_PADDING,
+                       DEFAULT_DISK_CACHE_BYTES, DEFAULT_SETTINGS, EXPORT_EXTENSIONS,
+                       EXPORT_FORMATS, INK_COLORS, INK_FILTERS, PRESETS, SHADOW_METHODS, DiskCache,
+                       RemovalSettings, StageTracer, crop_to_content, default_cache_dir,
+                       export_image, format_size, locate_ink_regions, open_image,
+                       process_tiled, remove_white_background, remove_white_background_cached,
+                       remove_white_background_parallel, set_tracer, summarize_trace,
+                       write_trace)
+
+# 입력으로 받는 이미지 확장자 (화면의 파일 선택 창과 동일)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff')
+
+# --locate에서 N을 생략했을 때 한 장에서 찾을 최대 영역 수
+DEFAULT_LOCATE_REGIONS = 4
+
+# 작업자 프로세스별 디스크 캐시 (worker_disk_cache에서 만듦)
+_disk_caches = {}
+
+# 정해진 값 중 하나만 고를 수 있는 설정 항목
+CHOICES = {
+    'shadow_method': SHADOW_METHODS,
+    'alpha_mode': ALPHA_MODES,
+    'ink_filter': INK_FILTERS,
+}
+
+
+def collect_inputs(patterns):
+    """폴더 또는 glob 패턴 목록에서 처리할 이미지 파일 목록 만들기"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            names = sorted(os.listdir(pattern))
+            candidates = [os.path.join(pattern, name) for name in names]
+        else:
+            candidates = sorted(glob.glob(pattern))
+
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                files.append(path)
+
+    # 중복 제거 (순서 유지)
+    return list(dict.fromkeys(files))
+
+
+def parse_value(key, text):
+    """--set 값 문자열을 기본 설정값과 같은 자료형으로 변환"""
+    default = getattr(DEFAULT_SETTINGS, key)
+    if isinstance(default, bool):
+        if text.lower() in ('1', 'true', 'yes', 'on'):
+            return True
+        if text.lower() in ('0', 'false', 'no', 'off'):
+            return False
+        raise ValueError(f"{key}: 참/거짓 값이 아닙니다 ({text})")
+    if key in CHOICES and text not in CHOICES[key]:
+        raise ValueError(f"{key}: 알 수 없는 방식입니다 ({text}, "
+                         f"사용 가능: {', '.join(CHOICES[key])})")
+    try:
+        return type(default)(text)
+    except ValueError:
+        raise ValueError(f"{key}: 숫자가 아닙니다 ({text})") from None
+
+
+def load_settings(preset, overrides=()):
+    """프리셋 이름 또는 JSON 파일 경로와 개별 설정값으로 최종 설정 만들기"""
+    if preset in PRESETS:
+        settings = PRESETS[preset]
+    elif os.path.isfile(preset):
+        with open(preset, encoding='utf-8') as f:
+            settings = RemovalSettings.from_dict(json.load(f))
+    else:
+        raise ValueError(f"프리셋을 찾을 수 없습니다: {preset} "
+                         f"(사용 가능: {', '.join(PRESETS)} 또는 JSON 파일)")
+
+    changes = {}
+    for item in overrides:
+        key, sep, text = item.partition('=')
+        if not sep or key not in RemovalSettings.field_names():
+            raise ValueError(f"잘못된 설정 지정: {item} "
+                             f"(항목: {', '.join(RemovalSettings.field_names())})")
+        changes[key] = parse_value(key, text)
+
+    return settings.replace(**changes)
+
+
+def output_paths(files, output_dir, extension='.png'):
+    """입력 파일마다 겹치지 않는 출력 파일 경로 정하기"""
+    used = set()
+    paths = []
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name = stem
+        count = 1
+        while name.lower() in used:
+            count += 1
+            name = f"{stem}_{count}"
+        used.add(name.lower())
+        paths.append(os.path.join(output_dir, name + extension))
+    return paths
+
+
+def process_file(job):
+    """작업자 프로세스에서 이미지 한 장 처리
+
+    (입력, 출력, 전체 소요 시간, 파일 크기, 인코딩 시간, 캐시 사용 여부, 오류, 단계 기록)을
+    반환합니다. 띠 단위 처리는 처리와 인코딩이 섞여 있으므로 인코딩 시간이 None이고,
+    단계 기록은 --trace를 지정했을 때만 있습니다.
+    """
+    *job, trace = job
+    if not trace:
+        return convert_file(*job) + (None,)
+
+    tracer = StageTracer()
+    set_tracer(tracer)
+    try:
+        with tracer.stage('file', src=job[0]):
+            result = convert_file(*job)
+    finally:
+        set_tracer(None)
+    return result + (tracer.snapshot(),)
+
+
+def worker_disk_cache(config):
+    """작업자 프로세스마다 하나씩 만드는 디스크 캐시 ((폴더, 최대 크기, 마스크 저장) 기준)"""
+    if config not in _disk_caches:
+        _disk_caches[config] = DiskCache(*config)
+    return _disk_caches[config]
+
+
+def remove_background(img, settings, threads, cache_config):
+    """배경 제거 결과와 디스크 캐시 사용 여부 반환"""
+    if cache_config is not None:
+        # 같은 픽셀 + 같은 설정의 결과가 있으면 처리를 건너뜀
+        cache = worker_disk_cache(cache_config)
+        hits = cache.hits
+        result = remove_white_background_cached(img, settings, cache, threads=threads)
+        return result, cache.hits > hits
+    if threads > 1:
+        # 한 장을 띠로 나눠 여러 스레드에서 처리 (결과는 같음)
+        return remove_white_background_parallel(img, settings, threads), False
+    return remove_white_background(img, settings), False
+
+
+def convert_file(src, dst, settings, memory_budget, crop_padding, fmt, compress_level, threads,
+                 cache_config, locate):
+    """이미지 한 장을 처리해서 저장 (process_file의 단계 기록 없는 부분)
+
+    locate가 있으면 서명/도장으로 보이는 잉크 영역을 점수 순으로 최대 locate개 찾아서
+    영역마다 따로 처리해 `이름_r1.png`, `이름_r2.png`... 로 저장합니다.
+    """
+    start = time.perf_counter()
+    cached = False
+    try:
+        img = open_image(src)
+
+        if memory_budget:
+            # 띠 단위로 처리해서 바로 파일에 기록
+            process_tiled(img, dst, settings, memory_budget, compress_level, threads)
+            size, encode_time = os.path.getsize(dst), None
+        elif locate:
+            regions = locate_ink_regions(img, locate)
+            if not regions:
+                raise ValueError("서명/도장으로 보이는 잉크 영역을 찾지 못했습니다.")
+            stem, extension = os.path.splitext(dst)
+            size = encode_time = 0
+            hits = []
+            found = []
+            for number, region in enumerate(regions, 1):
+                # 찾은 영역만 원본 해상도로 처리
+                result, hit = remove_background(img.crop(region.box), settings, threads,
+                                                cache_config)
+                hits.append(hit)
+                if crop_padding is not None:
+                    result = crop_to_content(result, crop_padding)
+                part_size, part_time = export_image(result, f"{stem}_r{number}{extension}", fmt,
+                                                    compress_level)
+                size += part_size
+                encode_time += part_time
+                left, top, right, bottom = region.box
+                found.append(f"r{number} {INK_COLORS[region.color]} "
+                             f"({left}, {top}) {right - left}x{bottom - top}")
+            cached = all(hits)
+            dst = f"{stem}_r1~{len(regions)}{extension} [{', '.join(found)}]"
+        else:
+            result, cached = remove_background(img, settings, threads, cache_config)
+            if crop_padding is not None:
+                # 투명한 여백을 잘라내고 저장
+                result = crop_to_content(result, crop_padding)
+            size, encode_time = export_image(result, dst, fmt, compress_level)
+        return src, dst, time.perf_counter() - start, size, encode_time, cached, None
+    except Exception as e:
+        return src, dst, time.perf_counter() - start, None, None, cached, str(e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="서명/도장 이미지의 하얀 배경을 일괄 제거해서 투명 PNG(또는 WebP)로 저장합니다.")
+    parser.add_argument('inputs', nargs='+',
+                        help="입력 폴더 또는 glob 패턴 (예: scans/ 또는 \"scans/*.jpg\")")
+    parser.add_argument('-o', '--output', required=True, help="결과 파일을 저장할 폴더")
+    parser.add_argument('-p', '--preset', default='default',
+                        help=f"설정 프리셋 이름({', '.join(PRESETS)}) 또는 JSON 파일 경로")
+    parser.add_argument('--set', dest='overrides', action='append', default=[],
+                        metavar='항목=값', help="개별 설정값 지정 (여러 번 사용 가능)")
+    parser.add_argument('-j', '--jobs', type=int, default=cpu_count(),
+                        help="작업자 프로세스 수 (기본: CPU 코어 수)")
+    parser.add_argument('--threads', type=int, default=1,
+                        help="작업자마다 한 장을 띠로 나눠 처리할 스레드 수 (기본: 1, "
+                             "큰 이미지가 적을 때는 -j 1 --threads 코어 수)")
+    parser.add_argument('--memory-budget', type=int, default=0, metavar='MB',
+                        help="지정하면 이미지를 띠 단위로 나눠 작업자당 작업 메모리를 "
+                             "이 크기(MB) 안으로 제한 (큰 스캔용)")
+    parser.add_argument('--crop', action='store_true',
+                        help="서명/도장 주변만 남기고 투명한 여백을 잘라서 저장")
+    parser.add_argument('--padding', type=int, default=DEFAULT_CROP_PADDING, metavar='PX',
+                        help=f"--crop 때 내용 주위에 남길 여백 (기본: {DEFAULT_CROP_PADDING}px)")
+    parser.add_argument('--format', default='png', choices=list(EXPORT_FORMATS),
+                        help="저장 형식: png(RGBA), png_palette(팔레트+tRNS), "
+                             "png_mask(1비트 마스크+단색), webp(무손실) (기본: png)")
+    parser.add_argument('--compress-level', type=int, default=DEFAULT_COMPRESS_LEVEL,
+                        choices=range(10), metavar='0-9',
+                        help=f"압축 수준, 높을수록 작지만 느림 (기본: {DEFAULT_COMPRESS_LEVEL})")
+    parser.add_argument('--cache', metavar='폴더', nargs='?', const=default_cache_dir(),
+                        help="처리 결과 디스크 캐시 사용 (같은 픽셀 + 같은 설정이면 처리 생략, "
+                             f"폴더를 생략하면 {default_cache_dir()})")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_DISK_CACHE_BYTES // 1024 // 1024,
+                        metavar='MB', help="디스크 캐시 최대 크기, 넘으면 오래 쓰지 않은 결과부터 "
+                                           "지움 (기본: %(default)sMB)")
+    parser.add_argument('--cache-masks', action='store_true',
+                        help="중간 마스크도 캐시에 저장 (가장자리 설정만 바꿔 다시 돌릴 때 빠름)")
+    parser.add_argument('--locate', type=int, nargs='?', const=DEFAULT_LOCATE_REGIONS,
+                        metavar='N', help="문서 전체 스캔에서 서명/도장으로 보이는 잉크 영역을 "
+                                          "점수 순으로 최대 N개 찾아 영역마다 따로 저장 "
+                                          f"(N을 생략하면 {DEFAULT_LOCATE_REGIONS})")
+    parser.add_argument('--trace', metavar='JSON',
+                        help="단계별 처리 시간 기록을 Chrome 추적 형식 JSON으로 저장 "
+                             "(chrome://tracing이나 Perfetto에서 열 수 있음)")
+    args = parser.parse_args(argv)
+
+    if args.crop and args.memory_budget:
+        # 띠 단위 처리는 결과를 바로 파일에 쓰므로 내용 범위를 미리 알 수 없음
+        parser.error("--crop은 --memory-budget과 함께 쓸 수 없습니다.")
+    if args.format != 'png' and args.memory_budget:
+        # 띠 단위 저장기는 RGBA PNG만 지원
+        parser.error("--memory-budget은 --format png에서만 쓸 수 있습니다.")
+    if args.threads < 1:
+        parser.error("--threads는 1 이상이어야 합니다.")
+    if args.padding < 0:
+        parser.error("--padding은 0 이상이어야 합니다.")
+    if args.cache and args.memory_budget:
+        # 띠 단위 처리는 결과 전체를 메모리에 만들지 않으므로 캐시에 넣을 수 없음
+        parser.error("--cache는 --memory-budget과 함께 쓸 수 없습니다.")
+    if args.locate is not None and args.locate < 1:
+        parser.error("--locate는 1 이상이어야 합니다.")
+    if args.locate and args.memory_budget:
+        # 띠 단위 처리는 한 파일에 하나의 결과만 씀
+        parser.error("--locate는 --memory-budget과 함께 쓸 수 없습니다.")
+
+    try:
+        settings = load_settings(args.preset, args.overrides)
+    except ValueError as e:
+        parser.error(str(e))
+
+    files = collect_inputs(args.inputs)
+    if not files:
+        parser.error("처리할 이미지 파일이 없습니다.")
+
+    os.makedirs(args.output, exist_ok=True)
+    memory_budget = args.memory_budget * 1024 * 1024
+    crop_padding = args.padding if args.crop else None
+    cache_config = None
+    if args.cache:
+        cache_config = (args.cache, args.cache_size * 1024 * 1024, args.cache_masks)
+    jobs = [(src, dst, settings, memory_budget, crop_padding, args.format, args.compress_level,
+             args.threads, cache_config, args.locate, bool(args.trace))
+            for src, dst in zip(files, output_paths(files, args.output,
+                                                    EXPORT_EXTENSIONS[args.format]))]
+    workers = max(1, min(args.jobs, len(jobs)))
+
+    print(f"{len(jobs)}개 파일 처리 시작 (작업자 {workers}개)")
+    failures = 0
+    cache_hits = 0
+    total_size = 0
+    trace_events = []
+    start = time.perf_counter()
+
+    with Pool(workers) as pool:
+        for (src, dst, elapsed, size, encode_time, cached, error,
+             events) in pool.imap_unordered(process_file, jobs):
+            if events:
+                trace_events.extend(events)
+            cache_hits += cached
+            if error is None:
+                total_size += size
+                encode = "" if encode_time is None else f", 인코딩 {encode_time * 1000:.1f} ms"
+                print(f"  {elapsed * 1000:8.1f} ms  {src} -> {dst} "
+                      f"({format_size(size)}{encode}{', 캐시' if cached else ''})")
+            else:
+                failures += 1
+                print(f"  {elapsed * 1000:8.1f} ms  {src} 실패: {error}", file=sys.stderr)
+
+    total = time.perf_counter() - start
+    done = len(jobs) - failures
+    print(f"완료: {done}개 성공, {failures}개 실패, {total:.2f}초, "
+          f"{done / total if total > 0 else 0:.2f} 장/초, 전체 {format_size(total_size)}")
+    if args.cache:
+        print(f"디스크 캐시: {cache_hits}개 재사용 ({args.cache})")
+
+    if args.trace:
+        write_trace(args.trace, trace_events)
+        print(f"단계별 시간 기록 저장: {args.trace}")
+        for name, (count, seconds) in summarize_trace(trace_events).items():
+            print(f"  {name:<18}{count:6d}회 {seconds * 1000:10.1f} ms")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())